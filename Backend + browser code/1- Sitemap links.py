@@ -10,12 +10,12 @@ from bs4 import BeautifulSoup
 from tqdm import tqdm
 import requests
 
-from http_client import HEADERS_POOL, new_scraper_session
+from http_client import BANDWIDTH, HEADERS_POOL, StickySessionPool, report_stats
 
 
 
 # Configuration
-SITEMAP_INDEX = "https://reality.bazos.sk/sitemap.php"
+SITEMAP_INDEX = os.getenv("BAZOS_SITEMAP_INDEX", "https://reality.bazos.sk/sitemap.php")
 DEFAULT_PROGRESS_URL = "http://127.0.0.1:5000/progress_update"
 PROGRESS_URL = os.getenv("PROGRESS_URL", DEFAULT_PROGRESS_URL)
 PHASE_LABEL = "1/5 – Zbieram sitemapy"
@@ -48,7 +48,12 @@ def get_ad_entries(sitemap_url, session):
     time.sleep(DELAY_SECONDS)
     resp = session.get(sitemap_url, headers=random.choice(HEADERS_POOL), timeout=REQUEST_TIMEOUT)
     resp.raise_for_status()
-    soup = BeautifulSoup(resp.text, "xml")
+    return parse_ad_entries(resp.text)
+
+
+def parse_ad_entries(xml_text):
+    """``(url, "dd/mm/YYYY HH:MM")`` pairs from one ``sitemapdetail.php`` page."""
+    soup = BeautifulSoup(xml_text, "xml")
     entries = []
     for url_tag in soup.find_all("url"):
         loc_tag = url_tag.find("loc")
@@ -89,19 +94,54 @@ def compare_links(old_file, new_file, output_file):
         for entry in new_entries:
             f.write(entry + "\n")
 
+
+def add_deferred_links(deferred, acquired_file, output_file):
+    """Append the ``deferred`` ads an earlier run left out to ``output_file``.
+
+    Only ads still listed in ``acquired_file`` are added, with their current
+    lastmod; the others were deleted meanwhile. Returns how many were added.
+    """
+    pending = {line.split()[0] for line in deferred if line.strip()}
+    if not pending:
+        return 0
+    with open(output_file, "r", encoding="utf-8") as f:
+        listed = {line.split()[0] for line in f if line.strip()}
+    added = []
+    with open(acquired_file, "r", encoding="utf-8") as f:
+        for line in f:
+            parts = line.strip().split(maxsplit=1)
+            if parts and parts[0] in pending and parts[0] not in listed:
+                listed.add(parts[0])
+                added.append(line.strip())
+    with open(output_file, "a", encoding="utf-8") as f:
+        for entry in added:
+            f.write(entry + "\n")
+    return len(added)
+
 # Main
 if __name__ == "__main__":
-    from storage import save_old_links  # <-- add this import so we can push to GitHub
+    from storage import clear_deferred_links, load_deferred_links, save_old_links
+
+    # One sticky session per worker thread; sessions are only replaced after a
+    # failed attempt or once they have served BRD_SESSION_MAX_REQUESTS requests.
+    session_pool = StickySessionPool(verify_ssl=False)
+    BANDWIDTH.set_stage("stage1")
+    retry_lock = threading.Lock()
+    retry_count = 0
 
     def fetch_with_retries(index: int, sitemap_url: str) -> Tuple[int, List[Tuple[str, str]]]:
+        global retry_count
         last_error = None
         for attempt in range(1, MAX_RETRIES + 1):
-            session = new_scraper_session(verify_ssl=False)
+            session = session_pool.get()
             try:
                 entries = get_ad_entries(sitemap_url, session)
                 return index, entries
             except Exception as exc:  # noqa: PERF203 - retries require generic catch
                 last_error = exc
+                session_pool.rotate()
+                with retry_lock:
+                    retry_count += 1
                 wait_time = RETRY_BACKOFFS[min(attempt - 1, len(RETRY_BACKOFFS) - 1)]
                 print(
                     f"Retry {attempt}/{MAX_RETRIES} for {sitemap_url} failed: {exc}. "
@@ -109,11 +149,6 @@ if __name__ == "__main__":
                 )
                 if attempt < MAX_RETRIES:
                     time.sleep(wait_time)
-            finally:
-                try:
-                    session.close()
-                except Exception:
-                    pass
         raise RuntimeError(f"Failed to fetch {sitemap_url} after {MAX_RETRIES} attempts: {last_error}")
 
     # Step 1: Backup old acquired links
@@ -122,21 +157,13 @@ if __name__ == "__main__":
             with open(OLD_FILE, "w", encoding="utf-8") as dst:
                 dst.write(src.read())
 
-    # Proxy session that uses Bright Data when available and falls back to
-    # static proxies or direct connection when not.
-    session = new_scraper_session(verify_ssl=False)
-
     print("Fetching sitemap pages...")
     try:
-        sitemap_pages = get_sitemap_pages(session)
+        sitemap_pages = get_sitemap_pages(session_pool.get())
     except Exception as e:
         print(f"Failed to fetch sitemap index: {e}")
+        session_pool.close()
         raise SystemExit(1)
-    finally:
-        try:
-            session.close()
-        except Exception:
-            pass
 
     total = len(sitemap_pages)
     if total != 13:
@@ -187,6 +214,25 @@ if __name__ == "__main__":
                         except Exception:
                             pass
 
+    connection_stats = session_pool.stats()
+    session_pool.close()
+    print(
+        f"Connections: {connection_stats['handshakes']} handshakes, "
+        f"{connection_stats['handshake_seconds']:.2f}s total "
+        f"({connection_stats['avg_handshake_ms']:.0f} ms avg), "
+        f"{connection_stats['rotations']} session rotations"
+    )
+    bandwidth_stats = BANDWIDTH.snapshot()
+    print(
+        f"Bandwidth: {bandwidth_stats['wire_bytes'] / 1024:.0f} KiB on the wire, "
+        f"{bandwidth_stats['decoded_bytes'] / 1024:.0f} KiB decoded"
+    )
+    report_stats(
+        "stage1",
+        {"connections": connection_stats, "bandwidth": bandwidth_stats, "retries": retry_count},
+        PROGRESS_URL,
+    )
+
     if errors:
         print("\nErrors during sitemap fetching:")
         for page, exc in errors:
@@ -205,6 +251,14 @@ if __name__ == "__main__":
     # Step 3: Compare with old and save new ones
     compare_links(OLD_FILE, ACQUIRED_FILE, NEW_FILE)
 
+    # Ads the previous run left out (deadline, byte budget) are in
+    # old_results.txt already; they are new to this run again.
+    deferred = load_deferred_links()
+    if deferred:
+        added = add_deferred_links(deferred, ACQUIRED_FILE, NEW_FILE)
+        clear_deferred_links()
+        print(f"Re-queued {added} of {len(deferred)} ads deferred by the previous run")
+
     try:
         requests.post(
             PROGRESS_URL,
@@ -1,13 +1,26 @@
 import os
+import queue
 import random
 import re
+import threading
 import time
+from datetime import datetime
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
 import requests
 
-from bs4 import BeautifulSoup
 from tqdm import tqdm
 
-from http_client import HEADERS_POOL, new_scraper_session
+from ad_extract import format_result_block, parse_ad_bytes
+from storage import append_deferred_links
+from html_archive import ARCHIVE_ENABLED, HtmlArchive
+from http_client import (
+    BANDWIDTH,
+    HEADERS_POOL,
+    BandwidthBudgetExceeded,
+    LatencyTracker,
+    StickySessionPool,
+    report_stats,
+)
 
 DEBUG_HEADERS = False
 DEFAULT_PROGRESS_URL = "http://127.0.0.1:5000/progress_update"
@@ -17,20 +30,61 @@ PROGRESS_URL = os.getenv("PROGRESS_URL", DEFAULT_PROGRESS_URL)
 DATA_DIR = "Data"
 os.makedirs(DATA_DIR, exist_ok=True)
 
-# === CLEAR PREVIOUS SCRAPED RESULTS IF EXIST ===
-with open(os.path.join(DATA_DIR, "scraped_results.txt"), "w", encoding="utf-8") as f:
-    f.write("")  # Empty file
-
 # === CONFIGURATION ===
 INPUT_FILE = os.path.join(DATA_DIR, "final_filtered_links.txt")
 OUTPUT_FILE = os.path.join(DATA_DIR, "scraped_results.txt")
 ACQUIRED_FILE = os.path.join(DATA_DIR, "acquired_links.txt")
 
 
+def _available_cores():
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+# Downloads run in FETCH_WORKERS threads; parsing runs in PARSE_WORKERS
+# processes. At most PARSE_QUEUE_SIZE fetched pages wait for a parser.
+FETCH_WORKERS = int(os.getenv("FETCH_WORKERS", "8"))
+PARSE_WORKERS = max(1, int(os.getenv("PARSE_WORKERS", "0")) or _available_cores())
+PARSE_QUEUE_SIZE = max(1, int(os.getenv("PARSE_QUEUE_SIZE", "0")) or PARSE_WORKERS * 4)
+
+# Hedged requests: when an attempt is still running after the observed p90
+# latency, a duplicate goes out through another exit and the first answer wins.
+HEDGE_ENABLED = os.getenv("HEDGE_REQUESTS", "0").strip() == "1"
+HEDGE_MAX_FRACTION = float(os.getenv("HEDGE_MAX_FRACTION", "0.1"))
+HEDGE_MIN_SAMPLES = int(os.getenv("HEDGE_MIN_SAMPLES", "20"))
+
+# Unix time by which the whole pipeline should finish (0 = no deadline). Stage 3
+# stops fetching early enough to leave stages 4-5 time for what it has kept.
+PIPELINE_DEADLINE = float(os.getenv("PIPELINE_DEADLINE", "0") or 0)
+DEADLINE_RESERVE_SECONDS = float(os.getenv("DEADLINE_RESERVE_SECONDS", "30"))
+STAGE5_SECONDS_PER_AD = float(os.getenv("STAGE5_SECONDS_PER_AD", "0.5"))
+
+
 def clean_url(url):
     match = re.match(r"^(https?://[^\s]+\.php)", url)
     return match.group(1) if match else url
 
+
+def lastmod_of(line):
+    """Sitemap lastmod of an input line (``URL dd/mm/YYYY HH:MM``), or ``datetime.min``."""
+    parts = line.split(maxsplit=1)
+    if len(parts) == 2:
+        try:
+            return datetime.strptime(parts[1].strip(), "%d/%m/%Y %H:%M")
+        except ValueError:
+            pass
+    return datetime.min
+
+
+def deadline_reached(kept_ads):
+    """True once the remaining time only covers stages 4-5 for ``kept_ads`` ads."""
+    if not PIPELINE_DEADLINE:
+        return False
+    reserve = DEADLINE_RESERVE_SECONDS + STAGE5_SECONDS_PER_AD * kept_ads
+    return time.time() + reserve >= PIPELINE_DEADLINE
+
 def estimate_referer_from_ad_url(ad_url, acquired_file_path="Data/acquired_links.txt"):
     try:
         ad_id = ad_url.split("/inzerat/")[1].split("/")[0]
@@ -43,97 +97,302 @@ def estimate_referer_from_ad_url(ad_url, acquired_file_path="Data/acquired_links
     except Exception:
         return "https://reality.bazos.sk/"
 
-def scrape_ad_page(url, session):
+# "stream" stops downloading once every section below has been read; "full"
+# downloads whole pages (the previous behaviour). The archive exists to
+# re-extract fields stage 3 does not read yet, so it always gets whole pages.
+FETCH_MODE = "full" if ARCHIVE_ENABLED else os.getenv("AD_FETCH_MODE", "stream").strip().lower()
+STREAM_CHUNK_SIZE = 8192
+
+# Sections ad_extract needs: (opening marker, element the marker sits in or
+# under). A section ends where that element closes again, so nested elements of
+# the same kind (a <div> inside the description) do not cut it short.
+REQUIRED_SECTIONS = (
+    (re.compile(rb"""class=["']?[^"'>]*\bdrobky\b"""), b"div"),
+    (re.compile(rb"""class=["']?[^"'>]*\blistadvlevo\b"""), b"table"),
+    (re.compile(rb"""class=["']?[^"'>]*\bpopisdetail\b"""), b"div"),
+)
+# The character after the tag name is required, so a tag split across two
+# chunks is only counted once it is whole.
+_TAG_PATTERNS = {tag: re.compile(rb"<(/?)" + tag + rb"[\s>/]", re.I) for _, tag in REQUIRED_SECTIONS}
+# Bytes rescanned from the previous end so a marker or tag split across
+# chunks is still found.
+_MARKER_OVERLAP = 256
+_TAG_OVERLAP = len(b"</table")
+
+stream_stats = {"truncated": 0, "bytes_read": 0, "bytes_saved": 0}
+stream_stats_lock = threading.Lock()
+
+
+class SectionTracker:
+    """Tells when the growing body of one response holds every required section.
+
+    Each call only scans what arrived since the previous one.
+    """
+
+    def __init__(self):
+        # Per section: [scan offset, open element depth or None before the marker].
+        self._state = [[0, None] for _ in REQUIRED_SECTIONS]
+
+    def complete(self, body):
+        done = True
+        for state, (marker, tag) in zip(self._state, REQUIRED_SECTIONS):
+            offset, depth = state
+            if depth == 0:
+                continue
+            if depth is None:
+                match = marker.search(body, offset)
+                if not match:
+                    state[0] = max(offset, len(body) - _MARKER_OVERLAP)
+                    done = False
+                    continue
+                # The marker is inside the opening tag of the section's element.
+                offset, depth = match.end(), 1
+            for match in _TAG_PATTERNS[tag].finditer(body, offset):
+                depth += -1 if match.group(1) else 1
+                offset = match.end()
+                if depth == 0:
+                    break
+            state[0], state[1] = max(offset, len(body) - _TAG_OVERLAP) if depth else offset, depth
+            if depth:
+                done = False
+        return done
+
+
+def fetch_ad_html(url, session, headers):
+    """Return ``(body, encoding)`` of the ad page, or ``None`` when the ad was deleted (redirected)."""
+
+    if FETCH_MODE != "stream":
+        resp = session.get(url, headers=headers, timeout=25, allow_redirects=True)
+        if "inzeraty" in resp.url or resp.url != url:
+            print(f"🔁 Skipping (redirected ad): {url} {resp.url}")
+            return None
+        if resp.status_code != 200:
+            raise Exception(f"Status code {resp.status_code}")
+        return resp.content, resp.encoding or "utf-8"
+
+    resp = session.get(url, headers=headers, timeout=25, allow_redirects=False, stream=True)
+    body = bytearray()
+    try:
+        # Deleted ads redirect to a listing page; the Location header is enough.
+        if resp.is_redirect:
+            print(f"🔁 Skipping (redirected ad): {url} {resp.headers.get('Location', '')}")
+            return None
+        if resp.status_code != 200:
+            raise Exception(f"Status code {resp.status_code}")
+
+        complete = False
+        tracker = SectionTracker()
+        for chunk in resp.iter_content(chunk_size=STREAM_CHUNK_SIZE):
+            body.extend(chunk)
+            if tracker.complete(body):
+                complete = True
+                break
+
+        wire_read = resp.raw.tell()
+        expected = int(resp.headers.get("Content-Length") or 0)
+        saved = expected - wire_read if complete and expected > wire_read else 0
+        with stream_stats_lock:
+            stream_stats["bytes_read"] += wire_read
+            if complete:
+                stream_stats["truncated"] += 1
+                stream_stats["bytes_saved"] += saved
+        if saved:
+            print(f"✂️ Stopped after {wire_read / 1024:.1f} KiB, saved {saved / 1024:.1f} KiB")
+        elif complete:
+            print(f"✂️ Stopped after {wire_read / 1024:.1f} KiB")
+        return bytes(body), resp.encoding or "utf-8"
+    finally:
+        BANDWIDTH.record_response(resp, decoded_bytes=len(body))
+        resp.close()
+
+
+def _fetch_attempt(url, session_pool, headers):
+    session = session_pool.get()
+    try:
+        return fetch_ad_html(url, session, headers)
+    except BandwidthBudgetExceeded:
+        raise
+    except Exception:
+        session_pool.rotate()
+        raise
+
+
+class Hedger:
+    """Run fetch attempts with a hedge fired at the recent p90 latency.
+
+    Attempts run on a dedicated thread pool; every thread has its own sticky
+    session, so the hedge leaves through a different exit than the primary.
+    Abandoned primaries are left to finish so their latency still shows what
+    the run would have looked like without hedging.
+    """
+
+    def __init__(self, session_pool, workers):
+        self.session_pool = session_pool
+        self._pool = ThreadPoolExecutor(max_workers=workers * 2)
+        self._lock = threading.Lock()
+        self.primary_latency = LatencyTracker()
+        self.effective_latency = LatencyTracker()
+        self.requests = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def _timed_attempt(self, url, headers, tracker):
+        started = time.perf_counter()
+        result = _fetch_attempt(url, self.session_pool, headers)
+        if tracker is not None:
+            tracker.add(time.perf_counter() - started)
+        return result
+
+    def _may_hedge(self):
+        with self._lock:
+            if self.hedges + 1 > self.requests * HEDGE_MAX_FRACTION:
+                return False
+            self.hedges += 1
+            return True
+
+    def fetch(self, url, headers):
+        started = time.perf_counter()
+        with self._lock:
+            self.requests += 1
+        primary = self._pool.submit(self._timed_attempt, url, headers, self.primary_latency)
+
+        threshold = None
+        if len(self.primary_latency) >= HEDGE_MIN_SAMPLES:
+            threshold = self.primary_latency.percentile(90)
+
+        done, _ = wait([primary], timeout=threshold)
+        if done or not self._may_hedge():
+            result = primary.result()
+        else:
+            print(f"⏱️ Hedging {url} after {threshold:.2f}s")
+            hedge = self._pool.submit(self._timed_attempt, url, headers, None)
+            pending = {primary, hedge}
+            error = None
+            result = None
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                finished = next(iter(done))
+                if finished.exception() is None:
+                    result = finished.result()
+                    if finished is hedge:
+                        with self._lock:
+                            self.hedge_wins += 1
+                    break
+                error = error or finished.exception()
+            else:
+                raise error
+
+        self.effective_latency.add(time.perf_counter() - started)
+        return result
+
+    def close(self):
+        self._pool.shutdown(wait=True)
+
+    def stats(self):
+        with self._lock:
+            requests_, hedges, wins = self.requests, self.hedges, self.hedge_wins
+        return {
+            "requests": requests_,
+            "hedges": hedges,
+            "hedge_wins": wins,
+            "hedge_fraction": round(hedges / requests_, 3) if requests_ else 0.0,
+            "latency_without_hedging": self.primary_latency.summary(),
+            "latency_with_hedging": self.effective_latency.summary(),
+        }
+
+
+def fetch_ad_page(url, session_pool, hedger=None, metrics=None):
+    """Download an ad with retries; ``None`` if it was deleted or kept failing."""
+
     for attempt in range(5):
+        if attempt and metrics is not None:
+            metrics.retried()
         try:
             print(f"\nAttempt {attempt+1}/5 Fetching {url}")
             headers = random.choice(HEADERS_POOL).copy()
             headers["Referer"] = estimate_referer_from_ad_url(url)
 
-            resp = session.get(url, headers=headers, timeout=25, allow_redirects=True)
-
-            if "inzeraty" in resp.url or resp.url != url:
-                print(f"🔁 Skipping (redirected ad): {url} {resp.url}")
-                return None
-
-            if resp.status_code != 200:
-                raise Exception(f"Status code {resp.status_code}")
-
-            soup = BeautifulSoup(resp.text, "html.parser")
-
-            # --- Description ---
-            description = soup.find("div", class_="popisdetail")
-            description = description.get_text(strip=True) if description else "N/A"
-
-            # --- Name + ZIP + City (left side table) ---
-            name = "N/A"
-            zip_code = "N/A"
-            city = "N/A"
-
-            left = soup.find("td", class_="listadvlevo")
-            if left:
-                inner = left.find("table")
-                if inner:
-                    rows = inner.find_all("tr")
-                    for tr in rows:
-                        cells = tr.find_all("td")
-                        if len(cells) < 2:
-                            continue
-
-                        label = cells[0].get_text(strip=True).lower()
-
-                        # Meno:
-                        if label.startswith("meno"):
-                            # HTML: <td> Meno: </td><td colspan="2"><b><a>NAME</a></b>...</td>
-                            b_tag = cells[1].find("b")
-                            if b_tag:
-                                name = b_tag.get_text(strip=True)
-
-                        # Lokalita:
-                        if label.startswith("lokalita") and len(cells) >= 3:
-                            # HTML: <td>Lokalita:</td><td><img ...></td><td><a>040 11</a> <a>Košice</a></td>
-                            links = cells[2].find_all("a")
-                            if len(links) >= 2:
-                                first = links[0].get_text(strip=True)
-                                second = links[1].get_text(strip=True)
-
-                                # First is ZIP (starts with digits), second is city
-                                if first and first[0].isdigit():
-                                    zip_code = first
-                                    city = second
-                                else:
-                                    # Fallback if order is ever flipped
-                                    city = first
-                                    zip_code = second
-
-            # --- Breadcrumbs: main & sub category ---
-            main_category = sub_category = "N/A"
-            drobky = soup.find("div", class_="drobky")
-            if drobky:
-                links = drobky.find_all("a")
-                if len(links) >= 4:
-                    main_category = links[2].get_text(strip=True)
-                    sub_category = links[3].get_text(strip=True)
-
-            return {
-                "url": url,
-                "description": description,
-                "name": name,
-                "main_category": main_category,
-                "sub_category": sub_category,
-                "zip_code": zip_code,
-                "city": city,
-            }
+            if hedger is not None:
+                return hedger.fetch(url, headers)
+            return _fetch_attempt(url, session_pool, headers)
 
+        except BandwidthBudgetExceeded:
+            raise
         except Exception as e:
             print(f"Request failed: {e}")
             time.sleep(random.uniform(0.5, 2))
             continue
 
     print(f"Skipping {url} after 5 failed attempts.\n")
+    if metrics is not None:
+        metrics.failed()
     return None
 
+
+class StageMetrics:
+    """Busy time of the fetch threads and parse processes, and parse queue depth."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.fetch_seconds = 0.0
+        self.parse_cpu_seconds = 0.0
+        self.queue_wait_seconds = 0.0
+        self.queue_depth = 0
+        self.max_queue_depth = 0
+        self.retries = 0
+        self.failures = 0
+
+    def add_fetch(self, seconds):
+        with self._lock:
+            self.fetch_seconds += seconds
+
+    def retried(self):
+        with self._lock:
+            self.retries += 1
+
+    def failed(self):
+        with self._lock:
+            self.failures += 1
+
+    def enqueued(self, waited):
+        with self._lock:
+            self.queue_wait_seconds += waited
+            self.queue_depth += 1
+            self.max_queue_depth = max(self.max_queue_depth, self.queue_depth)
+
+    def parsed(self, cpu_seconds):
+        with self._lock:
+            self.queue_depth -= 1
+            self.parse_cpu_seconds += cpu_seconds
+
+    def snapshot(self, wall_seconds):
+        wall = max(wall_seconds, 1e-9)
+        with self._lock:
+            return {
+                "wall_seconds": round(wall_seconds, 2),
+                "fetch_workers": FETCH_WORKERS,
+                "parse_workers": PARSE_WORKERS,
+                "fetch_utilisation": round(self.fetch_seconds / (wall * FETCH_WORKERS), 3),
+                "parse_utilisation": round(self.parse_cpu_seconds / (wall * PARSE_WORKERS), 3),
+                "parse_cpu_seconds": round(self.parse_cpu_seconds, 2),
+                "parse_queue_size": PARSE_QUEUE_SIZE,
+                "max_parse_queue_depth": self.max_queue_depth,
+                "fetch_blocked_seconds": round(self.queue_wait_seconds, 2),
+                "retries": self.retries,
+                "failed_fetches": self.failures,
+            }
+
+
+def _write_result(result):
+    with open(OUTPUT_FILE, "a", encoding="utf-8") as out:
+        out.write(format_result_block(result))
+
+
 def main():
+    # === CLEAR PREVIOUS SCRAPED RESULTS IF EXIST ===
+    with open(OUTPUT_FILE, "w", encoding="utf-8") as f:
+        f.write("")  # Empty file
+
     if not os.path.exists(INPUT_FILE):
         print(f"Input file not found: {INPUT_FILE}")
         return
@@ -145,8 +404,15 @@ def main():
         print("Input file is empty. Nothing to scrape.")
         return
 
-    # true de-dup while preserving order
-    cleaned_links = list(dict.fromkeys(clean_url(line) for line in raw_lines))
+    # Newest ads first, so a run cut short by a deadline keeps the freshest ones.
+    raw_lines.sort(key=lastmod_of, reverse=True)
+
+    # true de-dup while preserving order; keeps each URL's input line (with
+    # its lastmod) for ads deferred to the next run
+    input_lines = {}
+    for line in raw_lines:
+        input_lines.setdefault(clean_url(line), line)
+    cleaned_links = list(input_lines)
     total_ads = len(cleaned_links)
     print(f"\nLoaded {len(raw_lines)} lines from {INPUT_FILE}")
     print(f"Cleaned down to {total_ads} unique URLs\n")
@@ -159,29 +425,114 @@ def main():
     except Exception:
         pass
 
+    # Start the parser processes before any fetch thread exists, so forking
+    # them never copies a lock held by another thread.
+    parse_pool = ProcessPoolExecutor(max_workers=PARSE_WORKERS)
+    parse_pool.submit(int).result()
+
     # Disable SSL verification to handle proxy-injected certificates
-    session = new_scraper_session(verify_ssl=False)
+    session_pool = StickySessionPool(verify_ssl=False)
+    BANDWIDTH.set_stage("stage3")
+
+    archive = HtmlArchive() if ARCHIVE_ENABLED else None
+    hedger = Hedger(session_pool, FETCH_WORKERS) if HEDGE_ENABLED else None
+    metrics = StageMetrics()
+    parse_slots = threading.BoundedSemaphore(PARSE_QUEUE_SIZE)
+    outcomes = queue.Queue()
+    stop_fetching = threading.Event()
+    kept = {"ads": 0}
+    # Ads left out for the deadline or the byte budget, from every fetch thread.
+    deferred = []
+    skipped = {"deadline": 0, "budget": 0}
+    stopped_for = {"reason": None}
+    deferred_lock = threading.Lock()
+
+    def on_parsed(url, future):
+        parse_slots.release()
+        outcomes.put((url, future))
+
+    def stop(reason, message):
+        with deferred_lock:
+            if stop_fetching.is_set():
+                return
+            stopped_for["reason"] = reason
+            stop_fetching.set()
+        print(message)
+
+    def defer(url, reason):
+        with deferred_lock:
+            deferred.append(input_lines[url])
+            skipped[reason] += 1
+        outcomes.put((url, None))
+
+    def fetch_task(url):
+        if not stop_fetching.is_set() and deadline_reached(kept["ads"]):
+            stop("deadline", "⏰ Deadline approaching – not fetching the remaining ads.")
+        if stop_fetching.is_set():
+            defer(url, stopped_for["reason"])
+            return
+        started = time.perf_counter()
+        try:
+            page = fetch_ad_page(url, session_pool, hedger, metrics)
+        except BandwidthBudgetExceeded as exc:
+            stop("budget", f"⛔ {exc}. Not fetching the remaining ads.")
+            defer(url, "budget")
+            return
+        except Exception as exc:  # pragma: no cover - fetch_ad_page handles request errors
+            print(f"Request failed: {exc}")
+            outcomes.put((url, None))
+            return
+        finally:
+            metrics.add_fetch(time.perf_counter() - started)
+
+        if page is None:
+            outcomes.put((url, None))
+            return
+
+        body, encoding = page
+        if archive is not None:
+            try:
+                archive.append(url, body, encoding)
+            except Exception as exc:  # archiving is best effort; never lose the ad over it
+                print(f"⚠️ Could not archive {url}: {exc}")
+        # Bounded hand-off: block this fetcher while the parsers are saturated.
+        waited_from = time.perf_counter()
+        parse_slots.acquire()
+        metrics.enqueued(time.perf_counter() - waited_from)
+        try:
+            future = parse_pool.submit(parse_ad_bytes, body, encoding, url)
+        except Exception as exc:  # BrokenProcessPool once a parser process died
+            parse_slots.release()
+            metrics.parsed(0.0)
+            print(f"Parsing failed for {url}: {exc}")
+            outcomes.put((url, None))
+            return
+        future.add_done_callback(lambda f, u=url: on_parsed(u, f))
 
     valid_count = 0
+    started_at = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=FETCH_WORKERS) as fetch_pool, \
+            tqdm(total=total_ads, desc="Scraping ads") as pbar:
+        for url in cleaned_links:
+            fetch_pool.submit(fetch_task, url)
+
+        for i in range(1, total_ads + 1):
+            url, outcome = outcomes.get()
+            result = None
+            if outcome is not None:
+                try:
+                    result, cpu_seconds = outcome.result()
+                    metrics.parsed(cpu_seconds)
+                except Exception as exc:
+                    metrics.parsed(0.0)
+                    print(f"Parsing failed for {url}: {exc}")
 
-    with tqdm(total=total_ads, desc="Scraping ads") as pbar:
-        for i, url in enumerate(cleaned_links, 1):
-            result = scrape_ad_page(url, session)
             if result and result["description"] != "N/A":
                 valid_count += 1
+                kept["ads"] = valid_count
                 result["index"] = valid_count
-
-                with open(OUTPUT_FILE, "a", encoding="utf-8") as out:
-                    out.write(f"Result #{result['index']}\n")
-                    out.write(f"URL: {result['url']}\n")
-                    out.write(f"Name: {result['name']}\n")
-                    out.write(f"Description: {result['description']}\n")
-                    out.write(f"Main Category: {result['main_category']}\n")
-                    out.write(f"Sub Category: {result['sub_category']}\n")
-                    out.write(f"ZIP: {result['zip_code']}\n")
-                    out.write(f"City: {result['city']}\n")
-                    out.write("=" * 60 + "\n")
-
+                _write_result(result)
                 print(f"Saved result #{valid_count} {url}")
             else:
                 print(f"No usable data for: {url}")
@@ -197,6 +548,23 @@ def main():
 
             pbar.update(1)
 
+    parse_pool.shutdown()
+    if archive is not None:
+        archive.close()
+    hedge_stats = None
+    if hedger is not None:
+        hedger.close()
+        hedge_stats = hedger.stats()
+    pipeline_stats = metrics.snapshot(time.perf_counter() - started_at)
+    pipeline_stats["skipped_for_deadline"] = skipped["deadline"]
+    pipeline_stats["skipped_for_budget"] = skipped["budget"]
+    if deferred:
+        try:
+            append_deferred_links(deferred)
+            print(f"⏰ {len(deferred)} ads deferred to the next run")
+        except Exception as exc:
+            print(f"❌ Could not record {len(deferred)} deferred ads: {exc}")
+
     try:
         requests.post(
             PROGRESS_URL,
@@ -206,7 +574,46 @@ def main():
     except Exception:
         pass
 
+    connection_stats = session_pool.stats()
+    session_pool.close()
+    bandwidth_stats = BANDWIDTH.snapshot()
+    stage_stats = {
+        "connections": connection_stats,
+        "bandwidth": bandwidth_stats,
+        "stream": dict(stream_stats),
+        "pipeline": pipeline_stats,
+    }
+    if hedge_stats is not None:
+        stage_stats["hedging"] = hedge_stats
+    report_stats("stage3", stage_stats, PROGRESS_URL)
+
     print(f"\nFinished scraping.\nValid results saved: {valid_count} {OUTPUT_FILE}")
+    print(
+        f"Fetch utilisation {pipeline_stats['fetch_utilisation']:.0%} of {FETCH_WORKERS} threads, "
+        f"parse utilisation {pipeline_stats['parse_utilisation']:.0%} of {PARSE_WORKERS} processes, "
+        f"fetchers blocked on full parse queue for {pipeline_stats['fetch_blocked_seconds']:.1f}s"
+    )
+    print(
+        f"Connections: {connection_stats['handshakes']} handshakes, "
+        f"{connection_stats['handshake_seconds']:.2f}s total, "
+        f"{connection_stats['rotations']} session rotations"
+    )
+    print(
+        f"Bandwidth: {bandwidth_stats['wire_bytes'] / 1024:.0f} KiB on the wire, "
+        f"{bandwidth_stats['decoded_bytes'] / 1024:.0f} KiB decoded"
+    )
+    if hedge_stats is not None:
+        without, with_ = hedge_stats["latency_without_hedging"], hedge_stats["latency_with_hedging"]
+        print(
+            f"Hedging: {hedge_stats['hedges']} hedges ({hedge_stats['hedge_wins']} won) for "
+            f"{hedge_stats['requests']} requests; p50/p99 {without['p50_ms']}/{without['p99_ms']} ms "
+            f"without vs {with_['p50_ms']}/{with_['p99_ms']} ms with hedging"
+        )
+    if FETCH_MODE == "stream":
+        print(
+            f"Truncated downloads: {stream_stats['truncated']} ads, "
+            f"{stream_stats['bytes_saved'] / 1024:.0f} KiB saved"
+        )
 
 if __name__ == "__main__":
     main()
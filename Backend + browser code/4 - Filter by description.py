@@ -1,10 +1,10 @@
 import os
-import re
 from collections import Counter
 from tqdm import tqdm
 import argparse
 import requests
 
+from result_blocks import read_ad_blocks, tokenize
 from storage import load_keyword_sets
 
 
@@ -29,51 +29,7 @@ MAX_SECONDARY_SUGGESTIONS = 25
 # === LOAD KEYWORDS ===
 agency_primary, non_sale_primary, filler_words = load_keyword_sets()
 
-# === Helpers ===
-def extract_blocks(filename):
-    blocks = []
-    current = {}
-    with open(filename, "r", encoding="utf-8") as f:
-        for line in f:
-            line = line.rstrip("\n")
-            if line.startswith("Result #"):
-                if current:
-                    blocks.append(current)
-                current = {}
-                current["index"] = line.split("#", 1)[1].strip()
-            elif line.startswith("URL:"):
-                current["url"] = line[len("URL:"):].strip()
-            elif line.startswith("Name:"):
-                current["name"] = line[len("Name:"):].strip()
-            elif line.startswith("Description:"):
-                current["description"] = line[len("Description:"):].strip()
-            elif line.startswith("Main Category:"):
-                current["main_category"] = line[len("Main Category:"):].strip()
-            elif line.startswith("Sub Category:"):
-                current["sub_category"] = line[len("Sub Category:"):].strip()
-            elif line.startswith("ZIP:"):
-                current["zip_code"] = line[len("ZIP:"):].strip()
-            elif line.startswith("City:"):
-                current["city"] = line[len("City:"):].strip()
-        if current:
-            blocks.append(current)
-    return blocks
-
-
-def normalize(text):
-    text = text.lower()
-    text = re.sub(r"s\s*\.\s*r\s*\.\s*o\s*\.*", "s.r.o", text)
-    return text
-
-
-def tokenize(text): 
-    normalized = normalize(text)
-    tokens = re.findall(r"\b[\w.]+\b", normalized)
-    return [t.rstrip(".,;:!?") for t in tokens]
-
-
-
-ads = extract_blocks(INPUT_FILE)
+ads = read_ad_blocks(INPUT_FILE)
 total = len(ads)
 try:
         requests.post(
@@ -1,9 +1,16 @@
 import os
 import re
+import time as time_module
+from datetime import datetime
 from tqdm import tqdm
 from openai import OpenAI
 import requests
 
+from http_client import report_stats
+from metrics import OPENAI_SECONDS, OPENAI_TOKENS
+from result_blocks import read_raw_blocks
+from storage import append_deferred_links
+
 
 # Load timestamps from acquired_links.txt
 acquired_links = {}
@@ -27,6 +34,9 @@ PROGRESS_URL = os.getenv("PROGRESS_URL", DEFAULT_PROGRESS_URL)
 
 MODEL = "gpt-5-chat-latest"
 CHUNK_SIZE = 15
+# Unix time by which the pipeline should finish (0 = none). Batches that cannot
+# start before it are left for the next run, since their ads were never classified.
+PIPELINE_DEADLINE = float(os.getenv("PIPELINE_DEADLINE", "0") or 0)
 
 #Set your OpenAI API key using the OPENAI_API_KEY environment variable
 client = OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
@@ -40,19 +50,41 @@ except OSError as exc:  # pragma: no cover - best effort cleanup
     print(f"Warning: unable to clear ready flag: {exc}")
 
 # === HELPER FUNCTIONS ===
-def extract_blocks(filename):
-    blocks = []
-    current = []
-    with open(filename, "r", encoding="utf-8") as f:
-        for line in f:
-            if line.startswith("=") and current:
-                blocks.append(current)
-                current = []
-            else:
-                current.append(line.rstrip())
-        if current:
-            blocks.append(current)
-    return blocks
+def block_timestamp(block):
+    """Sitemap timestamp of the ad in ``block`` (``datetime.min`` if unknown)."""
+    for line in block:
+        if line.startswith("URL: "):
+            stamp = acquired_links.get(line[5:].strip())
+            if stamp:
+                try:
+                    return datetime.strptime(stamp, "%d/%m/%Y %H:%M")
+                except ValueError:
+                    pass
+            break
+    return datetime.min
+
+def deferred_line(block):
+    """``URL dd/mm/YYYY HH:MM`` of the ad in ``block`` for the next run, or ``None``."""
+    for line in block:
+        if line.startswith("URL: "):
+            url = line[5:].strip()
+            stamp = acquired_links.get(url)
+            return f"{url} {stamp}" if stamp else url
+    return None
+
+def _format_kept_block(block):
+    new_block = []
+    url = None
+
+    for line in block:
+        new_block.append(line)
+        if line.startswith("URL: "):
+            url = line[5:].strip()
+            timestamp = acquired_links.get(url)
+            if timestamp:
+                new_block.append(f"Timestamp: {timestamp}")
+
+    return "\n".join(new_block) + "\n" + "=" * 60 + "\n"
 
 def batch_blocks(blocks, n):
     for i in range(0, len(blocks), n):
@@ -75,15 +107,32 @@ def build_prompt(batch):
     )
     return intro + "\n\n".join("\n".join(block) for block in batch)
 
+llm_usage = {"calls": 0, "errors": 0, "prompt_tokens": 0, "completion_tokens": 0, "seconds": 0.0}
+
 def call_openai(prompt):
-    response = client.chat.completions.create(
-        model=MODEL,
-        messages=[
-            {"role": "system", "content": "You are a helpful assistant."},
-            {"role": "user", "content": prompt}
-        ],
-        temperature=0.3
-    )
+    started = time_module.perf_counter()
+    try:
+        response = client.chat.completions.create(
+            model=MODEL,
+            messages=[
+                {"role": "system", "content": "You are a helpful assistant."},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=0.3
+        )
+    except Exception:
+        OPENAI_SECONDS.observe(time_module.perf_counter() - started, model=MODEL, outcome="error")
+        raise
+    elapsed = time_module.perf_counter() - started
+    OPENAI_SECONDS.observe(elapsed, model=MODEL, outcome="ok")
+    llm_usage["calls"] += 1
+    llm_usage["seconds"] += elapsed
+    usage = getattr(response, "usage", None)
+    if usage is not None:
+        llm_usage["prompt_tokens"] += usage.prompt_tokens or 0
+        llm_usage["completion_tokens"] += usage.completion_tokens or 0
+        OPENAI_TOKENS.inc(usage.prompt_tokens or 0, model=MODEL, kind="prompt")
+        OPENAI_TOKENS.inc(usage.completion_tokens or 0, model=MODEL, kind="completion")
     return response.choices[0].message.content
 
 def extract_removed_ids(text):
@@ -97,7 +146,9 @@ def extract_removed_ids(text):
     return removed
 
 # === MAIN ===
-all_blocks = extract_blocks(INPUT_FILE)
+all_blocks = read_raw_blocks(INPUT_FILE)
+# Classify the newest ads first so a deadline cuts off the oldest ones.
+all_blocks.sort(key=block_timestamp, reverse=True)
 kept_blocks = []
 removed_blocks = {}
 total = len(all_blocks)
@@ -111,15 +162,21 @@ try:
 except Exception:
     pass
 
+deferred = []
 for batch in tqdm(list(batch_blocks(all_blocks, CHUNK_SIZE)), desc="Filtering via OpenAI"):
+    if PIPELINE_DEADLINE and time_module.time() >= PIPELINE_DEADLINE:
+        deferred.extend(filter(None, map(deferred_line, batch)))
+        continue
     prompt = build_prompt(batch)
     try:
         result = call_openai(prompt)
     except Exception as e:
         print("Error from OpenAI:", e)
+        llm_usage["errors"] += 1
         continue
 
     removed_ids = extract_removed_ids(result)
+    batch_kept = []
     for block in batch:
         header = next((line for line in block if line.startswith("Result")), None)
         if not header:
@@ -128,14 +185,15 @@ for batch in tqdm(list(batch_blocks(all_blocks, CHUNK_SIZE)), desc="Filtering vi
         if ad_id in removed_ids:
             removed_blocks[ad_id] = (block, removed_ids[ad_id])
         else:
-            kept_blocks.append(block)
+            batch_kept.append(block)
+    kept_blocks.extend(batch_kept)
     done += len(batch)
+    update = {"phase": "5/5 – Finálne filtrovanie", "done": done, "total": total}
+    if batch_kept:
+        # Published to the live result feed (/results/live) right away.
+        update["results"] = "".join(_format_kept_block(block) for block in batch_kept)
     try:
-        requests.post(
-            PROGRESS_URL,
-            json={"phase": "5/5 – Finálne filtrovanie", "done": done, "total": total},
-            timeout=3,
-        )
+        requests.post(PROGRESS_URL, json=update, timeout=3)
     except Exception:
         pass
 
@@ -166,21 +224,6 @@ def _append_blocks(filename, blocks, formatter):
             f.write(formatter(block))
 
 
-def _format_kept_block(block):
-    new_block = []
-    url = None
-
-    for line in block:
-        new_block.append(line)
-        if line.startswith("URL: "):
-            url = line[5:].strip()
-            timestamp = acquired_links.get(url)
-            if timestamp:
-                new_block.append(f"Timestamp: {timestamp}")
-
-    return "\n".join(new_block) + "\n" + "=" * 60 + "\n"
-
-
 def _format_removed_block(item):
     block, reason = item
     return "\n".join(block) + f"\nREASON: {reason}\n" + "=" * 60 + "\n"
@@ -203,6 +246,18 @@ _append_blocks(OUTPUT_FILE, kept_blocks, _format_kept_block)
 _append_blocks(REMOVED_FILE, removed_blocks.values(), _format_removed_block)
 
 print(f"\nFiltering complete. Kept: {len(kept_blocks)} | Removed: {len(removed_blocks)}")
+print(
+    f"OpenAI: {llm_usage['calls']} calls, {llm_usage['errors']} errors, "
+    f"{llm_usage['prompt_tokens']} prompt + {llm_usage['completion_tokens']} completion tokens"
+)
+llm_usage["seconds"] = round(llm_usage["seconds"], 2)
+report_stats("stage5", {"llm": dict(llm_usage, model=MODEL), "skipped_for_deadline": len(deferred)}, PROGRESS_URL)
+if deferred:
+    try:
+        append_deferred_links(deferred)
+        print(f"⏰ Deadline reached – {len(deferred)} oldest ads were not classified; the next run will.")
+    except Exception as exc:
+        print(f"❌ Could not record {len(deferred)} deferred ads: {exc}")
 try:
     requests.post(
         PROGRESS_URL,
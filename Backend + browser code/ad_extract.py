@@ -0,0 +1,192 @@
+import os
+import time
+
+from bs4 import BeautifulSoup
+
+try:
+    import lxml.html
+    from lxml import etree
+except Exception:  # pragma: no cover - optional fast path
+    lxml = None
+    etree = None
+
+# "lxml" (fast path, default) or "bs4". The BeautifulSoup extractor is also
+# used whenever lxml is unavailable or fails to parse a page.
+EXTRACTOR = os.getenv("AD_EXTRACTOR", "lxml").strip().lower()
+
+
+def _empty_record(url):
+    return {
+        "url": url,
+        "description": "N/A",
+        "name": "N/A",
+        "main_category": "N/A",
+        "sub_category": "N/A",
+        "zip_code": "N/A",
+        "city": "N/A",
+    }
+
+
+def _split_location(links, record):
+    if len(links) < 2:
+        return
+    first, second = links[0], links[1]
+    # First is ZIP (starts with digits), second is city
+    if first and first[0].isdigit():
+        record["zip_code"] = first
+        record["city"] = second
+    else:
+        # Fallback if order is ever flipped
+        record["city"] = first
+        record["zip_code"] = second
+
+
+def extract_ad_fields_bs4(html, url):
+    """Parse the fields stage 4 needs out of an ad page with BeautifulSoup."""
+
+    soup = BeautifulSoup(html, "html.parser")
+    record = _empty_record(url)
+
+    # --- Description ---
+    description = soup.find("div", class_="popisdetail")
+    if description:
+        record["description"] = description.get_text(strip=True)
+
+    # --- Name + ZIP + City (left side table) ---
+    left = soup.find("td", class_="listadvlevo")
+    if left:
+        inner = left.find("table")
+        if inner:
+            for tr in inner.find_all("tr"):
+                cells = tr.find_all("td")
+                if len(cells) < 2:
+                    continue
+
+                label = cells[0].get_text(strip=True).lower()
+
+                # HTML: <td> Meno: </td><td colspan="2"><b><a>NAME</a></b>...</td>
+                if label.startswith("meno"):
+                    b_tag = cells[1].find("b")
+                    if b_tag:
+                        record["name"] = b_tag.get_text(strip=True)
+
+                # HTML: <td>Lokalita:</td><td><img ...></td><td><a>040 11</a> <a>Košice</a></td>
+                if label.startswith("lokalita") and len(cells) >= 3:
+                    _split_location([a.get_text(strip=True) for a in cells[2].find_all("a")], record)
+
+    # --- Breadcrumbs: main & sub category ---
+    drobky = soup.find("div", class_="drobky")
+    if drobky:
+        links = drobky.find_all("a")
+        if len(links) >= 4:
+            record["main_category"] = links[2].get_text(strip=True)
+            record["sub_category"] = links[3].get_text(strip=True)
+
+    return record
+
+
+if etree is not None:
+    def _class_xpath(tag, name):
+        return etree.XPath(
+            f"(//{tag}[contains(concat(' ', normalize-space(@class), ' '), ' {name} ')])[1]"
+        )
+
+    _POPIS = _class_xpath("div", "popisdetail")
+    _LEFT = _class_xpath("td", "listadvlevo")
+    _DROBKY = _class_xpath("div", "drobky")
+    _FIRST_TABLE = etree.XPath("(.//table)[1]")
+    _ROWS = etree.XPath(".//tr")
+    _CELLS = etree.XPath(".//td")
+    _FIRST_B = etree.XPath("(.//b)[1]")
+    _LINKS = etree.XPath(".//a")
+    # Same strings BeautifulSoup's get_text returns: no comments, scripts or styles.
+    _TEXT = etree.XPath(".//text()[not(parent::script) and not(parent::style)]")
+
+
+def _text(el):
+    return "".join(part.strip() for part in _TEXT(el) if part.strip())
+
+
+def extract_ad_fields_lxml(html, url):
+    """Same record as :func:`extract_ad_fields_bs4`, using lxml and XPath."""
+
+    doc = lxml.html.document_fromstring(html)
+    record = _empty_record(url)
+
+    description = _POPIS(doc)
+    if description:
+        record["description"] = _text(description[0])
+
+    left = _LEFT(doc)
+    if left:
+        inner = _FIRST_TABLE(left[0])
+        if inner:
+            for tr in _ROWS(inner[0]):
+                cells = _CELLS(tr)
+                if len(cells) < 2:
+                    continue
+
+                label = _text(cells[0]).lower()
+
+                if label.startswith("meno"):
+                    b_tag = _FIRST_B(cells[1])
+                    if b_tag:
+                        record["name"] = _text(b_tag[0])
+
+                if label.startswith("lokalita") and len(cells) >= 3:
+                    _split_location([_text(a) for a in _LINKS(cells[2])], record)
+
+    drobky = _DROBKY(doc)
+    if drobky:
+        links = _LINKS(drobky[0])
+        if len(links) >= 4:
+            record["main_category"] = _text(links[2])
+            record["sub_category"] = _text(links[3])
+
+    return record
+
+
+EXTRACTORS = {"bs4": extract_ad_fields_bs4}
+if etree is not None:
+    EXTRACTORS["lxml"] = extract_ad_fields_lxml
+
+
+def extract_ad_fields(html, url, backend=None):
+    """Parse an ad page with the configured backend, falling back to BeautifulSoup."""
+
+    name = backend or EXTRACTOR
+    if name not in EXTRACTORS:
+        name = "bs4"
+    if name != "bs4":
+        try:
+            return EXTRACTORS[name](html, url)
+        except Exception as exc:
+            print(f"⚠️ {name} extractor failed for {url}: {exc}; falling back to BeautifulSoup")
+    return extract_ad_fields_bs4(html, url)
+
+
+def parse_ad_bytes(body, encoding, url):
+    """Decode and parse a fetched page; returns ``(record, cpu_seconds)``.
+
+    Module-level so stage 3 can run it in a ``ProcessPoolExecutor``.
+    """
+
+    started = time.process_time()
+    record = extract_ad_fields(body.decode(encoding, errors="replace"), url)
+    return record, time.process_time() - started
+
+
+def format_result_block(result):
+    """Render a record as a ``scraped_results.txt`` block."""
+
+    return (
+        f"Result #{result['index']}\n"
+        f"URL: {result['url']}\n"
+        f"Name: {result['name']}\n"
+        f"Description: {result['description']}\n"
+        f"Main Category: {result['main_category']}\n"
+        f"Sub Category: {result['sub_category']}\n"
+        f"ZIP: {result['zip_code']}\n"
+        f"City: {result['city']}\n"
+        + "=" * 60 + "\n"
+    )
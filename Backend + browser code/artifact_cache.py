@@ -0,0 +1,186 @@
+"""Content-addressed cache of pipeline stage outputs.
+
+Each stage declares the files it reads, the code it runs and any other
+parameters that change its output. The hash of all of them names a directory
+``Data/cache/<stage>/<hash>/`` holding copies of the stage's output files, so
+a later run with byte-identical inputs restores those files instead of running
+the stage again. Stage 1 talks to the live sitemap and is never cached.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import time
+
+DATA_DIR = "Data"
+CACHE_DIR = os.getenv("ARTIFACT_CACHE_DIR", os.path.join(DATA_DIR, "cache"))
+CACHE_ENABLED = os.getenv("ARTIFACT_CACHE", "1").strip() != "0"
+CACHE_KEEP = int(os.getenv("ARTIFACT_CACHE_KEEP", "3"))  # entries kept per stage
+MANIFEST = "manifest.json"
+
+_CODE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def _data(name):
+    return os.path.join(DATA_DIR, name)
+
+
+def _code(name):
+    return os.path.join(_CODE_DIR, name)
+
+
+def acquired_lines_for(path):
+    """``acquired_links.txt`` lines for the URLs that appear in ``path``.
+
+    Stage 5 only copies timestamps of the ads it receives, so hashing the whole
+    sitemap dump (which changes every run) would defeat the cache.
+    """
+
+    urls = set()
+    try:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("URL:"):
+                    urls.add(line[4:].strip())
+    except FileNotFoundError:
+        return b""
+    lines = []
+    try:
+        with open(_data("acquired_links.txt"), encoding="utf-8") as f:
+            for line in f:
+                if line.split(" ", 1)[0] in urls:
+                    lines.append(line.strip())
+    except FileNotFoundError:
+        pass
+    return "\n".join(sorted(lines)).encode("utf-8")
+
+
+# inputs: files read by the stage (the script itself included); params: env
+# vars that change its output; derived: callables returning extra input bytes.
+STAGES = {
+    "stage2": {
+        "inputs": [_code("2 - Local filtering.py"), _code("storage.py"), _data("new_links.txt")],
+        "params": [],
+        "outputs": [
+            _data("final_filtered_links.txt"),
+            _data("uninteresting_links.txt"),
+            _data("keyword_suggestions.txt"),
+        ],
+    },
+    "stage3": {
+        "inputs": [
+            _code("3 - Ad HTML scraper.py"),
+            _code("ad_extract.py"),
+            # Fetching: sessions, redirects and where a streamed download stops.
+            _code("http_client.py"),
+            _data("final_filtered_links.txt"),
+        ],
+        # ARCHIVE_HTML=1 forces full downloads, like AD_FETCH_MODE=full.
+        "params": ["AD_EXTRACTOR", "AD_FETCH_MODE", "ARCHIVE_HTML"],
+        "outputs": [_data("scraped_results.txt")],
+    },
+    "stage4": {
+        "inputs": [
+            _code("4 - Filter by description.py"),
+            _code("result_blocks.py"),
+            _code("storage.py"),
+            _data("scraped_results.txt"),
+        ],
+        "params": [],
+        "outputs": [
+            _data("phase2_filtered_links.txt"),
+            _data("phase2_removed.txt"),
+            _data("keyword_suggestions.txt"),
+        ],
+    },
+    "stage5": {
+        "inputs": [
+            _code("5 - OpenAI filtering.py"),
+            _code("result_blocks.py"),
+            _data("phase2_filtered_links.txt"),
+        ],
+        "params": [],
+        "derived": [lambda: acquired_lines_for(_data("phase2_filtered_links.txt"))],
+        "outputs": [
+            _data("phase3_filtered_links.txt"),
+            _data("phase3_removed.txt"),
+            _data("phase3_ready.flag"),
+        ],
+    },
+}
+
+
+def stage_hash(stage, extra=None):
+    """Hash of everything ``stage`` reads; ``extra`` holds values known only to the caller."""
+
+    spec = STAGES[stage]
+    digest = hashlib.sha256(stage.encode("utf-8"))
+    for path in spec["inputs"]:
+        digest.update(b"\0file\0" + os.path.basename(path).encode("utf-8") + b"\0")
+        try:
+            with open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(1 << 20), b""):
+                    digest.update(chunk)
+        except FileNotFoundError:
+            digest.update(b"\0missing\0")
+    for name in spec["params"]:
+        digest.update(f"\0env\0{name}={os.getenv(name, '')}".encode("utf-8"))
+    for derive in spec.get("derived", ()):
+        digest.update(b"\0derived\0" + derive())
+    if extra:
+        digest.update(b"\0extra\0" + json.dumps(extra, sort_keys=True).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _entry_dir(stage, key):
+    return os.path.join(CACHE_DIR, stage, key)
+
+
+def restore(stage, key):
+    """Copy cached outputs back into place; returns False on a miss."""
+
+    entry = _entry_dir(stage, key)
+    manifest_path = os.path.join(entry, MANIFEST)
+    if not os.path.exists(manifest_path):
+        return False
+    with open(manifest_path, encoding="utf-8") as f:
+        manifest = json.load(f)
+    if not all(os.path.exists(os.path.join(entry, name)) for name in manifest["outputs"]):
+        return False
+    for name, target in manifest["outputs"].items():
+        shutil.copyfile(os.path.join(entry, name), target)
+    os.utime(manifest_path)
+    return True
+
+
+def store(stage, key):
+    """Save the stage's current outputs under ``key`` and prune old entries."""
+
+    entry = _entry_dir(stage, key)
+    tmp = entry + ".tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    outputs = {}
+    for path in STAGES[stage]["outputs"]:
+        if os.path.exists(path):
+            name = os.path.basename(path)
+            shutil.copyfile(path, os.path.join(tmp, name))
+            outputs[name] = path
+    with open(os.path.join(tmp, MANIFEST), "w", encoding="utf-8") as f:
+        json.dump({"stage": stage, "created_at": time.time(), "outputs": outputs}, f, indent=2)
+    # The manifest marks a complete entry, so publish the directory in one rename.
+    shutil.rmtree(entry, ignore_errors=True)
+    os.replace(tmp, entry)
+    _prune(stage)
+
+
+def _prune(stage):
+    stage_dir = os.path.join(CACHE_DIR, stage)
+    entries = []
+    for name in os.listdir(stage_dir):
+        manifest_path = os.path.join(stage_dir, name, MANIFEST)
+        if os.path.exists(manifest_path):
+            entries.append((os.path.getmtime(manifest_path), name))
+    for _, name in sorted(entries, reverse=True)[CACHE_KEEP:]:
+        shutil.rmtree(os.path.join(stage_dir, name), ignore_errors=True)
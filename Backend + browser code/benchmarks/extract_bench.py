@@ -0,0 +1,106 @@
+"""Golden check and throughput benchmark for the ad-page extractors.
+
+Every fixture in ``fixtures/ads`` is parsed with each backend in
+``ad_extract.EXTRACTORS``; the records must match each other and the golden
+file ``fixtures/ads/expected.json``. Then each backend parses the corpus in a
+loop on one core and the pages per second are printed.
+
+    python benchmarks/extract_bench.py                 # check + benchmark
+    python benchmarks/extract_bench.py --update-golden # rewrite expected.json
+    python benchmarks/extract_bench.py --corpus DIR    # extra *.html pages
+"""
+
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ad_extract import EXTRACTORS, extract_ad_fields_bs4  # noqa: E402
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "ads")
+GOLDEN_FILE = os.path.join(FIXTURE_DIR, "expected.json")
+
+
+def load_corpus(extra_dirs):
+    pages = []
+    for directory in [FIXTURE_DIR, *extra_dirs]:
+        for path in sorted(glob.glob(os.path.join(directory, "*.html"))):
+            with open(path, encoding="utf-8") as f:
+                pages.append((os.path.basename(path), f.read()))
+    return pages
+
+
+def check_parity(pages, golden):
+    failures = 0
+    for name, html in pages:
+        url = f"https://reality.bazos.sk/inzerat/0/{name}"
+        records = {backend: fn(html, url) for backend, fn in EXTRACTORS.items()}
+        reference = records["bs4"]
+        for backend, record in records.items():
+            if record != reference:
+                failures += 1
+                print(f"❌ {name}: {backend} differs from bs4\n   {backend}: {record}\n   bs4: {reference}")
+        if name in golden and golden[name] != reference:
+            failures += 1
+            print(f"❌ {name}: bs4 differs from golden record\n   got: {reference}\n   expected: {golden[name]}")
+    return failures
+
+
+def benchmark(pages, seconds):
+    results = {}
+    for backend, fn in EXTRACTORS.items():
+        parsed = 0
+        started = time.perf_counter()
+        cpu_started = time.process_time()
+        while time.perf_counter() - started < seconds:
+            for name, html in pages:
+                fn(html, name)
+            parsed += len(pages)
+        cpu = time.process_time() - cpu_started
+        results[backend] = parsed / cpu if cpu else 0.0
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", action="append", default=[], help="Extra directory with *.html ad pages")
+    parser.add_argument("--seconds", type=float, default=2.0, help="Benchmark duration per backend")
+    parser.add_argument("--update-golden", action="store_true", help="Rewrite expected.json from the bs4 backend")
+    args = parser.parse_args()
+
+    pages = load_corpus(args.corpus)
+    if not pages:
+        print("No fixture pages found.")
+        return 1
+
+    if args.update_golden:
+        golden = {
+            name: extract_ad_fields_bs4(html, f"https://reality.bazos.sk/inzerat/0/{name}")
+            for name, html in pages
+            if os.path.exists(os.path.join(FIXTURE_DIR, name))
+        }
+        with open(GOLDEN_FILE, "w", encoding="utf-8") as f:
+            json.dump(golden, f, ensure_ascii=False, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"Wrote {len(golden)} golden records to {GOLDEN_FILE}")
+
+    golden = {}
+    if os.path.exists(GOLDEN_FILE):
+        with open(GOLDEN_FILE, encoding="utf-8") as f:
+            golden = json.load(f)
+
+    failures = check_parity(pages, golden)
+    print(f"Parity: {len(pages)} pages, backends {', '.join(EXTRACTORS)}, {failures} mismatches")
+
+    for backend, rate in benchmark(pages, args.seconds).items():
+        print(f"{backend:>5}: {rate:8.1f} pages/s per core")
+
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
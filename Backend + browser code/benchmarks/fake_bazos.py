@@ -0,0 +1,204 @@
+"""Local stand-in for reality.bazos.sk used by the pipeline benchmark.
+
+Serves ``/sitemap.php`` listing the 13 ``sitemapdetail.php`` pages stage 1
+expects, each holding an equal share of ``--links`` synthetic ads, and
+templated ad pages at ``/inzerat/<id>/<slug>.php``. Ad pages can be delayed,
+fail with 503 at a given rate, or redirect to ``/`` the way deleted ads do.
+Everything is derived from the ad number, so runs are reproducible.
+
+    python benchmarks/fake_bazos.py --port 18100 --links 100000 --latency-ms 30 --error-rate 0.01
+"""
+
+import argparse
+import random
+import re
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SITEMAP_PAGES = 13
+FIRST_AD_ID = 100_000_000
+NEWEST = datetime(2025, 10, 1, 12, 0)
+
+SLUGS = (
+    "predam-3-izbovy-byt",
+    "rodinny-dom-na-predaj",
+    "prenajom-2-izboveho-bytu",
+    "stavebny-pozemok-na-predaj",
+    "predam-garaz",
+    "chata-na-predaj-pri-vode",
+    "dam-do-prenajmu-kancelariu",
+    "predam-2-izbovy-byt-po-rekonstrukcii",
+)
+DESCRIPTIONS = (
+    "Predám byt v tehlovom dome po kompletnej rekonštrukcii, nová kuchyňa a kúpeľňa.",
+    "Ponúkam na predaj rodinný dom so záhradou, garážou a dielňou. Cena dohodou.",
+    "Realitná kancelária ponúka na predaj exkluzívny pozemok v tichej lokalite.",
+    "Predám chatu pri vode, vhodná na rekreáciu aj celoročné bývanie.",
+    "Predám garáž v centre mesta, elektrina, montážna jama.",
+)
+CATEGORIES = (("Predaj", "Byty"), ("Predaj", "Domy"), ("Predaj", "Pozemky"), ("Predaj", "Chaty"))
+LOCATIONS = (("040 11", "Košice"), ("811 01", "Bratislava"), ("010 01", "Žilina"), ("080 01", "Prešov"))
+
+AD_TEMPLATE = """<!DOCTYPE html>
+<html lang="sk"><head><meta charset="utf-8"><title>{title} - Bazoš.sk</title>
+<script>window.dataLayer = window.dataLayer || [];</script></head>
+<body><div class="sirka"><div class="listalogo"><a href="/"><img src="/obrazky/bazos.svg" alt="Bazoš"></a></div>
+<div class="drobky"><a href="https://www.bazos.sk/">Bazoš.sk</a> &gt; <a href="/">Reality</a> &gt; <a href="/predam/">{main}</a> &gt; <a href="/predam/x/">{sub}</a> &gt; <h1 class="nadpisdetail">{title}</h1></div>
+<table class="listainzerat"><tr><td class="listadvlevo"><table>
+<tr><td class="listadvlevomod">Meno:</td><td colspan="2"><b><a href="/hodnotenie.php?idmail={ad_id}">Predajca {n}</a></b></td></tr>
+<tr><td>Lokalita:</td><td><img src="/obrazky/mapa.svg" width="16"></td><td><a href="/inzeraty/x/">{zip}</a> <a href="/inzeraty/y/">{city}</a></td></tr>
+<tr><td>Vložené:</td><td colspan="2">{posted}</td></tr>
+</table></td><td class="listadvpravo"><div class="flinavigace"><img src="/img/{n}.jpg"></div></td></tr></table>
+<div class="popisdetail">{description}<br>Inzerát číslo {n}.</div>
+<div class="podobne"><h2>Podobné inzeráty</h2>{similar}</div>
+<div class="listafooter"><a href="/podmienky.php">Podmienky</a> © 2025 Bazoš</div>
+<script src="/js/main.js"></script></div></body></html>
+"""
+SIMILAR = (
+    '<div class="inzeraty inzeratyflex"><div class="inzeratynadpis"><h2 class="nadpis">'
+    '<a href="/inzerat/{i}/podobny-{i}.php">Podobný inzerát {i}</a></h2>'
+    '<div class="popis">Krátky popis podobného inzerátu, lorem ipsum dolor sit amet.</div></div></div>'
+)
+
+_AD_PATH = re.compile(r"^/inzerat/(\d+)/")
+
+
+class FakeBazos:
+    def __init__(self, links, latency_ms=0.0, jitter_ms=0.0, error_rate=0.0, redirect_rate=0.0, seed=1):
+        self.links = links
+        self.latency = latency_ms / 1000
+        self.jitter = jitter_ms / 1000
+        self.error_rate = error_rate
+        self.redirect_rate = redirect_rate
+        self.seed = seed
+        self._sitemaps = {}
+        self._lock = threading.Lock()
+        self.counts = {"sitemap": 0, "ads": 0, "errors": 0, "redirects": 0}
+
+    def ad_url(self, base, n):
+        # Stage 2 keys ads by slug, so every slug carries the ad number.
+        return f"{base}/inzerat/{FIRST_AD_ID + n}/{SLUGS[n % len(SLUGS)]}-{n}.php"
+
+    def sitemap_index(self, base):
+        locs = "".join(
+            f"<sitemap><loc>{base}/sitemapdetail.php?p={page}</loc></sitemap>" for page in range(SITEMAP_PAGES)
+        )
+        return f'<?xml version="1.0" encoding="UTF-8"?><sitemapindex>{locs}</sitemapindex>'.encode()
+
+    def sitemap_page(self, base, page):
+        with self._lock:
+            cached = self._sitemaps.get((base, page))
+        if cached is not None:
+            return cached
+        per_page = -(-self.links // SITEMAP_PAGES)
+        parts = ['<?xml version="1.0" encoding="UTF-8"?><urlset>']
+        for n in range(page * per_page, min((page + 1) * per_page, self.links)):
+            lastmod = (NEWEST - timedelta(minutes=n)).strftime("%Y-%m-%dT%H:%M:%S+02:00")
+            parts.append(f"<url><loc>{self.ad_url(base, n)}</loc><lastmod>{lastmod}</lastmod></url>")
+        parts.append("</urlset>")
+        body = "".join(parts).encode()
+        with self._lock:
+            self._sitemaps[(base, page)] = body
+        return body
+
+    def ad_page(self, n):
+        main, sub = CATEGORIES[n % len(CATEGORIES)]
+        zip_code, city = LOCATIONS[(n // 3) % len(LOCATIONS)]
+        return AD_TEMPLATE.format(
+            title=SLUGS[n % len(SLUGS)].replace("-", " ").capitalize(),
+            main=main,
+            sub=sub,
+            ad_id=FIRST_AD_ID + n,
+            n=n,
+            zip=zip_code,
+            city=city,
+            posted=(NEWEST - timedelta(minutes=n)).strftime("%d.%m. %Y"),
+            description=DESCRIPTIONS[n % len(DESCRIPTIONS)],
+            similar="".join(SIMILAR.format(i=FIRST_AD_ID + n + k) for k in range(1, 21)),
+        ).encode()
+
+    def is_deleted(self, n):
+        return random.Random(self.seed * 1_000_003 + n).random() < self.redirect_rate
+
+    def _count(self, key):
+        with self._lock:
+            self.counts[key] += 1
+
+
+def make_handler(fake):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _send(self, status, body=b"", content_type="text/html; charset=utf-8", headers=()):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in headers:
+                self.send_header(name, value)
+            self.end_headers()
+            if self.command != "HEAD":
+                self.wfile.write(body)
+
+        def do_GET(self):
+            base = f"http://{self.headers.get('Host', '127.0.0.1')}"
+            if self.path == "/sitemap.php":
+                fake._count("sitemap")
+                return self._send(200, fake.sitemap_index(base), "application/xml")
+            if self.path.startswith("/sitemapdetail.php"):
+                fake._count("sitemap")
+                page = int(self.path.rsplit("=", 1)[-1])
+                return self._send(200, fake.sitemap_page(base, page), "application/xml")
+
+            match = _AD_PATH.match(self.path)
+            if not match:
+                return self._send(200, b"<html><body>Reality</body></html>")
+            n = int(match.group(1)) - FIRST_AD_ID
+            if fake.latency or fake.jitter:
+                time.sleep(max(0.0, fake.latency + random.uniform(-fake.jitter, fake.jitter)))
+            if fake.is_deleted(n):
+                fake._count("redirects")
+                return self._send(302, headers=(("Location", "/"),))
+            if random.random() < fake.error_rate:
+                fake._count("errors")
+                return self._send(503, b"Service Unavailable")
+            fake._count("ads")
+            return self._send(200, fake.ad_page(n))
+
+        do_HEAD = do_GET
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+def serve(port, fake):
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(fake))
+    server.daemon_threads = True
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=18100)
+    parser.add_argument("--links", type=int, default=10_000, help="Ads listed across the 13 sitemaps")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Delay before each ad page")
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of ad requests answered 503")
+    parser.add_argument("--redirect-rate", type=float, default=0.0, help="Fraction of ads that are deleted")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    fake = FakeBazos(args.links, args.latency_ms, args.jitter_ms, args.error_rate, args.redirect_rate, args.seed)
+    server = serve(args.port, fake)
+    print(f"Fake bazos with {args.links} ads on http://127.0.0.1:{args.port}/sitemap.php", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""Mock of the OpenAI chat completions endpoint used by the pipeline benchmark.
+
+``POST /v1/chat/completions`` answers with deterministic verdicts in the
+format stage 5 parses: every ad whose ``Result #`` number is divisible by
+``--remove-every`` is listed as removed. Token usage is estimated as one token
+per four characters. Point stage 5 at it with ``OPENAI_BASE_URL``.
+
+    python benchmarks/fake_openai.py --port 18101 --latency-ms 800
+"""
+
+import argparse
+import json
+import random
+import re
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+_RESULT = re.compile(r"^Result #(\d+)", re.M)
+
+
+def make_handler(latency, jitter, remove_every):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0) or 0))
+            if not self.path.rstrip("/").endswith("/chat/completions"):
+                return self._send(404, {"error": {"message": "not found"}})
+            request = json.loads(body or b"{}")
+            prompt = "\n".join(m.get("content", "") for m in request.get("messages", []))
+            if latency or jitter:
+                time.sleep(max(0.0, latency + random.uniform(-jitter, jitter)))
+
+            removed = [n for n in _RESULT.findall(prompt) if remove_every and int(n) % remove_every == 0]
+            content = "\n".join(f"#{n} AGENCY: synthetic verdict" for n in removed)
+            prompt_tokens = len(prompt) // 4
+            completion_tokens = len(content) // 4
+            self._send(200, {
+                "id": f"chatcmpl-bench-{time.time_ns()}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": request.get("model", "bench"),
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": content},
+                    "finish_reason": "stop",
+                }],
+                "usage": {
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": completion_tokens,
+                    "total_tokens": prompt_tokens + completion_tokens,
+                },
+            })
+
+        def _send(self, status, payload):
+            data = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+def serve(port, latency_ms=0.0, jitter_ms=0.0, remove_every=5):
+    server = ThreadingHTTPServer(
+        ("127.0.0.1", port), make_handler(latency_ms / 1000, jitter_ms / 1000, remove_every)
+    )
+    server.daemon_threads = True
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=18101)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--remove-every", type=int, default=5, help="Remove ads whose number divides by this")
+    args = parser.parse_args()
+
+    server = serve(args.port, args.latency_ms, args.jitter_ms, args.remove_every)
+    print(f"Fake OpenAI on http://127.0.0.1:{args.port}/v1", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+"""Minimal in-memory Redis stand-in for the ``STATE_BACKEND=redis`` store.
+
+Speaks RESP2, or RESP3 after ``HELLO 3``, and implements the commands ``state_store.RedisStateStore``
+uses: ``GET``, ``SET``, ``INCR``/``INCRBY``, ``DEL``, ``RPUSH``, ``LRANGE``, ``LLEN`` and
+optimistic transactions (``WATCH``/``MULTI``/``EXEC``). ``EXEC`` aborts when a
+watched key was written since ``WATCH``, like the real server, so the store's
+retry loop is exercised. Nothing is persisted.
+
+    python benchmarks/fake_redis.py --port 16379
+    REDIS_URL=redis://127.0.0.1:16379/0 STATE_BACKEND=redis gunicorn main:app ...
+"""
+
+import argparse
+import socketserver
+import threading
+
+
+class RespError(Exception):
+    pass
+
+
+class FakeRedis:
+    """Keyspace shared by all connections; one lock makes every command atomic."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.data = {}
+        # Bumped on every write of a key; WATCH remembers the value it saw.
+        self.versions = {}
+
+    def _touch(self, key):
+        self.versions[key] = self.versions.get(key, 0) + 1
+
+    def _string(self, key):
+        value = self.data.get(key)
+        if value is not None and not isinstance(value, bytes):
+            raise RespError("WRONGTYPE Operation against a key holding the wrong kind of value")
+        return value
+
+    def _list(self, key):
+        value = self.data.setdefault(key, [])
+        if not isinstance(value, list):
+            raise RespError("WRONGTYPE Operation against a key holding the wrong kind of value")
+        return value
+
+    def execute(self, name, args):
+        """Run one data command; the caller holds ``lock``."""
+        if name == "GET":
+            return self._string(args[0])
+        if name == "SET":
+            self.data[args[0]] = args[1]
+            self._touch(args[0])
+            return "OK"
+        if name in ("INCR", "INCRBY"):
+            value = int(self._string(args[0]) or 0) + (int(args[1]) if name == "INCRBY" else 1)
+            self.data[args[0]] = str(value).encode()
+            self._touch(args[0])
+            return value
+        if name == "DEL":
+            removed = 0
+            for key in args:
+                if self.data.pop(key, None) is not None:
+                    removed += 1
+                    self._touch(key)
+            return removed
+        if name == "RPUSH":
+            items = self._list(args[0])
+            items.extend(args[1:])
+            self._touch(args[0])
+            return len(items)
+        if name == "LLEN":
+            return len(self.data.get(args[0]) or [])
+        if name == "LRANGE":
+            items = self.data.get(args[0]) or []
+            start, stop = int(args[1]), int(args[2])
+            stop = len(items) if stop == -1 else stop + 1
+            return list(items[start:stop])
+        if name == "FLUSHALL":
+            for key in self.data:
+                self._touch(key)
+            self.data.clear()
+            return "OK"
+        raise RespError(f"ERR unknown command '{name}'")
+
+
+class _Map(dict):
+    pass
+
+
+def _encode(value, proto=2):
+    if isinstance(value, _Map):
+        return b"%%%d\r\n" % len(value) + b"".join(_encode(k, proto) + _encode(v, proto) for k, v in value.items())
+    if value is None:
+        return b"_\r\n" if proto == 3 else b"$-1\r\n"
+    if isinstance(value, RespError):
+        return f"-{value}\r\n".encode()
+    if isinstance(value, str):
+        return f"+{value}\r\n".encode()
+    if isinstance(value, int):
+        return f":{value}\r\n".encode()
+    if isinstance(value, bytes):
+        return b"$%d\r\n%s\r\n" % (len(value), value)
+    return b"*%d\r\n" % len(value) + b"".join(_encode(item, proto) for item in value)
+
+
+def make_handler(store):
+    class Handler(socketserver.StreamRequestHandler):
+        def _read_command(self):
+            line = self.rfile.readline()
+            if not line:
+                return None
+            if not line.startswith(b"*"):
+                return line.split()  # inline command, e.g. from telnet
+            args = []
+            for _ in range(int(line[1:])):
+                size = int(self.rfile.readline()[1:])
+                args.append(self.rfile.read(size + 2)[:-2])
+            return args
+
+        def handle(self):
+            watched, queued, proto = {}, None, 2
+            while True:
+                command = self._read_command()
+                if not command:
+                    return
+                name, args = command[0].decode().upper(), command[1:]
+                if name == "MULTI":
+                    queued, reply = [], "OK"
+                elif name == "EXEC":
+                    if queued is None:
+                        reply = RespError("ERR EXEC without MULTI")
+                    else:
+                        with store.lock:
+                            if any(store.versions.get(key, 0) != seen for key, seen in watched.items()):
+                                reply = None  # a watched key changed: abort
+                            else:
+                                reply = []
+                                for queued_name, queued_args in queued:
+                                    try:
+                                        reply.append(store.execute(queued_name, queued_args))
+                                    except RespError as exc:
+                                        reply.append(exc)
+                        watched, queued = {}, None
+                        if reply is None and proto == 2:
+                            self.wfile.write(b"*-1\r\n")
+                            continue
+                elif name == "DISCARD":
+                    watched, queued, reply = {}, None, "OK"
+                elif queued is not None:
+                    queued.append((name, args))
+                    reply = "QUEUED"
+                elif name == "WATCH":
+                    with store.lock:
+                        for key in args:
+                            watched.setdefault(key, store.versions.get(key, 0))
+                    reply = "OK"
+                elif name == "UNWATCH":
+                    watched, reply = {}, "OK"
+                elif name == "HELLO":
+                    # redis-py asks for RESP3, which differs from RESP2 in the
+                    # replies used here only by its null.
+                    proto = int(args[0]) if args else proto
+                    reply = _Map({b"server": b"redis", b"version": b"7.2.0", b"proto": proto, b"mode": b"standalone"})
+                elif name in ("PING", "SELECT", "CLIENT"):
+                    reply = "PONG" if name == "PING" else "OK"
+                else:
+                    try:
+                        with store.lock:
+                            reply = store.execute(name, args)
+                    except RespError as exc:
+                        reply = exc
+                self.wfile.write(_encode(reply, proto))
+
+    return Handler
+
+
+class _Server(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+def serve(port, store=None):
+    server = _Server(("127.0.0.1", port), make_handler(store or FakeRedis()))
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=16379)
+    args = parser.parse_args()
+
+    server = serve(args.port)
+    print(f"Fake Redis on redis://127.0.0.1:{args.port}/0", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,289 @@
+"""Failure-path checks for the pipeline stages against the local stand-ins.
+
+Each check runs in its own interpreter with a scratch copy of the backend
+(``Data`` included) and ``fake_bazos`` serving the ads, then asserts what the
+stage must do when something breaks:
+
+- ``parser_crash`` – a stage 3 parser process dies mid-run; the stage must
+  still finish (no hang on the outcome queue) and write what it parsed
+- ``deadline_deferral`` – stage 3 hits ``PIPELINE_DEADLINE``; the ads it did
+  not fetch are the oldest ones, are recorded in ``deferred_links.txt`` and
+  stage 1 of the next run queues them again
+- ``budget_deferral`` – stage 3 runs out of ``BYTE_BUDGET``; the ads it did not
+  fetch are recorded in ``deferred_links.txt``
+- ``nested_sections`` – ad descriptions contain a nested ``<div>``; streamed
+  downloads must still stop only after the whole description
+- ``archive_roundtrip`` – with ``ARCHIVE_HTML=1`` every archived page reads
+  back as the whole document the server sent, not a truncated download
+
+Exits 1 when a check fails.
+
+    python benchmarks/fault_checks.py
+    python benchmarks/fault_checks.py --only parser_crash
+"""
+
+import argparse
+import importlib.util
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import timedelta
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+import fake_bazos  # noqa: E402
+from pipeline_bench import _free_port, _start, prepare_workdir  # noqa: E402
+
+STAGE_TIMEOUT = 120
+CHECKS = {}
+
+
+def check(fn):
+    CHECKS[fn.__name__] = fn
+    return fn
+
+
+class CheckFailed(AssertionError):
+    pass
+
+
+def expect(condition, message):
+    if not condition:
+        raise CheckFailed(message)
+
+
+def _setup(links=40, latency_ms=0.0, **env):
+    """Scratch workdir with fake bazos; returns ``(bazos, base)``."""
+    bazos = fake_bazos.FakeBazos(links, latency_ms)
+    port = _free_port()
+    _start(fake_bazos.serve(port, bazos))
+    base = f"http://127.0.0.1:{port}"
+    workdir = tempfile.mkdtemp(prefix="inferno-check-")
+    prepare_workdir(workdir, bazos, base, links)
+    os.environ.update({
+        "LOCAL_MODE": "1",
+        "USE_STATIC_PROXIES": "1",
+        "BAZOS_SITEMAP_INDEX": f"{base}/sitemap.php",
+        # Nothing listens there; progress posts fail fast.
+        "PROGRESS_URL": f"http://127.0.0.1:{_free_port()}/progress_update",
+        "ARCHIVE_HTML": "0",
+        **env,
+    })
+    os.chdir(workdir)
+    sys.path.insert(0, workdir)
+    return bazos, base
+
+
+def _write_stage3_input(bazos, base, count):
+    with open(os.path.join("Data", "final_filtered_links.txt"), "w", encoding="utf-8") as f:
+        for n in range(count):
+            posted = fake_bazos.NEWEST - timedelta(minutes=n)
+            f.write(f"{bazos.ad_url(base, n)} {posted:%d/%m/%Y %H:%M}\n")
+
+
+def _load_stage(filename, name):
+    spec = importlib.util.spec_from_file_location(name, os.path.join(os.getcwd(), filename))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def _run_with_timeout(fn, timeout=STAGE_TIMEOUT):
+    outcome = {}
+
+    def target():
+        try:
+            fn()
+        except BaseException as exc:  # reported below
+            outcome["error"] = exc
+
+    thread = threading.Thread(target=target, daemon=True)
+    thread.start()
+    thread.join(timeout)
+    expect(not thread.is_alive(), f"stage still running after {timeout}s (hung)")
+    if "error" in outcome:
+        raise outcome["error"]
+
+
+def _result_urls(path):
+    return _result_field(path, "URL")
+
+
+def _result_field(path, name):
+    prefix = f"{name}: "
+    with open(path, encoding="utf-8") as f:
+        return [line[len(prefix):].strip() for line in f if line.startswith(prefix)]
+
+
+# Set in the parent before the parser processes are forked.
+_CRASH_URL = None
+
+
+def _crashing_parse(body, encoding, url):
+    from ad_extract import parse_ad_bytes
+
+    if url == _CRASH_URL:
+        os._exit(1)  # the parser process dies like an OOM kill would
+    return parse_ad_bytes(body, encoding, url)
+
+
+@check
+def parser_crash():
+    global _CRASH_URL
+    bazos, base = _setup()
+    _write_stage3_input(bazos, base, 40)
+    stage3 = _load_stage("3 - Ad HTML scraper.py", "stage3")
+    _CRASH_URL = bazos.ad_url(base, 20)
+    stage3.parse_ad_bytes = _crashing_parse
+    started = time.perf_counter()
+    _run_with_timeout(stage3.main)
+    kept = _result_urls(stage3.OUTPUT_FILE)
+    expect(_CRASH_URL not in kept, "the crashed ad was kept")
+    print(f"parser_crash: finished in {time.perf_counter() - started:.1f}s, kept {len(kept)} of 40 ads")
+
+
+@check
+def deadline_deferral():
+    links = 200
+    # 8 fetchers at 100 ms per ad need about 2.5 s for all of them; the deadline
+    # leaves them 1 s.
+    bazos, base = _setup(
+        links, latency_ms=100,
+        PIPELINE_DEADLINE=f"{time.time() + 10:.3f}", DEADLINE_RESERVE_SECONDS="9", STAGE5_SECONDS_PER_AD="0",
+    )
+    _write_stage3_input(bazos, base, links)
+    stage3 = _load_stage("3 - Ad HTML scraper.py", "stage3")
+    _run_with_timeout(stage3.main)
+
+    from storage import load_deferred_links
+
+    kept = _result_urls(stage3.OUTPUT_FILE)
+    deferred = load_deferred_links()
+    deferred_urls = [line.split()[0] for line in deferred]
+    expect(deferred, "nothing was deferred; the deadline did not cut the run short")
+    expect(kept, "nothing was kept before the deadline")
+    expect(not set(kept) & set(deferred_urls), "an ad was both kept and deferred")
+    expect(all(len(line.split()) == 3 for line in deferred), "a deferred line lost its lastmod")
+    lastmod = {bazos.ad_url(base, n): n for n in range(links)}  # higher n = older
+    expect(
+        max(lastmod[url] for url in kept) < min(lastmod[url] for url in deferred_urls),
+        "a deferred ad is newer than a kept one",
+    )
+
+    # The next run: every ad is in old_results.txt, so only deferred ones are new.
+    stage1 = _load_stage("1- Sitemap links.py", "stage1")
+    acquired, new = os.path.join("Data", "acquired_links.txt"), os.path.join("Data", "new_links.txt")
+    with open(acquired, "w", encoding="utf-8") as f:
+        for n in range(links):
+            f.write(f"{bazos.ad_url(base, n)} {fake_bazos.NEWEST - timedelta(minutes=n):%d/%m/%Y %H:%M}\n")
+    stage1.compare_links(acquired, acquired, new)
+    added = stage1.add_deferred_links(deferred, acquired, new)
+    expect(added == len(deferred), f"stage 1 re-queued {added} of {len(deferred)} deferred ads")
+    print(f"deadline_deferral: kept {len(kept)}, deferred {len(deferred)} of {links} ads, all re-queued")
+
+
+@check
+def budget_deferral():
+    links = 40
+    # An ad page is about 3 KiB; the budget covers a handful of them.
+    bazos, base = _setup(links, BYTE_BUDGET="20000", FETCH_WORKERS="2")
+    _write_stage3_input(bazos, base, links)
+    stage3 = _load_stage("3 - Ad HTML scraper.py", "stage3")
+    _run_with_timeout(stage3.main)
+
+    from storage import load_deferred_links
+
+    kept = _result_urls(stage3.OUTPUT_FILE)
+    deferred_urls = [line.split()[0] for line in load_deferred_links()]
+    expect(deferred_urls, "nothing was deferred; the budget did not stop the run")
+    expect(not set(kept) & set(deferred_urls), "an ad was both kept and deferred")
+    expect(len(set(deferred_urls)) == len(deferred_urls), "an ad was deferred twice")
+    print(f"budget_deferral: kept {len(kept)}, deferred {len(deferred_urls)} of {links} ads")
+
+
+@check
+def nested_sections():
+    tail = "Koniec popisu."
+    fake_bazos.DESCRIPTIONS = (f'Byt na predaj.<div class="poznamka">Bez realitky.</div>{tail}',)
+    bazos, base = _setup()
+    _write_stage3_input(bazos, base, 40)
+    stage3 = _load_stage("3 - Ad HTML scraper.py", "stage3")
+
+    # Fed a byte at a time, the tracker fires on the description's own </div>.
+    page = bazos.ad_page(0)
+    end = page.index(b"</div>", page.index(tail.encode())) + len(b"</div>")
+    tracker = stage3.SectionTracker()
+    fired = next((n for n in range(1, len(page) + 1) if tracker.complete(page[:n])), None)
+    expect(fired == end, f"sections reported complete at byte {fired}, the description ends at {end}")
+
+    _run_with_timeout(stage3.main)
+    descriptions = _result_field(stage3.OUTPUT_FILE, "Description")
+    expect(len(descriptions) == 40, f"kept {len(descriptions)} of 40 ads")
+    expect(all(tail in text for text in descriptions), "a description was cut at the nested </div>")
+    expect(stage3.stream_stats["truncated"] == 40, f"{stage3.stream_stats['truncated']} of 40 downloads stopped early")
+    print("nested_sections: stopped after the nested <div>, kept 40 full descriptions")
+
+
+@check
+def archive_roundtrip():
+    bazos, base = _setup(ARCHIVE_HTML="1")
+    _write_stage3_input(bazos, base, 40)
+    stage3 = _load_stage("3 - Ad HTML scraper.py", "stage3")
+    # Pages fit in one default chunk; smaller chunks let a streamed fetch stop early.
+    stage3.STREAM_CHUNK_SIZE = 1024
+    _run_with_timeout(stage3.main)
+
+    from html_archive import read_index, read_page
+
+    entries = read_index()
+    expect(len(entries) == 40, f"archived {len(entries)} of 40 pages")
+    pages = {bazos.ad_url(base, n): bazos.ad_page(n) for n in range(40)}
+    partial = [entry["url"] for entry in entries if read_page(entry) != pages[entry["url"]]]
+    expect(not partial, f"{len(partial)} archived pages differ from the served document, e.g. {partial[:1]}")
+    print("archive_roundtrip: 40 archived pages, each the full document")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--only", action="append", choices=sorted(CHECKS), help="Run just these checks")
+    parser.add_argument("--run", choices=sorted(CHECKS), help=argparse.SUPPRESS)
+    parser.add_argument("--verbose", action="store_true", help="Show the stages' own output")
+    args = parser.parse_args()
+
+    if args.run:
+        # A failed check may leave stage threads behind that would block a
+        # normal interpreter exit.
+        try:
+            CHECKS[args.run]()
+            code = 0
+        except CheckFailed as exc:
+            print(exc, file=sys.stderr)
+            code = 1
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os._exit(code)
+
+    failed = []
+    for name in args.only or sorted(CHECKS):
+        proc = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--run", name],
+            capture_output=not args.verbose,
+            text=True,
+        )
+        if proc.returncode == 0:
+            print(f"✅ {name}" + (f" – {proc.stdout.strip().splitlines()[-1]}" if proc.stdout else ""))
+        else:
+            failed.append(name)
+            # tqdm redraws with carriage returns; keep what came after the last one.
+            output = (proc.stderr or proc.stdout or "").replace("\r", "\n").strip().splitlines()
+            print(f"❌ {name}: {output[-1] if output else 'failed'}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+"""Microbenchmarks for the pure-Python parsers and filters, with a baseline.
+
+Times the hot helpers on synthetic corpora shaped like production data (built
+from ``fake_bazos``, so they are identical on every run):
+
+- ``parse_result_blocks_text`` / ``filter_results_by_params`` on a
+  ``phase3_results.txt`` history, and the same query on the results index
+  (the in-memory snapshot in front of the results database)
+- ``read_ad_blocks`` and ``tokenize`` (stage 4) on ``scraped_results.txt``
+- ``read_raw_blocks`` (stage 5) on ``phase2_filtered_links.txt``
+- ``parse_ad_entries`` (stage 1) on one ``sitemapdetail.php`` page
+- ``compare_links`` (stage 1) on the sitemap dump against ``old_results.txt``
+
+Each benchmark reports the best of ``--repeat`` rounds. ``--save`` writes the
+numbers to ``baseline.json``; ``--check`` compares against it and exits 1 when
+a benchmark is slower than the baseline by more than ``--threshold``.
+Baselines are machine specific, so save one on the machine you compare on.
+
+    python benchmarks/microbench.py --save              # record a baseline
+    python benchmarks/microbench.py --check             # fail on regressions
+    python benchmarks/microbench.py --only filter --repeat 20
+"""
+
+import argparse
+import gc
+import importlib.util
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from datetime import timedelta
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCH_DIR)
+BASELINE_FILE = os.path.join(BENCH_DIR, "baseline.json")
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+import fake_bazos  # noqa: E402
+from result_blocks import (  # noqa: E402
+    filter_results_by_params,
+    parse_result_blocks_text,
+    read_ad_blocks,
+    read_raw_blocks,
+    tokenize,
+)
+from results_index import ResultsIndex  # noqa: E402
+
+BASE = "https://reality.bazos.sk"
+
+
+def _load_stage1():
+    # The stage script creates ./Data on import; callers chdir first.
+    spec = importlib.util.spec_from_file_location("stage1", os.path.join(BACKEND_DIR, "1- Sitemap links.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def _record(fake, n):
+    main, sub = fake_bazos.CATEGORIES[n % len(fake_bazos.CATEGORIES)]
+    zip_code, city = fake_bazos.LOCATIONS[(n // 3) % len(fake_bazos.LOCATIONS)]
+    return {
+        "index": n + 1,
+        "url": fake.ad_url(BASE, n),
+        "name": fake_bazos.SLUGS[n % len(fake_bazos.SLUGS)].replace("-", " ").capitalize(),
+        "description": fake_bazos.DESCRIPTIONS[n % len(fake_bazos.DESCRIPTIONS)] * 3,
+        "main_category": main,
+        "sub_category": sub,
+        "zip_code": zip_code,
+        "city": city,
+    }
+
+
+def _scraped_block(record):
+    return (
+        f"Result #{record['index']}\nURL: {record['url']}\nName: {record['name']}\n"
+        f"Description: {record['description']}\nMain Category: {record['main_category']}\n"
+        f"Sub Category: {record['sub_category']}\nZIP: {record['zip_code']}\nCity: {record['city']}\n"
+        + "=" * 60 + "\n"
+    )
+
+
+def _phase3_block(record, n):
+    # Stage 5 adds the sitemap timestamp right after the URL line.
+    stamp = (fake_bazos.NEWEST - timedelta(minutes=7 * n)).strftime("%d/%m/%Y %H:%M")
+    url_line = f"URL: {record['url']}\n"
+    return _scraped_block(record).replace(url_line, f"{url_line}Timestamp: {stamp}\n", 1)
+
+
+def build_corpus(workdir, scale):
+    """Write the fixture files into ``workdir`` and return the in-memory inputs."""
+
+    ads = int(20_000 * scale)
+    fake = fake_bazos.FakeBazos(ads * 5)
+    records = [_record(fake, n) for n in range(ads)]
+
+    phase3_text = "".join(_phase3_block(record, n) for n, record in enumerate(records))
+    scraped = os.path.join(workdir, "scraped_results.txt")
+    with open(scraped, "w", encoding="utf-8") as f:
+        f.writelines(_scraped_block(record) for record in records[: ads // 4])
+    phase2 = os.path.join(workdir, "phase2_filtered_links.txt")
+    shutil.copyfile(scraped, phase2)
+
+    acquired = os.path.join(workdir, "acquired_links.txt")
+    old = os.path.join(workdir, "old_results.txt")
+    with open(acquired, "w", encoding="utf-8") as f_new, open(old, "w", encoding="utf-8") as f_old:
+        for n in range(fake.links):
+            url = fake.ad_url(BASE, n)
+            f_new.write(f"{url} 01/10/2025 12:00\n")
+            if n >= ads // 10:
+                f_old.write(url + "\n")
+
+    index = ResultsIndex(ttl=float("inf"), loader=lambda etag: (True, phase3_text, None))
+    index.query(set(), None, None)
+
+    return {
+        "phase3_text": phase3_text,
+        "parsed": parse_result_blocks_text(phase3_text),
+        "index": index,
+        "scraped": scraped,
+        "phase2": phase2,
+        "descriptions": [record["description"] for record in records[:2_000]],
+        "sitemap_xml": fake.sitemap_page(BASE, 0).decode(),
+        "acquired": acquired,
+        "old": old,
+        "new": os.path.join(workdir, "new_links.txt"),
+    }
+
+
+def benchmarks(corpus, stage1):
+    return {
+        "parse_result_blocks_text": lambda: parse_result_blocks_text(corpus["phase3_text"]),
+        "filter_results_all": lambda: filter_results_by_params(corpus["parsed"], set(), None, None),
+        "filter_results_subcat_range": lambda: filter_results_by_params(
+            corpus["parsed"], {"Byty", "Domy"}, "01/08/2025", "15/09/2025"
+        ),
+        "results_index_subcat_range": lambda: corpus["index"].query(
+            {"Byty", "Domy"}, "01/08/2025", "15/09/2025"
+        ),
+        "stage4_read_ad_blocks": lambda: read_ad_blocks(corpus["scraped"]),
+        "stage4_tokenize": lambda: [tokenize(text) for text in corpus["descriptions"]],
+        "stage5_read_raw_blocks": lambda: read_raw_blocks(corpus["phase2"]),
+        "stage1_parse_ad_entries": lambda: stage1.parse_ad_entries(corpus["sitemap_xml"]),
+        "stage1_compare_links": lambda: stage1.compare_links(corpus["old"], corpus["acquired"], corpus["new"]),
+    }
+
+
+def run(fn, repeat):
+    fn()  # warm up caches and the regex cache
+    best = float("inf")
+    for _ in range(repeat):
+        gc.collect()
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def check(results, baseline, threshold):
+    regressions = 0
+    for name, seconds in results.items():
+        reference = baseline.get(name)
+        if not reference:
+            print(f"   {name}: no baseline")
+            continue
+        ratio = seconds / reference
+        marker = "❌" if ratio > 1 + threshold else "✅"
+        regressions += ratio > 1 + threshold
+        print(f"{marker} {name}: {seconds * 1000:.2f} ms vs {reference * 1000:.2f} ms ({ratio:.2f}x)")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=7, help="Timed rounds per benchmark; the best counts")
+    parser.add_argument("--scale", type=float, default=1.0, help="Corpus size multiplier")
+    parser.add_argument("--only", help="Run benchmarks whose name contains this")
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    parser.add_argument("--save", action="store_true", help="Write the results as the new baseline")
+    parser.add_argument("--check", action="store_true", help="Exit 1 on regressions against the baseline")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Allowed slowdown, 0.25 = 25%%")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="inferno-microbench-")
+    cwd = os.getcwd()
+    try:
+        os.chdir(workdir)
+        corpus = build_corpus(workdir, args.scale)
+        stage1 = _load_stage1()
+        results = {}
+        for name, fn in benchmarks(corpus, stage1).items():
+            if args.only and args.only not in name:
+                continue
+            results[name] = run(fn, args.repeat)
+            print(f"{name:<30}{results[name] * 1000:>10.2f} ms")
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.save:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline, encoding="utf-8") as f:
+                baseline = json.load(f)
+        baseline.update(results)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"💾 Baseline written to {args.baseline}")
+
+    if args.check:
+        if not os.path.exists(args.baseline):
+            print(f"No baseline at {args.baseline}; run with --save first.")
+            return 1
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = check(results, json.load(f), args.threshold)
+        if regressions:
+            print(f"{regressions} benchmark(s) regressed by more than {args.threshold:.0%}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,167 @@
+"""End-to-end pipeline benchmark against local bazos and OpenAI stand-ins.
+
+Starts ``fake_bazos`` and ``fake_openai`` in this process, copies the backend
+into a scratch directory and runs stages 1–5 through
+``main._execute_new_scrape`` with ``LOCAL_MODE=1`` and direct requests. The
+per-stage numbers come from the run history (``telemetry.py``): wall and CPU
+time, peak RSS, items in/out and throughput.
+
+Only the newest ``--new-links`` ads are new to the run; the rest are written
+to ``old_results.txt`` first, as if a previous run had seen them.
+
+    python benchmarks/pipeline_bench.py --links 100000 --new-links 2000 --ad-latency-ms 30 --llm-latency-ms 500
+"""
+
+import argparse
+import json
+import os
+import shutil
+import socket
+import sys
+import tempfile
+import threading
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+import fake_bazos  # noqa: E402
+import fake_openai  # noqa: E402
+
+# Enough to exercise stage 2 (slug) and stage 4 (description) filtering.
+BENCH_KEYWORDS = """--- PRIMARY AGENCY KEYWORDS ---
+realitná kancelária
+--- PRIMARY RENT/OTHER KEYWORDS ---
+prenajom
+prenajmu
+--- FILLER WORDS ---
+na
+"""
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _start(server):
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def prepare_workdir(workdir, bazos, base, new_links):
+    shutil.copytree(
+        BACKEND_DIR,
+        workdir,
+        ignore=shutil.ignore_patterns("Data", "benchmarks", "static", "__pycache__", "*.html"),
+        dirs_exist_ok=True,
+    )
+    data = os.path.join(workdir, "Data")
+    os.makedirs(data, exist_ok=True)
+    with open(os.path.join(data, "keywords.txt"), "w", encoding="utf-8") as f:
+        f.write(BENCH_KEYWORDS)
+    with open(os.path.join(data, "old_results.txt"), "w", encoding="utf-8") as f:
+        for n in range(new_links, bazos.links):
+            f.write(bazos.ad_url(base, n) + "\n")
+
+
+def report(run, fake_counts, wall):
+    print(f"\n{'stage':<8}{'wall s':>9}{'cpu s':>9}{'peak MiB':>10}{'in':>9}{'out':>9}{'items/s':>10}")
+    for stage in run["stages"]:
+        wall_s = stage["wall_seconds"] or 0.0
+        rate = (stage["items_in"] or stage["items_out"] or 0) / wall_s if wall_s else 0.0
+        peak = (stage["max_rss_kb"] or 0) / 1024
+        print(
+            f"{stage['stage']:<8}{wall_s:>9.2f}{stage['cpu_seconds'] or 0:>9.2f}{peak:>10.1f}"
+            f"{stage['items_in'] if stage['items_in'] is not None else '-':>9}"
+            f"{stage['items_out'] if stage['items_out'] is not None else '-':>9}{rate:>10.1f}"
+        )
+    cpu = sum(stage["cpu_seconds"] or 0 for stage in run["stages"])
+    wire = sum(stage["wire_bytes"] or 0 for stage in run["stages"])
+    tokens = sum((stage["prompt_tokens"] or 0) + (stage["completion_tokens"] or 0) for stage in run["stages"])
+    peak = max(((stage["max_rss_kb"] or 0) for stage in run["stages"]), default=0) / 1024
+    print(
+        f"\nTotal: {wall:.1f}s wall, {cpu:.1f}s CPU, peak {peak:.0f} MiB, {wire / 1024 / 1024:.1f} MiB on the wire, "
+        f"{tokens} LLM tokens, {run['results']} results"
+    )
+    print(f"Fake bazos served: {fake_counts}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--links", type=int, default=10_000, help="Ads in the synthetic sitemaps")
+    parser.add_argument("--new-links", type=int, default=1_000, help="Ads not seen by the previous run")
+    parser.add_argument("--ad-latency-ms", type=float, default=20.0)
+    parser.add_argument("--ad-jitter-ms", type=float, default=10.0)
+    parser.add_argument("--ad-error-rate", type=float, default=0.0)
+    parser.add_argument("--redirect-rate", type=float, default=0.02, help="Fraction of deleted ads")
+    parser.add_argument("--llm-latency-ms", type=float, default=200.0)
+    parser.add_argument("--workdir", help="Scratch directory (default: a new temporary one)")
+    parser.add_argument("--keep", action="store_true", help="Keep the scratch directory")
+    parser.add_argument("--json", help="Also write the run record to this file")
+    parser.add_argument("--verbose", action="store_true", help="Show the stages' own output")
+    args = parser.parse_args()
+
+    bazos = fake_bazos.FakeBazos(
+        args.links, args.ad_latency_ms, args.ad_jitter_ms, args.ad_error_rate, args.redirect_rate
+    )
+    bazos_port, openai_port, backend_port = _free_port(), _free_port(), _free_port()
+    _start(fake_bazos.serve(bazos_port, bazos))
+    _start(fake_openai.serve(openai_port, args.llm_latency_ms))
+    base = f"http://127.0.0.1:{bazos_port}"
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="inferno-bench-")
+    prepare_workdir(workdir, bazos, base, min(args.new_links, args.links))
+    os.environ.update({
+        "LOCAL_MODE": "1",
+        "USE_STATIC_PROXIES": "1",
+        "BAZOS_SITEMAP_INDEX": f"{base}/sitemap.php",
+        "OPENAI_BASE_URL": f"http://127.0.0.1:{openai_port}/v1",
+        "OPENAI_API_KEY": "bench",
+        "ARTIFACT_CACHE": "0",
+        "WARM_START": "0",
+        "PORT": str(backend_port),
+    })
+    os.chdir(workdir)
+    sys.path.insert(0, workdir)
+
+    import main as backend  # noqa: E402 - must see the environment above
+    from werkzeug.serving import make_server
+
+    _start(make_server("127.0.0.1", backend_port, backend.app, threaded=True))
+
+    params = {key: value for key, value in vars(args).items() if key not in ("workdir", "json")}
+    run_id = backend._start_run("bench", params)
+    backend.set_job_state(status="running", run_id=run_id, stats={}, bandwidth={"budget": 0})
+    print(f"Benchmark run {run_id}: {args.links} sitemap links, {args.new_links} new, workdir {workdir}")
+
+    stdout, stderr = sys.stdout, sys.stderr
+    if not args.verbose:
+        sys.stdout = sys.stderr = open(os.devnull, "w")
+    started = time.perf_counter()
+    try:
+        results = backend._execute_new_scrape()
+        backend._finish_run("finished", results=len(results))
+    except Exception as exc:
+        backend._finish_run("failed", error=str(exc))
+        raise
+    finally:
+        if sys.stdout is not stdout:
+            sys.stdout.close()
+            sys.stdout, sys.stderr = stdout, stderr
+    wall = time.perf_counter() - started
+
+    run = backend.telemetry.get_run(run_id)
+    report(run, bazos.counts, wall)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(run, f, indent=2, default=str)
+    if not args.keep and not args.workdir:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
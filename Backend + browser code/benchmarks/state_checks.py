@@ -0,0 +1,180 @@
+"""Consistency checks for the shared state store backends.
+
+Runs the same checks against ``SQLiteStateStore`` (scratch file) and
+``RedisStateStore`` (against ``fake_redis``, or a real server with
+``--redis-url``), with several processes writing at once like gunicorn
+workers do:
+
+- ``update`` – concurrent read-modify-write increments lose nothing
+- ``push`` – concurrent appends to one list keep every item
+- ``setdefault`` – concurrent first writers all see the same stored value
+- ``version`` – every write moves the version the workers poll
+- ``feed`` – workers publishing overlapping results to one live feed
+  (``events.ResultFeed``) add each URL once, and nothing after it is closed
+
+The Redis backend needs the ``redis`` package (``pip install redis``); without
+it the Redis checks are reported as skipped. Exits 1 when a check fails.
+
+    python benchmarks/state_checks.py
+    python benchmarks/state_checks.py --backend redis --redis-url redis://127.0.0.1:6379/15
+"""
+
+import argparse
+import importlib.util
+import multiprocessing
+import os
+import sys
+import tempfile
+import uuid
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+import state_store  # noqa: E402
+from events import ResultFeed  # noqa: E402
+from pipeline_bench import _free_port, _start  # noqa: E402
+
+WORKERS = 6
+ROUNDS = 50
+
+
+def _open(backend, target):
+    if backend == "redis":
+        url, prefix = target
+        return state_store.RedisStateStore(url, prefix)
+    return state_store.SQLiteStateStore(target)
+
+
+def _increment(args):
+    backend, target = args
+    store = _open(backend, target)
+    for _ in range(ROUNDS):
+        store.update("counter", lambda value: value + 1, 0)
+
+
+def _append(args):
+    backend, target, worker = args
+    store = _open(backend, target)
+    for n in range(ROUNDS):
+        store.push("feed", [{"worker": worker, "n": n}])
+
+
+def _claim(args):
+    backend, target, worker = args
+    return _open(backend, target).setdefault("secret", f"worker-{worker}")
+
+
+def _publish(args):
+    backend, target, worker = args
+    feed = ResultFeed(_open(backend, target))
+    # Every worker publishes every URL, a batch at a time, in its own order.
+    urls = [f"https://reality.bazos.sk/inzerat/{n}/" for n in range(ROUNDS)]
+    urls = urls[worker:] + urls[:worker]
+    for start in range(0, ROUNDS, 5):
+        feed.publish("job", [{"url": url} for url in urls[start:start + 5]])
+
+
+def _in_workers(fn, args):
+    with multiprocessing.get_context("spawn").Pool(WORKERS) as pool:
+        return pool.map(fn, args)
+
+
+def check_update(backend, target):
+    _in_workers(_increment, [(backend, target)] * WORKERS)
+    value = _open(backend, target).get("counter")
+    return value == WORKERS * ROUNDS, f"counter is {value}, expected {WORKERS * ROUNDS}"
+
+
+def check_push(backend, target):
+    _in_workers(_append, [(backend, target, worker) for worker in range(WORKERS)])
+    items = _open(backend, target).range("feed")
+    per_worker = {worker: [item["n"] for item in items if item["worker"] == worker] for worker in range(WORKERS)}
+    ok = len(items) == WORKERS * ROUNDS and all(ns == list(range(ROUNDS)) for ns in per_worker.values())
+    return ok, f"{len(items)} items, expected {WORKERS * ROUNDS} in per-worker order"
+
+
+def check_setdefault(backend, target):
+    seen = set(_in_workers(_claim, [(backend, target, worker) for worker in range(WORKERS)]))
+    stored = _open(backend, target).get("secret")
+    return seen == {stored}, f"workers saw {sorted(seen)}, stored {stored!r}"
+
+
+def check_version(backend, target):
+    store = _open(backend, target)
+    versions = [store.version()]
+    store.set("key", 1)
+    versions.append(store.version())
+    store.update("key", lambda value: None)  # no write, no bump
+    versions.append(store.version())
+    store.update("key", lambda value: value + 1)
+    versions.append(store.version())
+    store.delete("key")
+    versions.append(store.version())
+    a, b, c, d, e = versions
+    ok = a < b == c < d < e and store.get("key", "gone") == "gone"
+    return ok, f"versions {versions}"
+
+
+def check_feed(backend, target):
+    feed = ResultFeed(_open(backend, target))
+    feed.open("job")
+    _in_workers(_publish, [(backend, target, worker) for worker in range(WORKERS)])
+    feed.close("job")
+    late = feed.publish("job", [{"url": "https://reality.bazos.sk/inzerat/late/"}])
+    items, closed = feed.read("job")
+    urls = [item["url"] for item in items]
+    ok = len(urls) == len(set(urls)) == ROUNDS and closed and not late
+    return ok, f"{len(urls)} items for {len(set(urls))} URLs, expected {ROUNDS}; closed={closed}, late={late}"
+
+
+CHECKS = {
+    "update": check_update,
+    "push": check_push,
+    "setdefault": check_setdefault,
+    "version": check_version,
+    "feed": check_feed,
+}
+
+
+def _targets(backends, redis_url):
+    """``(backend, target factory)``; each check gets a fresh keyspace."""
+    if "sqlite" in backends:
+        workdir = tempfile.mkdtemp(prefix="inferno-state-")
+        yield "sqlite", lambda name: os.path.join(workdir, f"{name}.sqlite")
+    if "redis" in backends:
+        if importlib.util.find_spec("redis") is None:
+            print("⏭️  redis: skipped, the redis package is not installed")
+            return
+        if not redis_url:
+            import fake_redis
+
+            port = _free_port()
+            _start(fake_redis.serve(port))
+            redis_url = f"redis://127.0.0.1:{port}/0"
+        prefix = f"inferno-check-{uuid.uuid4().hex[:8]}:"
+        yield "redis", lambda name: (redis_url, f"{prefix}{name}:")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", action="append", choices=["sqlite", "redis"], help="Check just these backends")
+    parser.add_argument("--redis-url", help="Check a real Redis server instead of fake_redis")
+    args = parser.parse_args()
+
+    failed = []
+    for backend, target in _targets(args.backend or ["sqlite", "redis"], args.redis_url):
+        for name, fn in CHECKS.items():
+            try:
+                ok, detail = fn(backend, target(name))
+            except Exception as exc:
+                ok, detail = False, f"{type(exc).__name__}: {exc}"
+            print(f"{'✅' if ok else '❌'} {backend}/{name}" + ("" if ok else f": {detail}"))
+            if not ok:
+                failed.append(f"{backend}/{name}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,90 @@
+"""Response compression and ETag matching for the results endpoints.
+
+JSON responses of at least ``COMPRESS_MIN_BYTES`` are sent brotli- or
+gzip-encoded when the client accepts it (brotli only if the ``brotli`` package
+is installed). A compressed response's ETag gets the encoding as a suffix, so
+every representation keeps a distinct strong validator; :func:`matched_encoding`
+strips it again when comparing ``If-None-Match``. Handlers that cache their
+responses can cache the compressed bytes too (:func:`pick_encoding`,
+:func:`encode`, :func:`mark_encoded`) so a repeat is not compressed again.
+"""
+
+import gzip
+import os
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli is optional
+    brotli = None
+
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "1024"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+# Quality 5 compresses JSON better than gzip -9 at a fraction of brotli's max cost.
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "5"))
+
+COMPRESSIBLE_TYPES = {"application/json"}
+
+
+def _encoders():
+    if brotli is not None:
+        yield "br", lambda data: brotli.compress(data, quality=BROTLI_QUALITY)
+    yield "gzip", lambda data: gzip.compress(data, compresslevel=GZIP_LEVEL)
+
+
+def pick_encoding(accept_encodings, size=None):
+    """The best encoding the client accepts for a ``size``-byte body, or ``None`` to send it as is."""
+    if size is not None and size < COMPRESS_MIN_BYTES:
+        return None
+    for encoding, _ in _encoders():
+        if accept_encodings.quality(encoding) > 0:
+            return encoding
+    return None
+
+
+def encode(data, encoding):
+    """``data`` compressed with ``encoding`` (one :func:`pick_encoding` returned)."""
+    return dict(_encoders())[encoding](data)
+
+
+def mark_encoded(response, encoding):
+    """Label a response whose body is already ``encoding``-compressed."""
+    response.headers["Content-Encoding"] = encoding
+    response.vary.add("Accept-Encoding")
+    etag, weak = response.get_etag()
+    if etag:
+        response.set_etag(f"{etag}-{encoding}", weak=weak)
+    return response
+
+
+def compress_response(response, accept_encodings):
+    """Encode ``response`` in place with the best encoding the client accepts."""
+    if (
+        response.status_code != 200
+        or response.direct_passthrough
+        or response.is_streamed
+        or "Content-Encoding" in response.headers
+        or response.mimetype not in COMPRESSIBLE_TYPES
+    ):
+        return response
+    response.vary.add("Accept-Encoding")
+    encoding = pick_encoding(accept_encodings, response.content_length)
+    if encoding is None:
+        return response
+    response.set_data(encode(response.get_data(), encoding))
+    return mark_encoded(response, encoding)
+
+
+def matched_encoding(if_none_match, etag):
+    """The encoding of the first ``If-None-Match`` tag naming ``etag``.
+
+    ``None`` for the unencoded tag (or ``*``), ``False`` when none matches.
+    """
+    if if_none_match.star_tag:
+        return None
+    for tag in if_none_match.as_set():
+        for encoding in ("br", "gzip"):
+            if tag == f"{etag}-{encoding}":
+                return encoding
+        if tag == etag:
+            return None
+    return False
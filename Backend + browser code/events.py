@@ -0,0 +1,114 @@
+"""Change notification for the streaming (Server-Sent Events) endpoints.
+
+Writers call :meth:`ChangeSignal.bump`; each open stream waits on the signal
+instead of polling, so an idle client costs nothing but a heartbeat. Under
+gunicorn's gevent worker the wait only parks a greenlet, not a thread.
+"""
+
+import json
+import threading
+
+from result_blocks import response_record
+
+
+class ChangeSignal:
+    """A version counter that waiters can block on until it moves."""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self.version = 0
+
+    def bump(self):
+        with self._cond:
+            self.version += 1
+            self._cond.notify_all()
+
+    def wait(self, seen, timeout):
+        """Return the current version once it differs from ``seen`` or ``timeout`` passes."""
+        with self._cond:
+            self._cond.wait_for(lambda: self.version != seen, timeout)
+            return self.version
+
+
+class ResultFeed:
+    """Results published per job while the job runs, for ``/results/live``.
+
+    Kept in the shared state store, so a stream opened on one worker sees what
+    stage 5 posted to another. Each job has one document with an append-only
+    ``items`` list and a ``closed`` flag; every change is a single store
+    update, so publishers on different workers cannot add the same URL twice.
+    A reader only needs the index of the next item it has not sent. Only the
+    newest ``keep`` jobs are retained.
+    """
+
+    def __init__(self, store, keep=3):
+        self.store = store
+        self.keep = keep
+        self.changes = ChangeSignal()
+
+    def open(self, job_id):
+        evicted = []
+
+        def register(job_ids):
+            job_ids.append(job_id)
+            evicted.extend(job_ids[:-self.keep])
+            return job_ids[-self.keep:]
+
+        self.store.update("feeds", register, [])
+        if evicted:
+            self.store.delete(*(f"live_feed:{old}" for old in evicted))
+        self.store.set(f"live_feed:{job_id}", {"items": [], "closed": False})
+        self.changes.bump()
+
+    def publish(self, job_id, results):
+        """Append the results whose URL the job has not published yet."""
+        records = [response_record(result) for result in results]
+        added = []
+
+        def append(feed):
+            del added[:]  # Redis reruns this when another worker wrote first
+            if feed is None or feed["closed"]:
+                return None
+            published = {item.get("url") for item in feed["items"]}
+            for record in records:
+                if record["url"] not in published:
+                    published.add(record["url"])
+                    added.append(record)
+            if not added:
+                return None
+            feed["items"].extend(added)
+            return feed
+
+        self.store.update(f"live_feed:{job_id}", append)
+        if added:
+            self.changes.bump()
+        return len(added)
+
+    def close(self, job_id):
+        self.store.update(f"live_feed:{job_id}", lambda feed: None if feed is None else dict(feed, closed=True))
+        self.changes.bump()
+
+    def read(self, job_id, start=0):
+        """``(items from start, closed)``, or ``None`` for an unknown job."""
+        feed = self.store.get(f"live_feed:{job_id}")
+        if feed is None:
+            return None
+        return feed["items"][start:], feed["closed"]
+
+
+def sse_message(data, event=None, event_id=None):
+    """One ``text/event-stream`` message carrying ``data`` as JSON."""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    if event:
+        lines.append(f"event: {event}")
+    lines.append("data: " + (data if isinstance(data, str) else json.dumps(data)))
+    return "\n".join(lines) + "\n\n"
+
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    # Keep reverse proxies (nginx, Railway's edge) from buffering the stream.
+    "X-Accel-Buffering": "no",
+}
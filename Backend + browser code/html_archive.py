@@ -0,0 +1,178 @@
+"""Append-only archive of fetched ad pages for offline re-extraction.
+
+Stage 3 appends every downloaded page when ``ARCHIVE_HTML=1``. Each page is
+compressed on its own (zstd when the ``zstandard`` package is installed,
+gzip otherwise) and appended to a monthly segment file; ``index.tsv`` records
+ad ID, fetch time, URL and the byte range, so pages can be read in parallel.
+
+Rebuild ``scraped_results.txt`` from the archive without network access::
+
+    python html_archive.py reextract [--output FILE] [--workers N] [--since YYYY-MM-DD]
+"""
+
+import argparse
+import gzip
+import os
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+try:
+    import zstandard  # type: ignore
+except Exception:  # pragma: no cover - optional dep
+    zstandard = None
+
+DATA_DIR = "Data"
+ARCHIVE_DIR = os.getenv("HTML_ARCHIVE_DIR", os.path.join(DATA_DIR, "html_archive"))
+ARCHIVE_ENABLED = os.getenv("ARCHIVE_HTML", "0").strip() == "1"
+INDEX_FILE = "index.tsv"
+
+_AD_ID_RE = re.compile(r"/inzerat/(\d+)/")
+
+
+def ad_id_from_url(url):
+    match = _AD_ID_RE.search(url)
+    return match.group(1) if match else url
+
+
+def _compress(data):
+    if zstandard is not None:
+        return "zstd", zstandard.ZstdCompressor(level=10).compress(data)
+    return "gzip", gzip.compress(data, compresslevel=6)
+
+
+def _decompress(codec, data):
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("Archive entry is zstd-compressed but zstandard is not installed")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return gzip.decompress(data)
+
+
+class HtmlArchive:
+    """Thread-safe appender for the page archive."""
+
+    def __init__(self, directory=ARCHIVE_DIR):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._segments = {}
+        self._index = open(os.path.join(directory, INDEX_FILE), "a", encoding="utf-8")
+
+    def append(self, url, body, encoding, fetched_at=None):
+        fetched_at = fetched_at or datetime.utcnow()
+        segment = f"pages-{fetched_at:%Y%m}.bin"
+        codec, payload = _compress(body)
+        with self._lock:
+            handle = self._segments.get(segment)
+            if handle is None:
+                handle = self._segments[segment] = open(os.path.join(self.directory, segment), "ab")
+            handle.seek(0, os.SEEK_END)
+            offset = handle.tell()
+            handle.write(payload)
+            handle.flush()
+            # The index line is written last, so a crash never indexes a partial page.
+            self._index.write(
+                "\t".join(
+                    (
+                        ad_id_from_url(url),
+                        fetched_at.strftime("%Y-%m-%dT%H:%M:%S"),
+                        url,
+                        segment,
+                        str(offset),
+                        str(len(payload)),
+                        codec,
+                        encoding,
+                    )
+                )
+                + "\n"
+            )
+            self._index.flush()
+
+    def close(self):
+        with self._lock:
+            for handle in self._segments.values():
+                handle.close()
+            self._segments = {}
+            self._index.close()
+
+
+def read_index(directory=ARCHIVE_DIR, since=None):
+    """Return the newest archive entry per ad ID, in the order they were fetched."""
+
+    path = os.path.join(directory, INDEX_FILE)
+    latest = {}
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            parts = line.rstrip("\n").split("\t")
+            if len(parts) != 8:
+                continue
+            ad_id, fetched_at, url, segment, offset, length, codec, encoding = parts
+            if since and fetched_at < since:
+                continue
+            latest.pop(ad_id, None)
+            latest[ad_id] = {
+                "ad_id": ad_id,
+                "fetched_at": fetched_at,
+                "url": url,
+                "segment": segment,
+                "offset": int(offset),
+                "length": int(length),
+                "codec": codec,
+                "encoding": encoding,
+            }
+    return list(latest.values())
+
+
+def read_page(entry, directory=ARCHIVE_DIR):
+    with open(os.path.join(directory, entry["segment"]), "rb") as f:
+        f.seek(entry["offset"])
+        return _decompress(entry["codec"], f.read(entry["length"]))
+
+
+def _reextract_entry(args):
+    entry, directory = args
+    from ad_extract import parse_ad_bytes
+
+    record, _ = parse_ad_bytes(read_page(entry, directory), entry["encoding"], entry["url"])
+    return record
+
+
+def reextract(output_file, directory=ARCHIVE_DIR, workers=None, since=None):
+    """Re-run extraction over the archive and write ``scraped_results`` blocks."""
+
+    from ad_extract import format_result_block
+
+    entries = read_index(directory, since)
+    valid_count = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool, open(output_file, "w", encoding="utf-8") as out:
+        jobs = ((entry, directory) for entry in entries)
+        for record in pool.map(_reextract_entry, jobs, chunksize=32):
+            if record["description"] == "N/A":
+                continue
+            valid_count += 1
+            record["index"] = valid_count
+            out.write(format_result_block(record))
+    return len(entries), valid_count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline tools for the ad page archive.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    re_parser = sub.add_parser("reextract", help="Rebuild scraped results from archived pages")
+    re_parser.add_argument("--output", default=os.path.join(DATA_DIR, "scraped_results.txt"))
+    re_parser.add_argument("--archive", default=ARCHIVE_DIR, help="Archive directory")
+    re_parser.add_argument("--workers", type=int, default=None, help="Parser processes (default: all cores)")
+    re_parser.add_argument("--since", default=None, help="Only pages fetched on/after YYYY-MM-DD")
+    args = parser.parse_args()
+
+    if args.command == "reextract":
+        pages, valid = reextract(args.output, args.archive, args.workers, args.since)
+        print(f"Re-extracted {pages} archived pages, {valid} usable results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
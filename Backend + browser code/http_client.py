@@ -1,13 +1,20 @@
 import os
 import random
+import threading
 import time
-from typing import Iterable, List, Optional
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urlparse
 
 import requests
 from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.util.request import ACCEPT_ENCODING
 from urllib3.util.retry import Retry
 import urllib3
 
+from metrics import OUTBOUND_SECONDS, REGISTRY
 from proxy_config import load_raw_proxy_list
 
 BRD_HOST = os.getenv("BRD_HOST", "brd.superproxy.io")
@@ -16,11 +23,18 @@ BRD_USER_BASE = os.getenv("BRD_USER_BASE")
 BRD_PASS = os.getenv("BRD_PASS")
 USE_DIRECT_REQUESTS = os.getenv("USE_STATIC_PROXIES", "").strip() == "1"
 
-# Set to False for rotating IPs (default). Set to True if you want sticky IP per session.
-BRD_USE_STICKY = False
+# Sticky sessions keep one exit IP per worker so keep-alive tunnels through the
+# superproxy can be reused. Set BRD_USE_STICKY=0 for a fresh IP per request.
+BRD_USE_STICKY = os.getenv("BRD_USE_STICKY", "1").strip() == "1"
 BRD_SESSION_ID = f"inferno-{int(time.time())}"
+# Requests served by one pooled session before it is rotated to a new exit.
+SESSION_MAX_REQUESTS = int(os.getenv("BRD_SESSION_MAX_REQUESTS", "200"))
 DISABLE_SSL_VERIFY = os.getenv("DISABLE_SSL_VERIFY", "0") == "1"
 CA_BUNDLE_PATH = os.getenv("REQUESTS_CA_BUNDLE") or os.getenv("SSL_CERT_FILE") or os.getenv("CA_BUNDLE_PATH")
+# Remaining proxied bytes this process may download; set per stage by main.py.
+BYTE_BUDGET = int(os.getenv("BYTE_BUDGET", "0") or 0)
+# Only advertise encodings urllib3 can decode here (``br`` needs the brotli package).
+ACCEPT_ENCODING_HEADER = ", ".join(ACCEPT_ENCODING.split(","))
 
 
 _PROXY_MODE_ANNOUNCED = False
@@ -34,19 +48,218 @@ def _announce_mode(message: str) -> None:
         _PROXY_MODE_ANNOUNCED = True
 
 
-def _brd_username() -> str:
+def _brd_username(session_id: Optional[str] = None) -> str:
+    if session_id:
+        return f"{BRD_USER_BASE}-session-{session_id}"
     if BRD_USE_STICKY:
         return f"{BRD_USER_BASE}-session-{BRD_SESSION_ID}"
     return BRD_USER_BASE
 
 
-def build_brd_proxies() -> dict:
+def build_brd_proxies(session_id: Optional[str] = None) -> dict:
     if not BRD_USER_BASE or not BRD_PASS:
         raise RuntimeError("Bright Data credentials missing: set BRD_USER_BASE and BRD_PASS in env.")
-    proxy = f"http://{_brd_username()}:{BRD_PASS}@{BRD_HOST}:{BRD_PORT}"
+    proxy = f"http://{_brd_username(session_id)}:{BRD_PASS}@{BRD_HOST}:{BRD_PORT}"
     return {"http": proxy, "https": proxy}
 
 
+class HandshakeStats:
+    """Count new connections (TCP + proxy CONNECT + TLS) and time spent on them."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.count = 0
+        self.seconds = 0.0
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self.count += 1
+            self.seconds += seconds
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            count, seconds = self.count, self.seconds
+        return {
+            "handshakes": count,
+            "handshake_seconds": round(seconds, 3),
+            "avg_handshake_ms": round(seconds * 1000 / count, 1) if count else 0.0,
+        }
+
+
+HANDSHAKE_STATS = HandshakeStats()
+
+
+class BandwidthBudgetExceeded(RuntimeError):
+    """Raised before a request once the per-run byte budget is used up."""
+
+
+def _proxy_label(proxies: Optional[dict], url: str) -> str:
+    if not proxies:
+        return "direct"
+    proxy = proxies.get(urlparse(url).scheme) or proxies.get("all")
+    if not proxy:
+        return "direct"
+    parsed = urlparse(proxy if "://" in proxy else f"http://{proxy}")
+    return f"{parsed.hostname}:{parsed.port}" if parsed.port else (parsed.hostname or "unknown")
+
+
+def _header_bytes(resp: requests.Response) -> int:
+    # Status line plus "Name: value\r\n" per header and the closing blank line.
+    return 17 + sum(len(k) + len(v) + 4 for k, v in resp.raw.headers.items()) + 2
+
+
+class BandwidthMeter:
+    """Accumulate response bytes on the wire and after decoding.
+
+    Totals are broken down by stage, proxy and ``Content-Encoding``; wire bytes
+    include response headers. When ``budget`` is set, :meth:`check_budget`
+    raises :class:`BandwidthBudgetExceeded` once the wire total reaches it.
+    """
+
+    def __init__(self, stage: str = "", budget: int = 0):
+        self.stage = stage
+        self.budget = budget
+        self._lock = threading.Lock()
+        self._rows: Dict[Tuple[str, str, str], List[int]] = {}
+        self.wire_bytes = 0
+
+    def set_stage(self, stage: str) -> None:
+        self.stage = stage
+
+    def record(self, proxy: str, encoding: str, wire_bytes: int, decoded_bytes: int) -> None:
+        key = (self.stage, proxy, encoding)
+        with self._lock:
+            row = self._rows.setdefault(key, [0, 0, 0])
+            row[0] += 1
+            row[1] += wire_bytes
+            row[2] += decoded_bytes
+            self.wire_bytes += wire_bytes
+
+    def record_response(self, resp: requests.Response, proxies: Optional[dict] = None,
+                        decoded_bytes: Optional[int] = None) -> None:
+        """Record ``resp`` once; the body must already be read (or ``decoded_bytes`` given)."""
+
+        if getattr(resp, "_metered", False):
+            return
+        resp._metered = True
+        if proxies is None:
+            proxies = getattr(resp, "_meter_proxies", None)
+        try:
+            body_wire = resp.raw.tell()
+        except Exception:
+            body_wire = 0
+        if decoded_bytes is None:
+            decoded_bytes = len(resp._content) if resp._content else 0
+        encoding = (resp.headers.get("Content-Encoding") or "identity").lower()
+        self.record(_proxy_label(proxies, resp.url or ""), encoding,
+                    _header_bytes(resp) + body_wire, decoded_bytes)
+
+    def exceeded(self) -> bool:
+        return bool(self.budget) and self.wire_bytes >= self.budget
+
+    def check_budget(self) -> None:
+        if self.exceeded():
+            raise BandwidthBudgetExceeded(
+                f"Byte budget of {self.budget} B exhausted ({self.wire_bytes} B downloaded)"
+            )
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            rows = [
+                {
+                    "stage": stage,
+                    "proxy": proxy,
+                    "encoding": encoding,
+                    "requests": values[0],
+                    "wire_bytes": values[1],
+                    "decoded_bytes": values[2],
+                }
+                for (stage, proxy, encoding), values in self._rows.items()
+            ]
+        return {
+            "requests": sum(r["requests"] for r in rows),
+            "wire_bytes": sum(r["wire_bytes"] for r in rows),
+            "decoded_bytes": sum(r["decoded_bytes"] for r in rows),
+            "budget": self.budget,
+            "budget_exceeded": self.exceeded(),
+            "rows": rows,
+        }
+
+
+BANDWIDTH = BandwidthMeter(budget=BYTE_BUDGET)
+
+
+class _TimedHTTPConnection(HTTPConnection):
+    def connect(self):
+        started = time.perf_counter()
+        super().connect()
+        HANDSHAKE_STATS.record(time.perf_counter() - started)
+
+
+class _TimedHTTPSConnection(HTTPSConnection):
+    def connect(self):
+        started = time.perf_counter()
+        super().connect()
+        HANDSHAKE_STATS.record(time.perf_counter() - started)
+
+
+class _TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+_TIMED_POOL_CLASSES = {"http": _TimedHTTPConnectionPool, "https": _TimedHTTPSConnectionPool}
+
+
+class InstrumentedAdapter(HTTPAdapter):
+    """``HTTPAdapter`` whose connections report handshakes to ``HANDSHAKE_STATS``."""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = _TIMED_POOL_CLASSES
+
+    def proxy_manager_for(self, proxy, **proxy_kwargs):
+        manager = super().proxy_manager_for(proxy, **proxy_kwargs)
+        if not proxy.lower().startswith("socks"):
+            manager.pool_classes_by_scheme = _TIMED_POOL_CLASSES
+        return manager
+
+
+class ScraperSession(requests.Session):
+    """``requests.Session`` that meters every response into ``meter``.
+
+    ``meter`` is the process-wide ``BANDWIDTH`` unless the session was given
+    its own. Streamed responses are not recorded here; whoever reads their
+    body should call ``record_response`` on the meter with the number of
+    decoded bytes.
+    """
+
+    meter = BANDWIDTH
+
+    def send(self, request, **kwargs):  # type: ignore[override]
+        meter = self.meter
+        meter.check_budget()
+        proxy = _proxy_label(kwargs.get("proxies"), request.url or "")
+        started = time.perf_counter()
+        try:
+            resp = super().send(request, **kwargs)
+        except Exception:
+            OUTBOUND_SECONDS.observe(time.perf_counter() - started, stage=meter.stage, proxy=proxy, status="error")
+            raise
+        OUTBOUND_SECONDS.observe(
+            time.perf_counter() - started, stage=meter.stage, proxy=proxy, status=resp.status_code
+        )
+        if kwargs.get("stream"):
+            resp._meter_proxies = kwargs.get("proxies")
+        else:
+            for hop in (*resp.history, resp):
+                meter.record_response(hop, kwargs.get("proxies"))
+        return resp
+
+
 def _configure_session(session: requests.Session, verify_ssl: bool = True) -> requests.Session:
     retries = Retry(
         total=5,
@@ -54,13 +267,14 @@ def _configure_session(session: requests.Session, verify_ssl: bool = True) -> re
         status_forcelist=(429, 500, 502, 503, 504),
         allowed_methods=("GET", "HEAD", "OPTIONS"),
     )
-    session.mount("http://", HTTPAdapter(max_retries=retries))
-    session.mount("https://", HTTPAdapter(max_retries=retries))
+    session.mount("http://", InstrumentedAdapter(max_retries=retries))
+    session.mount("https://", InstrumentedAdapter(max_retries=retries))
     session.trust_env = False
 
     session.headers.update(
         {
             "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+            "Accept-Encoding": ACCEPT_ENCODING_HEADER,
             "Accept-Language": "sk,en;q=0.9",
         }
     )
@@ -77,18 +291,18 @@ def _configure_session(session: requests.Session, verify_ssl: bool = True) -> re
     return session
 
 
-def new_brd_session(verify_ssl: bool = True) -> requests.Session:
+def new_brd_session(verify_ssl: bool = True, session_id: Optional[str] = None) -> requests.Session:
     """Return a configured ``requests.Session`` for Bright Data."""
 
-    session = _configure_session(requests.Session(), verify_ssl=verify_ssl)
-    session.proxies = build_brd_proxies()
+    session = _configure_session(ScraperSession(), verify_ssl=verify_ssl)
+    session.proxies = build_brd_proxies(session_id)
     return session
 
 
 def new_direct_session(verify_ssl: bool = True) -> requests.Session:
     """Return a configured session without any proxy usage."""
 
-    return _configure_session(requests.Session(), verify_ssl=verify_ssl)
+    return _configure_session(ScraperSession(), verify_ssl=verify_ssl)
 
 
 def _format_proxy(raw_proxy: str) -> Optional[str]:
@@ -142,7 +356,7 @@ def build_static_proxy_pool() -> List[str]:
     return formatted
 
 
-class RotatingProxySession(requests.Session):
+class RotatingProxySession(ScraperSession):
     """A ``requests.Session`` that rotates proxies per request."""
 
     def __init__(self, proxies: Iterable[str], verify_ssl: bool = True):
@@ -163,18 +377,159 @@ def new_static_proxy_session(verify_ssl: bool = True) -> requests.Session:
     proxy_pool = build_static_proxy_pool()
     if proxy_pool:
         return RotatingProxySession(proxy_pool, verify_ssl=verify_ssl)
-    return _configure_session(requests.Session(), verify_ssl=verify_ssl)
+    return _configure_session(ScraperSession(), verify_ssl=verify_ssl)
 
 
-def new_scraper_session(verify_ssl: bool = True):
+def new_scraper_session(verify_ssl: bool = True, session_id: Optional[str] = None):
     """Return a scraper session using Bright Data proxies or direct requests."""
 
     if USE_DIRECT_REQUESTS:
         _announce_mode("⚡ Using direct Railway server requests (no proxies)")
         return new_direct_session(verify_ssl=verify_ssl)
 
-    _announce_mode("🌐 Using Bright Data rotating proxies")
-    return new_brd_session(verify_ssl=verify_ssl)
+    if BRD_USE_STICKY:
+        _announce_mode("🌐 Using Bright Data proxies with sticky sessions per worker")
+    else:
+        _announce_mode("🌐 Using Bright Data rotating proxies")
+    return new_brd_session(verify_ssl=verify_ssl, session_id=session_id)
+
+
+class _WorkerSession:
+    def __init__(self, session: requests.Session):
+        self.session = session
+        self.requests = 0
+        self.blocked = False
+
+
+class StickySessionPool:
+    """Hand out one long-lived scraper session per worker thread.
+
+    Each worker keeps its session (and therefore its sticky Bright Data exit and
+    warm keep-alive connections) until :meth:`rotate` is called after a block or
+    the session has served ``max_requests`` requests. With ``meter`` the
+    sessions record their traffic there instead of in ``BANDWIDTH``.
+    """
+
+    def __init__(self, verify_ssl: bool = True, max_requests: int = SESSION_MAX_REQUESTS,
+                 meter: Optional[BandwidthMeter] = None):
+        self.verify_ssl = verify_ssl
+        self.max_requests = max(1, max_requests)
+        self.meter = meter
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._open: List[requests.Session] = []
+        self._counter = 0
+        self.rotations = 0
+
+    def _new_session(self) -> requests.Session:
+        with self._lock:
+            self._counter += 1
+            session_id = f"{BRD_SESSION_ID}-{os.getpid()}-{self._counter}" if BRD_USE_STICKY else None
+        session = new_scraper_session(verify_ssl=self.verify_ssl, session_id=session_id)
+        if self.meter is not None:
+            session.meter = self.meter
+        with self._lock:
+            self._open.append(session)
+        return session
+
+    def _retire(self, state: _WorkerSession) -> None:
+        with self._lock:
+            self.rotations += 1
+            if state.session in self._open:
+                self._open.remove(state.session)
+        try:
+            state.session.close()
+        except Exception:
+            pass
+
+    def get(self) -> requests.Session:
+        """Return the calling worker's session, rotating it if it is used up."""
+
+        state = getattr(self._local, "state", None)
+        if state is not None and (state.blocked or state.requests >= self.max_requests):
+            self._retire(state)
+            state = None
+        if state is None:
+            state = self._local.state = _WorkerSession(self._new_session())
+        state.requests += 1
+        return state.session
+
+    def rotate(self) -> None:
+        """Mark the calling worker's session as blocked; the next ``get`` replaces it."""
+
+        state = getattr(self._local, "state", None)
+        if state is not None:
+            state.blocked = True
+
+    def close(self) -> None:
+        with self._lock:
+            sessions, self._open = self._open, []
+        for session in sessions:
+            try:
+                session.close()
+            except Exception:
+                pass
+
+    def stats(self) -> dict:
+        with self._lock:
+            opened, rotations = self._counter, self.rotations
+        stats = {"sessions_opened": opened, "rotations": rotations}
+        stats.update(HANDSHAKE_STATS.snapshot())
+        return stats
+
+
+class LatencyTracker:
+    """Thread-safe latency samples with percentile queries.
+
+    ``window`` bounds the samples used by :meth:`percentile` (recent
+    behaviour); :meth:`summary` covers every sample recorded.
+    """
+
+    def __init__(self, window: int = 200):
+        self._lock = threading.Lock()
+        self._recent: deque = deque(maxlen=window)
+        self._all: List[float] = []
+
+    def add(self, seconds: float) -> None:
+        with self._lock:
+            self._all.append(seconds)
+            self._recent.append(seconds)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._all)
+
+    @staticmethod
+    def _pick(samples: List[float], pct: float) -> Optional[float]:
+        if not samples:
+            return None
+        ordered = sorted(samples)
+        return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+    def percentile(self, pct: float) -> Optional[float]:
+        with self._lock:
+            samples = list(self._recent)
+        return self._pick(samples, pct)
+
+    def summary(self) -> dict:
+        with self._lock:
+            samples = list(self._all)
+        result = {"count": len(samples)}
+        for pct in (50, 90, 99):
+            value = self._pick(samples, pct)
+            result[f"p{pct}_ms"] = round(value * 1000, 1) if value is not None else None
+        return result
+
+
+def report_stats(stage: str, stats: dict, progress_url: Optional[str] = None) -> None:
+    """Send run statistics of ``stage`` to the backend's ``/progress_update``."""
+
+    url = progress_url or os.getenv("PROGRESS_URL", "http://127.0.0.1:5000/progress_update")
+    try:
+        # The process's metrics ride along; each stage reports once, at the end.
+        requests.post(url, json={"stats": {stage: stats}, "metrics": REGISTRY.snapshot()}, timeout=3)
+    except Exception:
+        pass
 
 
 
@@ -182,7 +537,7 @@ HEADERS_POOL = [
     {
         "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/127.0.0.0 Safari/537.36",
         "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8",
-        "Accept-Encoding": "gzip, deflate, br",
+        "Accept-Encoding": ACCEPT_ENCODING_HEADER,
         "Accept-Language": "sk-SK,sk;q=0.9,en-US;q=0.8,en;q=0.7",
         "Connection": "keep-alive",
         "Sec-CH-UA": '"Chromium";v="127", "Google Chrome";v="127", "Not A;Brand";v="99"',
@@ -198,7 +553,7 @@ HEADERS_POOL = [
     {
         "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/127.0.0.0 Safari/537.36 Brave/127.0.0.0",
         "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8",
-        "Accept-Encoding": "gzip, deflate, br",
+        "Accept-Encoding": ACCEPT_ENCODING_HEADER,
         "Accept-Language": "en-GB,en;q=0.9,sk;q=0.8",
         "Connection": "keep-alive",
         "Sec-CH-UA": '"Chromium";v="127", "Brave";v="127", "Not A;Brand";v="99"',
@@ -214,7 +569,7 @@ HEADERS_POOL = [
     {
         "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 13_4) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.4 Safari/605.1.15",
         "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
-        "Accept-Encoding": "gzip, deflate, br",
+        "Accept-Encoding": ACCEPT_ENCODING_HEADER,
         "Accept-Language": "sk-SK,sk;q=0.9",
         "Connection": "keep-alive",
         "Upgrade-Insecure-Requests": "1",
@@ -227,7 +582,7 @@ HEADERS_POOL = [
     {
         "User-Agent": "Mozilla/5.0 (Linux; Android 13; SM-A546B) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/127.0.0.0 Mobile Safari/537.36",
         "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8",
-        "Accept-Encoding": "gzip, deflate, br",
+        "Accept-Encoding": ACCEPT_ENCODING_HEADER,
         "Accept-Language": "sk-SK,sk;q=0.9,en-US;q=0.8",
         "Connection": "keep-alive",
         "Sec-CH-UA": '"Chromium";v="127", "Google Chrome";v="127", "Not A;Brand";v="99"',
@@ -243,7 +598,7 @@ HEADERS_POOL = [
     {
         "User-Agent": "Mozilla/5.0 (iPhone; CPU iPhone OS 17_4 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.4 Mobile/15E148 Safari/604.1",
         "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
-        "Accept-Encoding": "gzip, deflate, br",
+        "Accept-Encoding": ACCEPT_ENCODING_HEADER,
         "Accept-Language": "sk-SK,sk;q=0.9",
         "Connection": "keep-alive",
         "Upgrade-Insecure-Requests": "1",
@@ -256,7 +611,7 @@ HEADERS_POOL = [
     {
         "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:119.0) Gecko/20100101 Firefox/119.0",
         "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
-        "Accept-Encoding": "gzip, deflate, br",
+        "Accept-Encoding": ACCEPT_ENCODING_HEADER,
         "Accept-Language": "sk-SK,sk;q=0.9,en-US;q=0.8",
         "Connection": "keep-alive",
         "Upgrade-Insecure-Requests": "1",
@@ -0,0 +1,175 @@
+"""Queue of ``mode=new`` scrape jobs, kept in the shared state store.
+
+The pipeline's output does not depend on a request's subcategories or dates;
+those only filter the finished results. A ``/scrape`` whose run options
+(``byte_budget``, ``deadline_seconds``, ``profile``) match a running or queued
+job therefore attaches to that job instead of running the stages again; other
+requests queue up and run one after another. The queue lives in the state
+store, so queued jobs survive a restart and any worker can report or cancel
+them. Only the newest ``JOB_HISTORY`` finished jobs are kept.
+"""
+
+import json
+import os
+import uuid
+from datetime import datetime
+
+JOB_HISTORY = int(os.getenv("JOB_HISTORY", "20"))
+
+ACTIVE_STATUSES = {"queued", "running"}
+
+
+def _now_iso():
+    return datetime.utcnow().isoformat() + "Z"
+
+
+def request_key(request):
+    """The filters that decide an attached request's result count."""
+    return json.dumps([request["subcategories"], request["date_start"], request["date_end"]])
+
+
+def _with_positions(jobs):
+    """Copies of ``jobs`` where queued ones carry their 1-based place in line."""
+    position = 0
+    annotated = []
+    for job in jobs:
+        job = dict(job, position=None)
+        if job["status"] == "queued":
+            position += 1
+            job["position"] = position
+        annotated.append(job)
+    return annotated
+
+
+class JobQueue:
+    def __init__(self, store, keep=JOB_HISTORY):
+        self.store = store
+        self.keep = keep
+
+    def _update(self, fn):
+        """Apply ``fn`` to the job list (oldest first) atomically; returns what ``fn`` returned."""
+        outcome = {}
+
+        def apply(jobs):
+            outcome["value"] = fn(jobs)
+            finished = [job for job in jobs if job["status"] not in ACTIVE_STATUSES]
+            drop = {id(job) for job in finished[:max(len(finished) - self.keep, 0)]}
+            return [job for job in jobs if id(job) not in drop]
+
+        self.store.update("jobs", apply, [])
+        return outcome.get("value")
+
+    def submit(self, options, request):
+        """Attach ``request`` to a matching active job or queue a new one.
+
+        Returns ``(job, attached)``.
+        """
+        request = dict(request, submitted_at=_now_iso(), count=None)
+
+        def apply(jobs):
+            active = [job for job in jobs if job["status"] in ACTIVE_STATUSES and job["options"] == options]
+            # A running job delivers soonest.
+            active.sort(key=lambda job: job["status"] != "running")
+            if active:
+                active[0]["requests"].append(request)
+                return active[0], True
+            job = {
+                "id": uuid.uuid4().hex,
+                "status": "queued",
+                "options": options,
+                "requests": [request],
+                "created_at": _now_iso(),
+                "started_at": None,
+                "finished_at": None,
+                "run_id": None,
+                "results": None,
+                "error": None,
+            }
+            jobs.append(job)
+            return job, False
+
+        job, attached = self._update(apply)
+        return self.get(job["id"]) or job, attached
+
+    def list(self):
+        """All kept jobs, newest first."""
+        return _with_positions(self.store.get("jobs", []))[::-1]
+
+    def get(self, job_id):
+        for job in _with_positions(self.store.get("jobs", [])):
+            if job["id"] == job_id:
+                return job
+        return None
+
+    def next_queued(self):
+        for job in self.store.get("jobs", []):
+            if job["status"] == "queued":
+                return job
+        return None
+
+    def start(self, job_id, **fields):
+        """Move ``job_id`` from queued to running; ``None`` if it is no longer queued.
+
+        Only one job runs at a time, so a job still marked running lost its
+        worker and is marked failed.
+        """
+
+        def apply(jobs):
+            started = None
+            for job in jobs:
+                if job["id"] == job_id and job["status"] == "queued":
+                    job.update(fields, status="running", started_at=_now_iso())
+                    started = job
+                elif job["status"] == "running":
+                    job.update(status="failed", finished_at=_now_iso(), error="Zber bol prerušený.")
+            return started
+
+        return self._update(apply)
+
+    def finish(self, job_id, status, counts=None, **fields):
+        """Record the outcome of a running job; ``None`` if it is not running any more.
+
+        ``counts`` maps :func:`request_key` of attached requests to their result
+        counts; requests it does not cover keep ``count=None``. A cancelled job
+        stays cancelled unless ``status`` is ``"cancelled"`` too.
+        """
+
+        def apply(jobs):
+            for job in jobs:
+                if job["id"] == job_id and (
+                    job["status"] == "running" or job["status"] == status == "cancelled"
+                ):
+                    job.update(fields, status=status, finished_at=job.get("finished_at") or _now_iso())
+                    for request in job["requests"]:
+                        request["count"] = (counts or {}).get(request_key(request), request.get("count"))
+                    return job
+            return None
+
+        return self._update(apply)
+
+    def record_counts(self, job_id, counts):
+        """Fill result counts of ``job_id``'s requests from ``counts`` (see :meth:`finish`)."""
+
+        def apply(jobs):
+            for job in jobs:
+                if job["id"] == job_id:
+                    for request in job["requests"]:
+                        request["count"] = counts.get(request_key(request), request.get("count"))
+                    return job
+            return None
+
+        return self._update(apply)
+
+    def cancel(self, job_id):
+        """Mark an active job cancelled; returns its previous status (``None`` if unknown)."""
+
+        def apply(jobs):
+            for job in jobs:
+                if job["id"] == job_id:
+                    previous = job["status"]
+                    if previous in ACTIVE_STATUSES:
+                        job.update(status="cancelled", finished_at=_now_iso())
+                    return previous
+            return None
+
+        return self._update(apply)
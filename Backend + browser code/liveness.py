@@ -0,0 +1,234 @@
+"""Background re-validation of stored results so sold/deleted ads drop out.
+
+A stored result is alive for free when its URL is still listed in the latest
+sitemap snapshot (``Data/old_results.txt``). Only the rest are checked over
+the network with a rate-limited ``HEAD`` (``GET`` without reading the body
+if ``HEAD`` is refused): a redirect, 404 or 410 marks the ad dead. Dead URLs
+are recorded in ``Data/dead_links.txt`` and, with ``LIVENESS_MODE=evict``,
+also removed from ``phase3_filtered_links.txt``.
+
+Each run meters its traffic separately from the scrape's ``BANDWIDTH`` (and
+its ``BYTE_BUDGET``); ``LIVENESS_BYTE_BUDGET`` caps one run.
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from storage import (
+    append_dead_links,
+    load_dead_links,
+    load_old_links,
+    load_phase3_results,
+    save_phase3_results,
+)
+
+LIVENESS_MODE = os.getenv("LIVENESS_MODE", "mark").strip().lower()  # "mark" or "evict"
+LIVENESS_RATE = float(os.getenv("LIVENESS_RATE", "2"))  # requests per second
+LIVENESS_BATCH = int(os.getenv("LIVENESS_BATCH", "50"))
+LIVENESS_WORKERS = int(os.getenv("LIVENESS_WORKERS", "4"))
+LIVENESS_TIMEOUT = 15
+LIVENESS_BYTE_BUDGET = int(os.getenv("LIVENESS_BYTE_BUDGET", "0") or 0)  # per run, 0 = unlimited
+
+DEAD_STATUSES = {301, 302, 303, 307, 308, 404, 410}
+# State store counter bumped whenever a worker records dead links.
+DEAD_LINKS_REV_KEY = "dead_links_rev"
+
+
+class RateLimiter:
+    """Space calls at least ``1 / per_second`` apart across threads."""
+
+    def __init__(self, per_second):
+        self.interval = 1.0 / per_second if per_second > 0 else 0.0
+        self._lock = threading.Lock()
+        self._next = 0.0
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next)
+            self._next = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+
+
+def result_urls(text):
+    return [line[4:].strip() for line in text.splitlines() if line.startswith("URL:")]
+
+
+def remove_result_blocks(text, dead_urls):
+    """Drop result blocks whose URL is in ``dead_urls``; other lines stay untouched."""
+
+    kept, block, block_url = [], [], None
+    for line in text.splitlines(keepends=True):
+        block.append(line)
+        if line.startswith("URL:"):
+            block_url = line[4:].strip()
+        elif line.startswith("==="):
+            if block_url not in dead_urls:
+                kept.extend(block)
+            block, block_url = [], None
+    if block and block_url not in dead_urls:
+        kept.extend(block)
+    return "".join(kept)
+
+
+def probe(url, session):
+    """Return True (alive), False (dead) or None (could not tell).
+
+    Raises ``BandwidthBudgetExceeded`` once the run's budget is used up.
+    """
+    from http_client import BandwidthBudgetExceeded
+
+    try:
+        resp = session.head(url, timeout=LIVENESS_TIMEOUT, allow_redirects=False)
+        if resp.status_code in (405, 501):
+            resp = session.get(url, timeout=LIVENESS_TIMEOUT, allow_redirects=False, stream=True)
+            resp.close()
+    except BandwidthBudgetExceeded:
+        raise
+    except Exception as exc:
+        print(f"⚠️ Liveness probe failed for {url}: {exc}")
+        return None
+    if resp.status_code in DEAD_STATUSES:
+        return False
+    if resp.status_code == 200:
+        return True
+    return None
+
+
+class LivenessChecker:
+    """Runs liveness checks in a background thread and caches the dead set.
+
+    With a shared ``store`` the cached set is reloaded whenever another worker
+    recorded dead links since it was loaded.
+    """
+
+    def __init__(self, write_lock=None, on_change=None, on_dead=None, store=None):
+        self._write_lock = write_lock or threading.Lock()
+        self._on_change = on_change
+        self._on_dead = on_dead
+        self._store = store
+        self._lock = threading.Lock()
+        self._dead = None
+        self._dead_rev = None
+        self._thread = None
+        self.status = {
+            "running": False, "last_run": None, "checked": 0, "dead": 0, "unknown": 0, "error": None, "bandwidth": {},
+        }
+
+    def _stored_rev(self):
+        return self._store.get(DEAD_LINKS_REV_KEY, 0) if self._store else 0
+
+    def dead_urls(self):
+        """Known dead URLs; loaded from storage on first use and after they changed."""
+        rev = self._stored_rev()
+        with self._lock:
+            if self._dead is not None and rev == self._dead_rev:
+                return self._dead
+            known = self._dead or set()
+            self._dead = loaded = load_dead_links() | known
+            self._dead_rev = rev
+        fresh = loaded - known
+        if fresh and self._on_dead:
+            self._on_dead(fresh)
+        return loaded
+
+    def start(self):
+        """Start a background check unless one is already running."""
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return False
+            self._thread = threading.Thread(target=self._run_safely, daemon=True)
+            self.status.update(running=True, error=None)
+            self._thread.start()
+            return True
+
+    def _run_safely(self):
+        try:
+            self.run()
+        except Exception as exc:
+            print(f"❌ Liveness check failed: {exc}")
+            self.status["error"] = str(exc)
+        finally:
+            self.status["running"] = False
+
+    def run(self):
+        from http_client import BandwidthBudgetExceeded, BandwidthMeter, StickySessionPool
+
+        text = load_phase3_results() or ""
+        dead_known = self.dead_urls()
+        candidates = [url for url in dict.fromkeys(result_urls(text)) if url not in dead_known]
+        listed = set(load_old_links())
+        to_probe = [url for url in candidates if url not in listed]
+        print(
+            f"🔎 Liveness: {len(candidates)} stored results, "
+            f"{len(candidates) - len(to_probe)} still in the sitemap, {len(to_probe)} to probe"
+        )
+
+        limiter = RateLimiter(LIVENESS_RATE)
+        # A fresh meter per run: the process-wide one keeps the scrape's totals
+        # and budget, which would otherwise stop every later check.
+        meter = BandwidthMeter(stage="liveness", budget=LIVENESS_BYTE_BUDGET)
+        session_pool = StickySessionPool(verify_ssl=False, meter=meter)
+
+        def check(url):
+            limiter.wait()
+            return url, probe(url, session_pool.get())
+
+        newly_dead, unknown, budget_error = set(), 0, None
+        pool = ThreadPoolExecutor(max_workers=LIVENESS_WORKERS)
+        try:
+            for start in range(0, len(to_probe), LIVENESS_BATCH):
+                batch_dead = set()
+                try:
+                    for url, alive in pool.map(check, to_probe[start:start + LIVENESS_BATCH]):
+                        if alive is False:
+                            batch_dead.add(url)
+                        elif alive is None:
+                            unknown += 1
+                except BandwidthBudgetExceeded as exc:
+                    budget_error = str(exc)
+                if batch_dead:
+                    append_dead_links(batch_dead)
+                    if self._store:
+                        self._store.update(DEAD_LINKS_REV_KEY, lambda rev: rev + 1, 0)
+                    with self._lock:
+                        self._dead = set(self._dead or ()) | batch_dead
+                    if self._on_dead:
+                        self._on_dead(batch_dead)
+                    newly_dead |= batch_dead
+                if budget_error:
+                    print(f"⚠️ Liveness stopped early: {budget_error}")
+                    break
+        finally:
+            pool.shutdown(cancel_futures=True)
+            session_pool.close()
+
+        if LIVENESS_MODE == "evict":
+            self.evict()
+
+        self.status.update(
+            last_run=time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            checked=len(candidates),
+            dead=len(newly_dead),
+            unknown=unknown,
+            error=budget_error,
+            bandwidth=meter.snapshot(),
+        )
+        print(f"🔎 Liveness: {len(newly_dead)} dead, {unknown} undetermined")
+
+    def evict(self):
+        """Remove every known dead URL from the stored results file."""
+        dead = self.dead_urls()
+        if not dead:
+            return 0
+        with self._write_lock:
+            text = load_phase3_results() or ""
+            pruned = remove_result_blocks(text, dead)
+            if pruned != text:
+                save_phase3_results(pruned)
+                if self._on_change:
+                    self._on_change(pruned)
+        return len(result_urls(text)) - len(result_urls(pruned))
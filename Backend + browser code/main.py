@@ -1,47 +1,78 @@
-from flask import Flask, request, jsonify, make_response, send_from_directory
+from flask import Flask, Response, request, jsonify, make_response, send_from_directory, g
 from flask_cors import CORS
 import subprocess
 import os
-from datetime import datetime, date
+from datetime import datetime
 import traceback
 import logging
 import sys
 import threading
 import signal
+try:
+    import resource
+except ImportError:  # pragma: no cover - not available on Windows
+    resource = None
 from dotenv import load_dotenv
 from functools import wraps
 import hmac
 from itsdangerous import URLSafeTimedSerializer, BadSignature, SignatureExpired
 import time
-from collections import defaultdict
+from types import SimpleNamespace
 import re
-try:
-    import psutil  # type: ignore
-except Exception:  # pragma: no cover - optional dep
-    psutil = None
+import base64
+import hashlib
+import json
+import socket
 from storage import (
     load_old_links,
     save_old_links,
     load_keywords,
     append_keywords,
-    load_phase3_results,
     append_phase3_results,
 )
+from liveness import LivenessChecker
+from result_blocks import filter_results_by_params, parse_date_range, parse_result_blocks_text
+import results_db
+from results_index import ResultsIndex
+import artifact_cache
+import compression
+from singleflight import SingleFlight, TTLCache
+from events import SSE_HEADERS, ChangeSignal, ResultFeed, sse_message
+from state_store import open_store
+from job_queue import JobQueue, request_key
+import telemetry
+import metrics
 
 load_dotenv()
 
+# Job, progress and login state shared by all gunicorn workers.
+state_store = open_store()
+
 AUTH_PASSWORD = os.getenv("AUTH_PASSWORD", "")
-AUTH_COOKIE_SECRET = os.getenv("AUTH_COOKIE_SECRET", os.urandom(32).hex())
-serializer = URLSafeTimedSerializer(AUTH_COOKIE_SECRET)
-login_attempts = defaultdict(list)
 
-def after_label(s: str, *labels: str):
-    s = s.strip()
-    for label in labels:
-        if s.startswith(label):
-            return s[len(label):].strip()
-    return None
 
+def _cookie_secret():
+    """``AUTH_COOKIE_SECRET``, or a key every worker derives from ``AUTH_PASSWORD``.
+
+    The secret is never written to the state store, which is readable by
+    anyone with access to the data directory or the Redis server.
+    """
+    secret = os.getenv("AUTH_COOKIE_SECRET")
+    if secret:
+        return secret
+    if AUTH_PASSWORD:
+        logging.warning("AUTH_COOKIE_SECRET is not set; deriving the cookie key from AUTH_PASSWORD.")
+        return hmac.new(AUTH_PASSWORD.encode(), b"inferno auth cookie", hashlib.sha256).hexdigest()
+    logging.warning(
+        "AUTH_COOKIE_SECRET and AUTH_PASSWORD are not set; login tokens are only valid on the worker that issued them."
+    )
+    return os.urandom(32).hex()
+
+
+AUTH_COOKIE_SECRET = _cookie_secret()
+serializer = URLSafeTimedSerializer(AUTH_COOKIE_SECRET)
+# Earlier versions kept a generated secret here in plain text.
+state_store.delete("auth_cookie_secret")
 
 class ProgressFilter(logging.Filter):
     def filter(self, record):
@@ -53,10 +84,19 @@ class ProgressFilter(logging.Filter):
 class SitemapCollectionError(RuntimeError):
     pass
 
+
+# Raised in the job's worker once /cancel (from any worker) asked it to stop.
+class JobCancelled(RuntimeError):
+    pass
+
 # Apply filter to werkzeug logger
 logging.getLogger("werkzeug").addFilter(ProgressFilter())
 
-running_process = None
+# Stage subprocesses this worker runs, by job id (only a job's owner has one).
+running_processes = {}
+# Id of the job the current thread runs (set by _run_scrape_job). State
+# writes from such a thread only apply while the state still belongs to it.
+_job_context = threading.local()
 
 # Reduce log noise during normal runs
 logging.basicConfig(
@@ -72,20 +112,90 @@ FRONTEND_ORIGIN = "https://bazosscraper.onrender.com"
 app.config["CORS_HEADERS"] = "Content-Type,Authorization"
 CORS(
     app,
-    resources={r"/*": {"origins": [FRONTEND_ORIGIN], "allow_headers": ["Content-Type", "Authorization"]}},
+    resources={r"/*": {
+        "origins": [FRONTEND_ORIGIN],
+        "allow_headers": ["Content-Type", "Authorization", "If-None-Match"],
+        "expose_headers": ["ETag"],
+    }},
 )
 
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+# /progress/stream: idle keep-alive period and minimum gap between pushed updates.
+PROGRESS_HEARTBEAT_SECONDS = float(os.getenv("PROGRESS_HEARTBEAT_SECONDS", "15"))
+PROGRESS_STREAM_INTERVAL = float(os.getenv("PROGRESS_STREAM_INTERVAL", "0.25"))
+# Page size bounds for /results delta sync.
+RESULTS_PAGE_DEFAULT = int(os.getenv("RESULTS_PAGE_DEFAULT", "500"))
+RESULTS_PAGE_MAX = int(os.getenv("RESULTS_PAGE_MAX", "5000"))
+# Load the results database and pre-render the unfiltered queries at start.
+WARM_START = os.getenv("WARM_START", "1").strip() == "1"
+# How often each worker checks the state store for other workers' writes.
+STATE_POLL_INTERVAL = float(os.getenv("STATE_POLL_INTERVAL", "0.25"))
+# The worker running a job renews its claim every JOB_OWNER_HEARTBEAT seconds;
+# a claim older than JOB_OWNER_TIMEOUT (or of an exited process) is abandoned.
+JOB_OWNER_HEARTBEAT = float(os.getenv("JOB_OWNER_HEARTBEAT", "10"))
+JOB_OWNER_TIMEOUT = float(os.getenv("JOB_OWNER_TIMEOUT", "60"))
+# Run every stage under cProfile + tracemalloc (also per job via /scrape "profile": true).
+PROFILE_STAGES = os.getenv("PROFILE_STAGES", "0").strip() == "1"
+
+
+@app.before_request
+def _start_request_timer():
+    g.request_started = time.perf_counter()
+
+
+@app.after_request
+def _compress_response(response):
+    return compression.compress_response(response, request.accept_encodings)
+
+
+@app.after_request
+def _record_request_latency(response):
+    started = g.get("request_started")
+    if started is not None:
+        metrics.HTTP_REQUEST_SECONDS.observe(
+            time.perf_counter() - started,
+            route=request.url_rule.rule if request.url_rule else "unmatched",
+            method=request.method,
+            status=response.status_code,
+        )
+    return response
+
+
 DATA_DIR     = "Data"
 os.makedirs(DATA_DIR, exist_ok=True)
+PROFILES_DIR = os.path.join(DATA_DIR, "profiles")
 PHASE3_FILE  = os.path.join(DATA_DIR, "phase3_filtered_links.txt")
 # Holds results from the most recent run only. This file is never pushed to
 # GitHub and is used solely for returning new results to the UI.
 LATEST_RESULTS_FILE = os.path.join(DATA_DIR, "latest_results.txt")
-progress_state = {"phase": "", "done": 0, "total": 0}
+# Per-run limit of proxied bytes (0 = unlimited); /scrape may override it.
+DEFAULT_BYTE_BUDGET = int(os.getenv("BYTE_BUDGET", "0") or 0)
 SERVER_START_TIME = datetime.utcnow()
-progress_lock = threading.Lock()
-job_state_lock = threading.Lock()
-job_state = {
+# Bumped on every progress/job state change, in this worker or (through the
+# state store watch) in another; /progress/stream waits on it.
+state_changes = ChangeSignal()
+# Serialises read-modify-write of phase3_filtered_links.txt (appends vs. evictions).
+results_write_lock = threading.Lock()
+# Serialized mode=old/latest responses by ETag; identical concurrent queries
+# share one computation.
+results_cache = TTLCache()
+results_flights = SingleFlight()
+results_index = ResultsIndex(on_change=results_cache.clear)
+# Set once _warm_start (started at the bottom of the module) is done.
+warm_started = threading.Event()
+# Results of the running job as stage 5 keeps them; /results/live streams them.
+live_results = ResultFeed(state_store)
+# mode=new requests: attached to a matching job or queued, run one at a time.
+job_queue = JobQueue(state_store)
+liveness_checker = LivenessChecker(
+    write_lock=results_write_lock,
+    on_change=results_index.ingest,
+    on_dead=results_db.add_tombstones,
+    store=state_store,
+)
+ACTIVE_JOB_STATUSES = {"running", "starting"}
+PROGRESS_DEFAULTS = {"phase": "", "done": 0, "total": 0}
+JOB_STATE_DEFAULTS = {
     "status": "idle",
     "mode": None,
     "started_at": None,
@@ -96,22 +206,111 @@ job_state = {
     "done": 0,
     "total": 0,
     "last_count": 0,
+    "stats": {},
+    "bandwidth": {},
+    "deadline_at": None,
+    "reused_stages": [],
+    "run_id": None,
+    "job_id": None,
+    "profile_dir": None,
+    "stage_pid": None,
+    "owner": None,
+    "owner_seen": None,
+    "cancel_requested": False,
 }
 
 
-def set_job_state(**updates):
-    with job_state_lock:
-        job_state.update(updates)
-        return dict(job_state)
+def _own_job_id():
+    return getattr(_job_context, "job_id", None)
+
+
+def _update_job_state(fn, job_id=None):
+    """Atomically replace the job state with ``fn(state)``.
+
+    With ``job_id`` (by default the job run by this thread) nothing is written
+    once the state belongs to another job, so a job still winding down after
+    its cancel cannot overwrite the next one.
+    """
+    job_id = job_id or _own_job_id()
+
+    def apply(state):
+        if job_id is not None and state.get("job_id") != job_id:
+            return None
+        return fn(state)
+
+    snapshot = state_store.update("job_state", apply, JOB_STATE_DEFAULTS)
+    if snapshot is not None:
+        state_changes.bump()
+    return snapshot
+
+
+def set_job_state(job_id=None, /, **updates):
+    """Update the job state; ``job_id`` scopes the write like in :func:`_update_job_state`."""
+
+    def apply(state):
+        state.update(updates)
+        return state
+
+    return _update_job_state(apply, job_id)
 
 
 def get_job_state():
-    with job_state_lock:
-        return dict(job_state)
+    return state_store.get("job_state", JOB_STATE_DEFAULTS)
 
 
-def reset_job_state():
-    return set_job_state(
+def get_progress():
+    return state_store.get("progress_state", PROGRESS_DEFAULTS)
+
+
+def merge_job_stats(stats, job_id=None):
+    """Merge per-stage statistics reported by the pipeline scripts."""
+
+    def apply(state):
+        merged = state.get("stats") or {}
+        for stage, values in stats.items():
+            if isinstance(values, dict):
+                merged.setdefault(stage, {}).update(values)
+        state["stats"] = merged
+        state["bandwidth"] = _bandwidth_totals(merged, state.get("bandwidth", {}).get("budget", 0))
+        return state
+
+    _update_job_state(apply, job_id)
+
+
+def _bandwidth_totals(stats, budget=0):
+    """Sum the per-stage bandwidth reports into run totals and breakdowns."""
+    totals = {
+        "requests": 0,
+        "wire_bytes": 0,
+        "decoded_bytes": 0,
+        "budget": budget,
+        "budget_exceeded": False,
+        "by_stage": {},
+        "by_proxy": {},
+        "by_encoding": {},
+    }
+    for stage_stats in stats.values():
+        bandwidth = stage_stats.get("bandwidth") if isinstance(stage_stats, dict) else None
+        if not bandwidth:
+            continue
+        totals["budget_exceeded"] = totals["budget_exceeded"] or bool(bandwidth.get("budget_exceeded"))
+        for row in bandwidth.get("rows", []):
+            for field in ("requests", "wire_bytes", "decoded_bytes"):
+                totals[field] += row.get(field, 0)
+            for breakdown, key in (
+                ("by_stage", row.get("stage") or "unknown"),
+                ("by_proxy", row.get("proxy") or "unknown"),
+                ("by_encoding", row.get("encoding") or "identity"),
+            ):
+                bucket = totals[breakdown].setdefault(key, {"requests": 0, "wire_bytes": 0, "decoded_bytes": 0})
+                for field in ("requests", "wire_bytes", "decoded_bytes"):
+                    bucket[field] += row.get(field, 0)
+    return totals
+
+
+def _idle_job_fields():
+    progress = get_progress()
+    return dict(
         status="idle",
         mode=None,
         started_at=None,
@@ -119,30 +318,131 @@ def reset_job_state():
         results_ready=False,
         error=None,
         last_count=0,
-        phase=progress_state.get("phase", ""),
-        done=progress_state.get("done", 0),
-        total=progress_state.get("total", 0),
+        stats={},
+        bandwidth={},
+        deadline_at=None,
+        reused_stages=[],
+        run_id=None,
+        job_id=None,
+        profile_dir=None,
+        stage_pid=None,
+        owner=None,
+        owner_seen=None,
+        cancel_requested=False,
+        phase=progress.get("phase", ""),
+        done=progress.get("done", 0),
+        total=progress.get("total", 0),
     )
 
 
+def reset_job_state():
+    return set_job_state(**_idle_job_fields())
+
+
+def _worker_id():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _owner_alive(state):
+    """Whether the worker that claimed the job in ``state`` is still running it."""
+    owner = state.get("owner")
+    if not owner or time.time() - (state.get("owner_seen") or 0) > JOB_OWNER_TIMEOUT:
+        return False
+    host, _, pid = owner.rpartition(":")
+    if host == socket.gethostname():
+        try:
+            os.kill(int(pid), 0)
+        except ProcessLookupError:
+            return False
+        except (OSError, ValueError):
+            pass
+    return True
+
+
+def _claim_job(**fields):
+    """Atomically make this worker the owner of a new job; ``None`` while another one runs.
+
+    A job keeps its owner until the owner released it (:func:`_release_job`),
+    also after a cancel: only then has its last stage stopped.
+    """
+
+    def claim(state):
+        if state.get("owner") and _owner_alive(state):
+            return None
+        state.update(fields, owner=_worker_id(), owner_seen=time.time(), cancel_requested=False, stage_pid=None)
+        return state
+
+    return _update_job_state(claim, job_id=None)
+
+
+def _release_job(job_id, **fields):
+    """Give up the ownership of ``job_id`` once its thread is done with it."""
+    return set_job_state(job_id, owner=None, owner_seen=None, stage_pid=None, **fields)
+
+
+def _recover_job_state():
+    """At worker start, reset the shared state unless a live worker is running a job."""
+
+    interrupted = []
+
+    def recover(state):
+        if state.get("owner") and _owner_alive(state):
+            return None
+        if state.get("status") in ACTIVE_JOB_STATUSES:
+            interrupted.append(state.get("job_id"))
+        state.update(_idle_job_fields())
+        return state
+
+    _update_job_state(recover)
+    for job_id in filter(None, interrupted):
+        job_queue.finish(job_id, "failed", error="Zber bol prerušený.")
+
+
+def _keep_job_claim(stop, job_id):
+    while not stop.wait(JOB_OWNER_HEARTBEAT):
+        set_job_state(job_id, owner_seen=time.time())
+
+
+def _cancel_requested(job_id=None):
+    """Whether the job (this thread's by default) was cancelled or replaced."""
+    job_id = job_id or _own_job_id()
+    state = get_job_state()
+    if job_id is not None and state.get("job_id") != job_id:
+        return True
+    return bool(state.get("cancel_requested"))
+
+
 def _now_iso():
     return datetime.utcnow().isoformat() + "Z"
 
 
-reset_job_state()
+_recover_job_state()
 
 
-def reset_progress():
-    update_progress("", done=0, total=0)
+def reset_progress(job_id=None):
+    """Empty progress, from now on only updated for ``job_id`` (when given)."""
+    state_store.set("progress_state", dict(PROGRESS_DEFAULTS, job_id=job_id))
+    set_job_state(job_id, phase="", done=0, total=0)
 
 
-def terminate_running_process():
-    global running_process
-    if not running_process:
-        return
+def terminate_running_process(job_id=None):
+    """Kill the stage run for ``job_id``, or every stage of this worker."""
+    job_ids = list(running_processes) if job_id is None else [job_id]
+    for key in job_ids:
+        process = running_processes.pop(key, None)
+        if process is not None:
+            _kill_process_tree(process)
+
+
+def _kill_process_tree(process):
+    try:
+        # Imported here rather than at start: only cancelling a run needs it.
+        import psutil  # type: ignore
+    except Exception:  # pragma: no cover - optional dep
+        psutil = None
     try:
         if psutil:
-            parent = psutil.Process(running_process.pid)
+            parent = psutil.Process(process.pid)
             for child in parent.children(recursive=True):
                 try:
                     child.kill()
@@ -150,35 +450,39 @@ def terminate_running_process():
                     pass
             parent.kill()
         else:
-            running_process.terminate()
+            process.terminate()
             if os.name != "nt":
                 try:
-                    os.killpg(os.getpgid(running_process.pid), signal.SIGTERM)
+                    os.killpg(os.getpgid(process.pid), signal.SIGTERM)
                 except Exception:
                     pass
             try:
-                running_process.wait(timeout=2)
+                process.wait(timeout=2)
             except subprocess.TimeoutExpired:
-                running_process.kill()
+                process.kill()
                 if os.name != "nt":
                     try:
-                        os.killpg(os.getpgid(running_process.pid), signal.SIGKILL)
+                        os.killpg(os.getpgid(process.pid), signal.SIGKILL)
                     except Exception:
                         pass
-    finally:
-        running_process = None
+    except Exception:
+        pass
 
 
-def run_step(cmd: str, phase: str, progress_url: str):
-    global running_process
+def run_step(cmd: str, phase: str, progress_url: str, extra_env=None):
+    job_id = _own_job_id()
     print(f"\n🚀 Starting: {phase} → {cmd}")
     update_progress(phase, done=0, total=0)
 
     env = os.environ.copy()
     env["PYTHONUNBUFFERED"] = "1"
     env["PROGRESS_URL"] = progress_url
+    if extra_env:
+        env.update(extra_env)
 
-    running_process = subprocess.Popen(
+    started_at = time.time()
+    started = time.perf_counter()
+    process = running_processes[job_id] = subprocess.Popen(
         cmd,
         shell=True,
         stdout=sys.stdout,
@@ -187,20 +491,123 @@ def run_step(cmd: str, phase: str, progress_url: str):
         env=env,
         start_new_session=True,
     )
+    set_job_state(stage_pid=process.pid)
 
-    returncode = running_process.wait()
-    running_process = None
+    returncode, rusage = _wait_with_rusage(
+        process,
+        should_stop=lambda: _cancel_requested(job_id),
+        stop=lambda: terminate_running_process(job_id),
+    )
+    running_processes.pop(job_id, None)
+    set_job_state(stage_pid=None)
+    usage = {
+        "started_at": started_at,
+        "wall_seconds": round(time.perf_counter() - started, 3),
+        "cpu_seconds": round(rusage.ru_utime + rusage.ru_stime, 3) if rusage else None,
+        "max_rss_kb": rusage.ru_maxrss if rusage else None,
+        "returncode": returncode,
+    }
 
+    if returncode != 0 and _cancel_requested(job_id):
+        print(f"🛑 Step '{phase}' cancelled")
+        raise JobCancelled(phase)
     if returncode != 0:
         print(f"❌ Step '{phase}' failed with code {returncode}")
         failure_phase = f"❌ {phase}"
         update_progress(failure_phase, done=0, total=1)
-        raise subprocess.CalledProcessError(returncode, cmd)
+        error = subprocess.CalledProcessError(returncode, cmd)
+        error.usage = usage
+        raise error
 
     print(f"✅ Finished: {phase}")
-    with progress_lock:
-        total = progress_state.get("total", 0)
+    total = get_progress().get("total", 0)
     update_progress(phase, done=total, total=total)
+    return usage
+
+
+def _wait_with_rusage(process, should_stop=None, stop=None):
+    """Wait for ``process``; returns ``(returncode, rusage)`` (rusage is ``None`` off POSIX).
+
+    ``wait4`` reports the CPU time of the stage including the processes it
+    waited for (stage 3's parser pool). It is polled with ``WNOHANG`` so
+    ``stop()`` can still kill and reap the child on cancel; about once a
+    second ``should_stop()`` is asked whether to call it.
+    """
+    if not hasattr(os, "wait4") or resource is None:
+        return process.wait(), None
+    children_before = resource.getrusage(resource.RUSAGE_CHILDREN)
+    polls = 0
+    while True:
+        try:
+            pid, status, rusage = os.wait4(process.pid, os.WNOHANG)
+        except ChildProcessError:
+            # Already reaped elsewhere: on cancel, or by gevent's child watcher
+            # under the gevent worker. Stages run one at a time, so the growth
+            # of the reaped-children totals is this stage's CPU time; ru_maxrss
+            # there is the largest child so far, an upper bound.
+            returncode = process.wait()
+            after = resource.getrusage(resource.RUSAGE_CHILDREN)
+            return returncode, SimpleNamespace(
+                ru_utime=after.ru_utime - children_before.ru_utime,
+                ru_stime=after.ru_stime - children_before.ru_stime,
+                ru_maxrss=after.ru_maxrss,
+            )
+        if pid:
+            process.returncode = os.waitstatus_to_exitcode(status)
+            return process.returncode, rusage
+        polls += 1
+        if should_stop and stop and polls % 10 == 0 and should_stop():
+            stop()
+        time.sleep(0.1)
+
+
+def run_cached_step(stage, cmd, phase, progress_url, extra_env=None, cache_extra=None, use_cache=True):
+    """Run a pipeline stage unless its outputs for identical inputs are cached.
+
+    The stage's usage and reported stats are recorded in the run history.
+    """
+    if _cancel_requested():
+        raise JobCancelled(phase)
+    profile_dir = get_job_state().get("profile_dir")
+    if profile_dir:
+        # A restored stage has nothing to profile.
+        use_cache = False
+        cmd = cmd.replace("python ", f'python stage_profiler.py --out "{profile_dir}" --name {stage} ', 1)
+    use_cache = use_cache and artifact_cache.CACHE_ENABLED
+    key = artifact_cache.stage_hash(stage, cache_extra) if use_cache else None
+    if use_cache and artifact_cache.restore(stage, key):
+        print(f"♻️ Reused cached outputs: {phase} ({key[:12]})")
+        update_progress(phase, done=1, total=1)
+        _update_job_state(lambda state: dict(state, reused_stages=state.get("reused_stages", []) + [stage]))
+        _record_stage(stage, {"started_at": time.time(), "wall_seconds": 0.0, "returncode": 0}, cache_hit=True)
+        metrics.STAGE_SECONDS.observe(0.0, stage=stage, outcome="cached")
+        return
+
+    try:
+        usage = run_step(cmd, phase, progress_url, extra_env=extra_env)
+    except subprocess.CalledProcessError as exc:
+        usage = getattr(exc, "usage", {})
+        _record_stage(stage, usage)
+        metrics.STAGE_SECONDS.observe(usage.get("wall_seconds", 0.0), stage=stage, outcome="failed")
+        raise
+    _record_stage(stage, usage)
+    metrics.STAGE_SECONDS.observe(usage["wall_seconds"], stage=stage, outcome="ok")
+    if use_cache:
+        try:
+            artifact_cache.store(stage, key)
+        except OSError as exc:
+            print(f"⚠️ Could not cache outputs of {phase}: {exc}")
+
+
+def _record_stage(stage, usage, cache_hit=False):
+    state = get_job_state()
+    run_id = state.get("run_id")
+    if run_id is None or (_own_job_id() and state.get("job_id") != _own_job_id()):
+        return
+    try:
+        telemetry.record_stage(run_id, stage, usage, state.get("stats", {}).get(stage), cache_hit=cache_hit)
+    except Exception as exc:
+        print(f"⚠️ Could not record telemetry for {stage}: {exc}")
 
 
 def _extract_token():
@@ -252,26 +659,25 @@ def health_check():
 def wake_backend():
     """Endpoint used by the UI to wake up the sleeping Railway instance."""
 
-    return jsonify({"status": "waking"})
+    return jsonify({"status": "waking", "results_warm": warm_started.is_set()})
 
 
 @app.route("/auth/login", methods=["POST"])
 def auth_login():
     ip = request.remote_addr or ""
     now = time.time()
-    attempts = login_attempts[ip]
-    login_attempts[ip] = [ts for ts in attempts if now - ts < 60]
-    if len(login_attempts[ip]) >= 5:
+    attempts_key = f"login_attempts:{ip}"
+    if len([ts for ts in state_store.get(attempts_key, []) if now - ts < 60]) >= 5:
         return jsonify({"error": "Too many attempts"}), 429
 
     password = request.get_json(force=True).get("password", "")
     if hmac.compare_digest(str(password).encode(), AUTH_PASSWORD.encode()):
         token = serializer.dumps({"ip": ip})
         resp = make_response(jsonify({"ok": True, "token": token, "expires_in": 86400}))
-        login_attempts[ip] = []
+        state_store.delete(attempts_key)
         return resp
     else:
-        login_attempts[ip].append(now)
+        state_store.update(attempts_key, lambda attempts: [ts for ts in attempts if now - ts < 60] + [now], [])
         return jsonify({"ok": False}), 401
 
 
@@ -288,29 +694,67 @@ def auth_status():
 @app.route("/cancel", methods=["POST"])
 @require_auth
 def cancel():
-    terminate_running_process()
-    reset_progress()
-    set_job_state(
-        status="cancelled",
-        finished_at=_now_iso(),
-        results_ready=False,
-        error=None,
-        mode=None,
-        last_count=0,
-    )
+    job_id = get_job_state().get("job_id")
+    if job_id:
+        job_queue.cancel(job_id)
+    _cancel_running_job()
     return jsonify({"ok": True, "status": get_job_state()})
 
 
+def _cancel_running_job(job_id=None):
+    """Cancel the current job (only if it is ``job_id``, when given); ``False`` if it was not."""
+
+    def apply(state):
+        if job_id and state.get("job_id") != job_id:
+            return None
+        state.update(
+            status="cancelled",
+            cancel_requested=True,
+            finished_at=_now_iso(),
+            results_ready=False,
+            error=None,
+            mode=None,
+            last_count=0,
+        )
+        return state
+
+    state = _update_job_state(apply)
+    if state is None:
+        return False
+    # The owner keeps its claim until its stage has stopped and it released
+    # the job; see _claim_job.
+    terminate_running_process(state.get("job_id"))
+    _stop_other_workers_stage(state)
+    reset_progress()
+    return True
+
+
+def _stop_other_workers_stage(state):
+    """Stop a stage run by another worker on this host right away.
+
+    The owning worker also notices ``cancel_requested`` within a second and
+    cleans up; this only saves that second when the owner is local.
+    """
+    pid, owner = state.get("stage_pid"), state.get("owner") or ""
+    if not pid or owner == _worker_id() or owner.rpartition(":")[0] != socket.gethostname():
+        return
+    try:
+        # Stages run in their own session, so the group id is the stage's pid.
+        os.killpg(pid, signal.SIGTERM)
+    except (OSError, AttributeError):
+        pass
+
+
 @app.route("/restart", methods=["POST"])
 @require_auth
 def restart():
-    global running_process
-    if running_process:
-        running_process.terminate()
-        running_process = None
+    # Only this worker exits (gunicorn starts a fresh one); a job run by
+    # another worker is cancelled like with /cancel.
+    terminate_running_process()
     reset_progress()
     set_job_state(
         status="restarting",
+        cancel_requested=True,
         finished_at=_now_iso(),
         results_ready=False,
         error=None,
@@ -326,26 +770,48 @@ def restart():
 @require_auth
 def progress_update():
     data = request.get_json(force=True)
+    # Stages started for a job post with ?job=<id>; posts from a job that was
+    # cancelled in the meantime are dropped.
+    job_id = request.args.get("job")
     update_progress(
         data.get("phase"),
         done=data.get("done"),
         total=data.get("total"),
+        job_id=job_id,
     )
+    if isinstance(data.get("stats"), dict):
+        merge_job_stats(data["stats"], job_id)
+    if isinstance(data.get("metrics"), dict):
+        metrics.REGISTRY.merge(data["metrics"])
+    if isinstance(data.get("results"), str):
+        job_id = job_id or get_job_state().get("job_id")
+        if job_id:
+            live_results.publish(job_id, parse_result_blocks_text(data["results"]))
     return "ok", 200
 
 
-def update_progress(phase=None, *, done=None, total=None):
-    with progress_lock:
+def update_progress(phase=None, *, done=None, total=None, job_id=None):
+    job_id = job_id or _own_job_id()
+
+    def apply(progress):
+        if job_id is not None and progress.get("job_id") != job_id:
+            return None
         if phase is not None:
-            progress_state["phase"] = phase
+            progress["phase"] = phase
         if done is not None:
-            progress_state["done"] = done
+            progress["done"] = done
         if total is not None:
-            progress_state["total"] = total
+            progress["total"] = total
+        return progress
+
+    progress = state_store.update("progress_state", apply, PROGRESS_DEFAULTS)
+    if progress is None:
+        return
     set_job_state(
-        phase=progress_state.get("phase", ""),
-        done=progress_state.get("done", 0),
-        total=progress_state.get("total", 0),
+        job_id,
+        phase=progress.get("phase", ""),
+        done=progress.get("done", 0),
+        total=progress.get("total", 0),
     )
 
 def parse_result_blocks(filepath):
@@ -354,193 +820,6 @@ def parse_result_blocks(filepath):
         return parse_result_blocks_text(f.read())
 
 
-def parse_result_blocks_text(text):
-    results = []
-    block = {}
-    for raw in text.splitlines():
-        line = raw.strip()
-        line_lower = line.lower()
-
-        if line.startswith("URL:"):
-            # safer than split()[1]
-            _, _, val = line.partition("URL:")
-            block["url"] = val.strip()
-
-        elif line.startswith("Sub Category:") or line.startswith("Subcategory:") \
-             or line.startswith("Subkategória:") or line.startswith("Subkategorie:"):
-            val = after_label(
-                line,
-                "Sub Category: ",
-                "Subcategory: ",
-                "Subkategória: ",
-                "Subkategorie: "
-            )
-            if val is not None:
-                block["subcat"] = val
-
-        elif line_lower.startswith("city:") or line_lower.startswith("mesto:"):
-            val = after_label(
-                line,
-                "City: ",
-                "City:",
-                "city: ",
-                "city:",
-                "CITY: ",
-                "CITY:",
-                "Mesto: ",
-                "Mesto:",
-                "mesto: ",
-                "mesto:",
-                "MESTO: ",
-                "MESTO:",
-            )
-            if val is not None:
-                cleaned = val.strip()
-                block["city"] = "" if cleaned.upper() == "N/A" else cleaned
-
-        elif line_lower.startswith("zip:") or line_lower.startswith("psč:") or line_lower.startswith("psc:"):
-            val = after_label(
-                line,
-                "ZIP: ",
-                "ZIP:",
-                "zip: ",
-                "zip:",
-                "PSČ: ",
-                "PSČ:",
-                "psč: ",
-                "psč:",
-                "psc: ",
-                "psc:",
-                "PSC: ",
-                "PSC:",
-            )
-            if val is not None:
-                cleaned = val.strip()
-                block["zip_code"] = "" if cleaned.upper() == "N/A" else cleaned
-
-        elif line.startswith("Timestamp:"):
-            _, _, ts = line.partition("Timestamp:")
-            block["date"] = _parse_datetime(ts.strip())
-
-        elif line.startswith("==="):
-            if block.get("url"):              # only keep meaningful blocks
-                results.append(block)
-            block = {}
-
-    # flush trailing block if file doesn’t end with "==="
-    if block.get("url"):
-        results.append(block)
-
-    logging.debug("Parsed %d result blocks", len(results))
-    return results
-
-
-def _parse_datetime(s: str):
-    for fmt in ("%d/%m/%Y %H:%M", "%Y-%m-%d %H:%M"):
-        try:
-            return datetime.strptime(s, fmt)
-        except ValueError:
-            continue
-    return None
-
-def _parse_date(s: str):
-    for fmt in ("%d/%m/%Y", "%Y-%m-%d"):
-        try:
-            return datetime.strptime(s, fmt).date()
-        except ValueError:
-            continue
-    return None
-
-
-def _normalize_result_datetime(value):
-    if not value:
-        return None
-
-    if isinstance(value, datetime):
-        return value
-
-    if isinstance(value, date):
-        return datetime.combine(value, datetime.min.time())
-
-    if isinstance(value, str):
-        parsed_dt = _parse_datetime(value)
-        if parsed_dt:
-            return parsed_dt
-
-        parsed_date = _parse_date(value)
-        if parsed_date:
-            return datetime.combine(parsed_date, datetime.min.time())
-
-    return None
-
-
-def _format_result_date_for_response(value):
-    if not value:
-        return ""
-
-    normalized = _normalize_result_datetime(value)
-    if not normalized:
-        return value if isinstance(value, str) else ""
-
-    has_time = False
-    if isinstance(value, datetime):
-        has_time = True
-    elif isinstance(value, str) and _parse_datetime(value):
-        has_time = True
-    elif normalized.hour or normalized.minute or normalized.second or normalized.microsecond:
-        has_time = True
-
-    return normalized.strftime("%d/%m/%Y %H:%M") if has_time else normalized.strftime("%d/%m/%Y")
-
-
-def _filter_results_by_params(results, subcats, start_date, end_date):
-    filtered = []
-
-    # Accept either separate `start_date`/`end_date` or a single combined
-    # range string (e.g. "11/11/2025 - 13/11/2025"). If a combined range
-    # was passed in either parameter, split it into start/end parts so the
-    # subsequent parsing works as expected.
-    if isinstance(start_date, str) and re.search(r'[\-–—]', start_date):
-        parts = re.split(r"\s*[–—-]\s*", start_date)
-        if len(parts) >= 2:
-            start_date = parts[0].strip()
-            end_date = parts[1].strip()
-
-    if isinstance(end_date, str) and re.search(r'[\-–—]', end_date):
-        parts = re.split(r"\s*[–—-]\s*", end_date)
-        if len(parts) >= 2:
-            # If end_date contained a combined range, prefer its parsed
-            # values (but do not overwrite a previously split start_date
-            # unless it's empty).
-            if not start_date:
-                start_date = parts[0].strip()
-            end_date = parts[1].strip()
-
-    d1 = _parse_date(start_date) if start_date else None
-    d2 = _parse_date(end_date)   if end_date   else None
-
-    for res in results:
-        if subcats and res.get("subcat", "").strip() not in subcats:
-            continue
-
-        ad_dt = _normalize_result_datetime(res.get("date"))
-        ad_date = ad_dt.date() if ad_dt else None
-
-        if d1 and ad_date and ad_date < d1:
-            continue
-        if d2 and ad_date and ad_date > d2:
-            continue
-
-        filtered.append({
-            "url": res.get("url"),
-            "subcat": res.get("subcat", ""),
-            "date": _format_result_date_for_response(res.get("date")),
-            "city": res.get("city", ""),
-            "zip_code": res.get("zip_code", ""),
-        })
-
-    return filtered
-
 @app.route("/scrape", methods=["POST"])
 @require_auth
 def scrape():
@@ -551,54 +830,131 @@ def scrape():
     subcats = set(data.get("subcategories", []))
     date_start = data.get("date_start")
     date_end   = data.get("date_end")
+    try:
+        byte_budget = int(data.get("byte_budget") or DEFAULT_BYTE_BUDGET)
+    except (TypeError, ValueError):
+        return jsonify({"ok": False, "error": "byte_budget must be an integer"}), 400
+    try:
+        deadline_seconds = float(data.get("deadline_seconds") or 0)
+    except (TypeError, ValueError):
+        return jsonify({"ok": False, "error": "deadline_seconds must be a number"}), 400
+    profile = bool(data.get("profile")) or PROFILE_STAGES
+    # Same keys as in _warm_start, whose responses share the cache.
+    filters = {
+        "city": data.get("city") or None,
+        "zip_code": data.get("zip_code") or None,
+        "search": data.get("q") or None,
+    }
 
-    if mode == "old":
-        results = fetch_previous_results(subcats, date_start, date_end)
-        return jsonify(results)
-    if mode == "latest":
-        results = fetch_latest_results(subcats, date_start, date_end)
-        return jsonify(results)
-
-    current_state = get_job_state()
-    if current_state.get("status") in {"running", "starting"}:
-        return jsonify({
-            "ok": False,
-            "error": "Zber už prebieha.",
-            "status": current_state,
-        })
-
-    job_started_at = _now_iso()
-    reset_progress()
-    set_job_state(
-        status="starting",
-        mode=mode,
-        started_at=job_started_at,
-        finished_at=None,
-        results_ready=False,
-        error=None,
-        last_count=0,
-    )
+    if mode in ("old", "latest"):
+        return _stored_results_response(mode, subcats, date_start, date_end, filters)
 
-    payload = {
-        "subcats": subcats,
+    options = {"byte_budget": byte_budget, "deadline_seconds": deadline_seconds, "profile": profile}
+    job, attached = job_queue.submit(options, {
+        "subcategories": sorted(subcats),
         "date_start": date_start,
         "date_end": date_end,
-    }
-
-    worker = threading.Thread(target=_run_scrape_job, args=(payload,), daemon=True)
+    })
+    if not attached:
+        _dispatch_jobs()
+    return jsonify({
+        "ok": True,
+        "attached": attached,
+        "job": job_queue.get(job["id"]) or job,
+        "status": get_job_state(),
+    })
+
+
+def _dispatch_jobs():
+    """Start the oldest queued job unless a job is already running.
+
+    Called after queueing a job, when a job ends and at worker start; the job
+    claim makes sure only one worker starts it.
+    """
+    while True:
+        job = job_queue.next_queued()
+        if job is None:
+            return
+        options = job["options"]
+        deadline_seconds = options.get("deadline_seconds") or 0
+        claimed = _claim_job(
+            status="starting",
+            mode="new",
+            started_at=_now_iso(),
+            finished_at=None,
+            results_ready=False,
+            error=None,
+            last_count=0,
+            stats={},
+            bandwidth={"budget": options.get("byte_budget", 0)},
+            deadline_at=(time.time() + deadline_seconds) if deadline_seconds > 0 else None,
+            reused_stages=[],
+            profile_dir=None,
+            job_id=job["id"],
+            run_id=None,
+        )
+        if claimed is None:
+            return  # the running job's worker dispatches the next one when it ends
+        if job_queue.start(job["id"]) is not None:
+            break
+        # Cancelled, or started by another worker, since it was read.
+        _release_job(job["id"], status="idle")
+
+    live_results.open(job["id"])
+    reset_progress(job["id"])
+    run_id = _start_run("new", dict(options, job_id=job["id"], requests=job["requests"]))
+    set_job_state(job["id"], run_id=run_id)
+    if options.get("profile"):
+        run_label = str(run_id or datetime.utcnow().strftime("%Y%m%d-%H%M%S"))
+        set_job_state(job["id"], profile_dir=os.path.join(PROFILES_DIR, run_label))
+
+    worker = threading.Thread(target=_run_scrape_job, daemon=True)
     worker.start()
 
-    return jsonify({"ok": True, "status": get_job_state()})
+
+def _request_counts(requests, results, counts=None):
+    """``{request_key: number of results matching it}`` for ``requests``, added to ``counts``."""
+    counts = {} if counts is None else counts
+    for req in requests:
+        key = request_key(req)
+        if key not in counts:
+            counts[key] = len(
+                filter_results_by_params(results, set(req["subcategories"]), req["date_start"], req["date_end"])
+            )
+    return counts
 
 
-def _run_scrape_job(payload):
-    subcats = payload.get("subcats", set())
-    date_start = payload.get("date_start")
-    date_end = payload.get("date_end")
+def _finish_job(job_id, results, **fields):
+    """Mark ``job_id`` finished with per-request counts; ``None`` if it was cancelled meanwhile.
+
+    The counts are computed outside the state store update: that holds the
+    store's write lock (or is retried on Redis) and must stay cheap.
+    """
+    job = job_queue.get(job_id)
+    counts = _request_counts(job["requests"] if job else [], results)
+    job = job_queue.finish(job_id, "finished", counts=counts, results=len(results), **fields)
+    if job is None:
+        return None
+    # Requests attached between the read above and the finish; none can attach now.
+    late = [req for req in job["requests"] if request_key(req) not in counts]
+    if late:
+        job = job_queue.record_counts(job_id, _request_counts(late, results, counts)) or job
+    return job
+
+
+def _run_scrape_job():
+    state = get_job_state()
+    job_id, run_id = state.get("job_id"), state.get("run_id")
+    byte_budget = state.get("bandwidth", {}).get("budget", 0)
+    deadline_at = state.get("deadline_at")
+    # Scopes this thread's state writes and stage runs to the job.
+    _job_context.job_id = job_id
+    stop_heartbeat = threading.Event()
+    threading.Thread(target=_keep_job_claim, args=(stop_heartbeat, job_id), daemon=True).start()
 
     try:
         set_job_state(status="running")
-        results = _execute_new_scrape(subcats, date_start, date_end)
+        results = _execute_new_scrape(byte_budget=byte_budget, deadline_at=deadline_at)
         set_job_state(
             status="finished",
             finished_at=_now_iso(),
@@ -606,6 +962,16 @@ def _run_scrape_job(payload):
             error=None,
             last_count=len(results),
         )
+        if _finish_job(job_id, results, run_id=run_id) is None:
+            # Cancelled after the stages ended; the cancel has been confirmed to the client.
+            _finish_run("cancelled", run_id=run_id)
+        else:
+            _finish_run("finished", results=len(results), run_id=run_id)
+        liveness_checker.start()
+    except JobCancelled:
+        # /cancel already recorded the state.
+        job_queue.finish(job_id, "cancelled", run_id=run_id)
+        _finish_run("cancelled", run_id=run_id)
     except SitemapCollectionError as e:
         logging.error("Sitemap collection failed: %s", e)
         set_job_state(
@@ -614,6 +980,8 @@ def _run_scrape_job(payload):
             results_ready=False,
             error=str(e),
         )
+        job_queue.finish(job_id, "failed", run_id=run_id, error=str(e))
+        _finish_run("failed", error=str(e), run_id=run_id)
     except subprocess.CalledProcessError as e:
         logging.error("Step failed: %s", e)
         traceback.print_exc()
@@ -624,6 +992,8 @@ def _run_scrape_job(payload):
             results_ready=False,
             error=message,
         )
+        job_queue.finish(job_id, "failed", run_id=run_id, error=message)
+        _finish_run("failed", error=message, run_id=run_id)
     except Exception as e:
         logging.exception("Unexpected error during scrape")
         update_progress("❌ Neznáma chyba", done=0, total=1)
@@ -633,9 +1003,52 @@ def _run_scrape_job(payload):
             results_ready=False,
             error=f"Neočakávaná chyba: {e}",
         )
+        job_queue.finish(job_id, "failed", run_id=run_id, error=f"Neočakávaná chyba: {e}")
+        _finish_run("failed", error=str(e), run_id=run_id)
+    finally:
+        stop_heartbeat.set()
+        live_results.close(job_id)
+        _job_context.job_id = None
+        _release_job(job_id)
+        _dispatch_jobs()
+
+
+def _start_run(mode, params):
+    try:
+        return telemetry.start_run(mode, params)
+    except Exception as exc:
+        print(f"⚠️ Could not record run start: {exc}")
+        return None
 
 
-def _execute_new_scrape(subcats, date_start, date_end):
+def _finish_run(status, results=None, error=None, run_id=None):
+    run_id = run_id or get_job_state().get("run_id")
+    if run_id is None:
+        return
+    try:
+        telemetry.finish_run(run_id, status, results=results, error=error)
+    except Exception as exc:
+        print(f"⚠️ Could not record run end: {exc}")
+
+
+def _budget_env(byte_budget):
+    """Environment limiting the next stage to the bytes left in the run budget."""
+    if not byte_budget:
+        return {}
+    used = get_job_state().get("bandwidth", {}).get("wire_bytes", 0)
+    # BYTE_BUDGET=0 means unlimited, so an exhausted budget is passed as 1 byte.
+    return {"BYTE_BUDGET": str(max(byte_budget - used, 1))}
+
+
+def _stage_env(byte_budget, deadline_at):
+    env = _budget_env(byte_budget)
+    if deadline_at:
+        env["PIPELINE_DEADLINE"] = f"{deadline_at:.3f}"
+    return env
+
+
+def _execute_new_scrape(byte_budget=0, deadline_at=None):
+    """Run the pipeline; returns all new results (requests filter them themselves)."""
     # Load old links from GitHub and inject to disk for phase 1
     old_links = load_old_links()
     with open("Data/old_results.txt", "w", encoding="utf-8") as f:
@@ -643,18 +1056,32 @@ def _execute_new_scrape(subcats, date_start, date_end):
 
     port = os.environ.get("PORT", "5000")
     progress_url = f"http://127.0.0.1:{port}/progress_update"
+    if _own_job_id():
+        progress_url += f"?job={_own_job_id()}"
 
+    # Stage 1 runs to completion whatever the deadline: the run stops when a
+    # sitemap is missing, and stage 3 makes room for the deadline instead.
     try:
-        run_step('python "1- Sitemap links.py"', "1/5 – Zbieram sitemapy", progress_url)
+        run_cached_step("stage1", 'python "1- Sitemap links.py"', "1/5 – Zbieram sitemapy", progress_url,
+                        extra_env=_budget_env(byte_budget), use_cache=False)
     except subprocess.CalledProcessError as exc:
         raise SitemapCollectionError(
             "Nepodarilo sa načítať všetky sitemap súbory – zber bol zastavený."
         ) from exc
 
-    run_step('python "2 - Local filtering.py"', "2/5 – Prvé filtrovanie", progress_url)
-    run_step('python "3 - Ad HTML scraper.py"', "3/5 – HTML filtrácia", progress_url)
-    run_step('python "4 - Filter by description.py"', "4/5 – Filtrovanie podľa popisu", progress_url)
-    run_step('python "5 - OpenAI filtering.py"', "5/5 – Finálne filtrovanie", progress_url)
+    # Budgets and deadlines truncate stage outputs, so such runs neither use
+    # nor fill the artifact cache.
+    use_cache = not byte_budget and not deadline_at
+    keywords = {"keywords": "\n".join(load_keywords())} if use_cache else None
+
+    run_cached_step("stage2", 'python "2 - Local filtering.py"', "2/5 – Prvé filtrovanie", progress_url,
+                    cache_extra=keywords, use_cache=use_cache)
+    run_cached_step("stage3", 'python "3 - Ad HTML scraper.py"', "3/5 – HTML filtrácia", progress_url,
+                    extra_env=_stage_env(byte_budget, deadline_at), use_cache=use_cache)
+    run_cached_step("stage4", 'python "4 - Filter by description.py"', "4/5 – Filtrovanie podľa popisu",
+                    progress_url, cache_extra=keywords, use_cache=use_cache)
+    run_cached_step("stage5", 'python "5 - OpenAI filtering.py"', "5/5 – Finálne filtrovanie", progress_url,
+                    extra_env=_stage_env(0, deadline_at), use_cache=use_cache)
 
     new_results = []
     if os.path.exists(PHASE3_FILE):
@@ -666,43 +1093,323 @@ def _execute_new_scrape(subcats, date_start, date_end):
             lf.write(phase3_text)
 
         new_results = parse_result_blocks_text(phase3_text)
-        append_phase3_results(phase3_text)
-
-    # Filter new results according to provided filters
-    filtered = _filter_results_by_params(new_results, subcats, date_start, date_end)
-
-    with progress_lock:
-        final_total = progress_state.get("total", 0)
+        # Stage 5 publishes per batch; this adds whatever it could not post
+        # (or everything, when its output came from the artifact cache).
+        live_results.publish(get_job_state().get("job_id"), new_results)
+        results_db.replace_latest(phase3_text)
+        results_cache.clear()
+        with results_write_lock:
+            results_index.ingest(append_phase3_results(phase3_text))
+
+    final_total = get_progress().get("total", 0)
     if not final_total:
-        final_total = max(len(filtered), 1)
+        final_total = max(len(new_results), 1)
     update_progress("Hotovo", done=final_total, total=final_total)
-    return filtered
+    return new_results
 
 
-def fetch_previous_results(subcats, start_date, end_date):
-    text = load_phase3_results()
-    if text:
-        all_results = parse_result_blocks_text(text)
+def _stored_results_etag(mode, subcats, date_start, date_end, filters):
+    """Strong ETag of a ``mode=old``/``latest`` response: database version plus filters."""
+    if mode == "old":
+        results_index.refresh()
+        liveness_checker.dead_urls()  # first call records tombstones for known dead ads
     else:
-        all_results = []
-    return _filter_results_by_params(all_results, subcats, start_date, end_date)
+        _ensure_latest_loaded()
+    first, last = parse_date_range(date_start, date_end)
+    key = json.dumps(
+        [mode, results_db.version(latest=mode == "latest"), sorted(subcats), str(first), str(last), filters],
+        sort_keys=True,
+    )
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()[:32]
 
 
-def fetch_latest_results(subcats, start_date, end_date):
-    if not os.path.exists(LATEST_RESULTS_FILE):
-        return []
+def _stored_results_body(etag, mode, subcats, date_start, date_end, filters):
+    """Serialized results as ``{encoding: bytes}``; ``None`` holds the uncompressed body."""
+    variants = results_cache.get(etag)
+    if variants is not None:
+        return variants
+    fetch = fetch_previous_results if mode == "old" else fetch_latest_results
+
+    def render():
+        rendered = {None: app.json.dumps(fetch(subcats, date_start, date_end, **filters)).encode("utf-8")}
+        results_cache.put(etag, rendered)
+        return rendered
 
+    return results_flights.do(etag, render)
+
+
+def _encoded_results_body(etag, variants, encoding):
+    """``variants`` compressed with ``encoding``; compressed once and cached alongside the body."""
+    body = variants.get(encoding)
+    if body is not None:
+        return body
+
+    def encode():
+        encoded = variants[encoding] = compression.encode(variants[None], encoding)
+        return encoded
+
+    return results_flights.do((etag, encoding), encode)
+
+
+def _stored_results_response(mode, subcats, date_start, date_end, filters):
+    """``mode=old``/``latest`` results with a strong ETag; 304 if the client has them."""
+    etag = _stored_results_etag(mode, subcats, date_start, date_end, filters)
+    matched = compression.matched_encoding(request.if_none_match, etag)
+    if matched is not False:
+        # The 304 repeats the validator the 200 would carry, encoding suffix
+        # included; that needs the body size, or else the tag the client sent.
+        variants = results_cache.get(etag)
+        encoding = matched if variants is None else compression.pick_encoding(
+            request.accept_encodings, len(variants[None])
+        )
+        response = make_response("", 304)
+    else:
+        variants = _stored_results_body(etag, mode, subcats, date_start, date_end, filters)
+        encoding = compression.pick_encoding(request.accept_encodings, len(variants[None]))
+        body = variants[None] if encoding is None else _encoded_results_body(etag, variants, encoding)
+        response = app.response_class(body, mimetype="application/json")
+    response.set_etag(etag)
+    if encoding is not None:
+        if response.status_code == 304:
+            response.set_etag(f"{etag}-{encoding}")  # no body, so no Content-Encoding
+        else:
+            compression.mark_encoded(response, encoding)
+    # The representation depends on Accept-Encoding, 304 included.
+    response.vary.add("Accept-Encoding")
+    response.headers["Cache-Control"] = "private, no-cache"
+    return response
+
+
+def _warm_start():
+    """Load the results database and pre-render the unfiltered queries after boot."""
     try:
+        results_index.warm()
+        filters = {"city": None, "zip_code": None, "search": None}
+        for mode in ("old", "latest"):
+            etag = _stored_results_etag(mode, set(), None, None, filters)
+            _stored_results_body(etag, mode, set(), None, None, filters)
+    except Exception as exc:
+        print(f"⚠️ Warm start failed: {exc}")
+    finally:
+        warm_started.set()
+
+
+def fetch_previous_results(subcats, start_date, end_date, **filters):
+    results = results_index.query(subcats, start_date, end_date, **filters)
+    dead = liveness_checker.dead_urls()
+    if dead:
+        results = [r for r in results if r.get("url") not in dead]
+    return results
+
+
+def _ensure_latest_loaded():
+    if not results_db.has_latest() and os.path.exists(LATEST_RESULTS_FILE):
+        # Databases created before runs stored their output there.
         with open(LATEST_RESULTS_FILE, encoding="utf-8") as f:
-            text = f.read()
-    except FileNotFoundError:
-        return []
+            results_db.replace_latest(f.read())
 
-    if not text.strip():
+
+def fetch_latest_results(subcats, start_date, end_date, **filters):
+    _ensure_latest_loaded()
+    if not results_db.has_latest():
         return []
 
-    recent_results = parse_result_blocks_text(text)
-    return _filter_results_by_params(recent_results, subcats, start_date, end_date)
+    first, last = parse_date_range(start_date, end_date)
+    return results_db.query(subcats, first, last, latest=True, **filters)
+
+@app.route("/metrics", methods=["GET"])
+def metrics_endpoint():
+    """Prometheus scrape target; requires ``Bearer $METRICS_TOKEN``, or localhost when that is unset."""
+    if METRICS_TOKEN:
+        supplied = request.headers.get("Authorization", "").removeprefix("Bearer ").strip()
+        if not hmac.compare_digest(supplied, METRICS_TOKEN):
+            return jsonify({"error": "auth required"}), 401
+    elif request.remote_addr not in ("127.0.0.1", "::1"):
+        return jsonify({"error": "auth required"}), 401
+    response = make_response(metrics.REGISTRY.render())
+    response.headers["Content-Type"] = "text/plain; version=0.0.4; charset=utf-8"
+    return response
+
+
+def _filters_fingerprint(subcats, first, last, city, zip_code):
+    key = json.dumps([sorted(subcats), str(first), str(last), city, zip_code])
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()[:12]
+
+
+def _encode_cursor(rev, fingerprint):
+    raw = json.dumps({"rev": rev, "f": fingerprint}, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def _decode_cursor(cursor):
+    raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+    data = json.loads(raw)
+    return int(data["rev"]), data["f"]
+
+
+@app.route("/results", methods=["GET"])
+@require_auth
+def results_delta():
+    """Changes to the stored results since ``cursor``, for clients keeping a local copy."""
+    args = request.args
+    subcats = {s.strip() for s in args.get("subcategories", "").split(",") if s.strip()}
+    first, last = parse_date_range(args.get("date_start"), args.get("date_end"))
+    city = args.get("city") or None
+    zip_code = args.get("zip_code") or None
+    fingerprint = _filters_fingerprint(subcats, first, last, city, zip_code)
+    try:
+        limit = max(1, min(int(args.get("limit", RESULTS_PAGE_DEFAULT)), RESULTS_PAGE_MAX))
+    except ValueError:
+        return jsonify({"ok": False, "error": "limit must be an integer"}), 400
+
+    rev = 0
+    if args.get("cursor"):
+        try:
+            rev, cursor_fingerprint = _decode_cursor(args["cursor"])
+        except (ValueError, KeyError, TypeError):
+            return jsonify({"ok": False, "error": "invalid cursor"}), 400
+        if cursor_fingerprint != fingerprint:
+            # The client's copy was built with other filters; it must start over.
+            return jsonify({"ok": False, "error": "cursor does not match filters", "reset": True}), 409
+
+    results_index.refresh()
+    liveness_checker.dead_urls()  # first call records tombstones for known dead ads
+    changes, next_rev, has_more = results_db.changes_since(rev, limit, subcats, first, last, city, zip_code)
+    return jsonify({
+        "ok": True,
+        "changes": changes,
+        "cursor": _encode_cursor(next_rev, fingerprint),
+        "has_more": has_more,
+    })
+
+
+def _job_queued(job_id):
+    job = job_queue.get(job_id)
+    return job is not None and job["status"] == "queued"
+
+
+@app.route("/results/live", methods=["GET"])
+@require_auth
+def results_live():
+    """Server-Sent Events: results of ``job`` as stage 5 keeps them, filtered like ``/scrape``."""
+    args = request.args
+    job_id = args.get("job") or get_job_state().get("job_id")
+    if not job_id or (live_results.read(job_id) is None and not _job_queued(job_id)):
+        return jsonify({"ok": False, "error": "Unknown job"}), 404
+    subcats = {s.strip() for s in args.get("subcategories", "").split(",") if s.strip()}
+    date_start, date_end = args.get("date_start"), args.get("date_end")
+    try:
+        # Event ids count the feed items already sent, so a reconnect resumes.
+        position = max(0, int(request.headers.get("Last-Event-ID") or args.get("after") or 0))
+    except ValueError:
+        return jsonify({"ok": False, "error": "after must be an integer"}), 400
+
+    def events(position):
+        seen = live_results.changes.version
+        while True:
+            feed = live_results.read(job_id, position)
+            if feed is None and not _job_queued(job_id):
+                return
+            # A queued job's feed opens when the job starts.
+            items, closed = feed or ([], False)
+            if items:
+                position += len(items)
+                matching = filter_results_by_params(items, subcats, date_start, date_end)
+                if matching:
+                    yield sse_message(matching, event="results", event_id=position)
+            if closed:
+                yield sse_message({"job": job_id, "published": position}, event="done", event_id=position)
+                return
+            version = live_results.changes.wait(seen, PROGRESS_HEARTBEAT_SECONDS)
+            if version == seen:
+                yield ": heartbeat\n\n"
+            seen = version
+
+    return Response(events(position), mimetype="text/event-stream", headers=SSE_HEADERS)
+
+
+@app.route("/jobs", methods=["GET"])
+@require_auth
+def jobs():
+    return jsonify(job_queue.list())
+
+
+@app.route("/jobs/<job_id>", methods=["GET"])
+@require_auth
+def job_detail(job_id):
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({"ok": False, "error": "Job not found"}), 404
+    if job["status"] == "running" and get_job_state().get("job_id") == job_id:
+        job["progress"] = get_progress()
+    return jsonify(job)
+
+
+@app.route("/jobs/<job_id>/cancel", methods=["POST"])
+@require_auth
+def cancel_job(job_id):
+    """Cancel a queued or running job, for every request attached to it."""
+    previous = job_queue.cancel(job_id)
+    if previous is None:
+        return jsonify({"ok": False, "error": "Job not found"}), 404
+    if previous not in ("queued", "running"):
+        return jsonify({"ok": False, "error": f"Job already {previous}", "job": job_queue.get(job_id)}), 409
+    if previous == "running":
+        _cancel_running_job(job_id)
+    return jsonify({"ok": True, "job": job_queue.get(job_id)})
+
+
+@app.route("/runs", methods=["GET"])
+@require_auth
+def runs():
+    try:
+        limit = max(1, min(int(request.args.get("limit", 50)), 500))
+    except ValueError:
+        return jsonify({"ok": False, "error": "limit must be an integer"}), 400
+    return jsonify(telemetry.list_runs(limit))
+
+
+@app.route("/runs/<int:run_id>", methods=["GET"])
+@require_auth
+def run_detail(run_id):
+    run = telemetry.get_run(run_id)
+    if run is None:
+        return jsonify({"ok": False, "error": "Run not found"}), 404
+    return jsonify(run)
+
+
+@app.route("/profiles", methods=["GET"])
+@require_auth
+def list_profiles():
+    """Profile report files per run, newest first."""
+    if not os.path.isdir(PROFILES_DIR):
+        return jsonify([])
+    runs = []
+    for name in os.listdir(PROFILES_DIR):
+        path = os.path.join(PROFILES_DIR, name)
+        if os.path.isdir(path):
+            runs.append({"run_id": name, "modified": os.path.getmtime(path), "files": sorted(os.listdir(path))})
+    runs.sort(key=lambda run: run["modified"], reverse=True)
+    return jsonify(runs)
+
+
+@app.route("/profiles/<run_id>/<path:filename>", methods=["GET"])
+@require_auth
+def download_profile(run_id, filename):
+    if not re.fullmatch(r"[\w-]+", run_id):
+        return jsonify({"ok": False, "error": "Invalid run id"}), 400
+    return send_from_directory(os.path.abspath(os.path.join(PROFILES_DIR, run_id)), filename, as_attachment=True)
+
+
+@app.route("/liveness", methods=["GET", "POST"])
+@require_auth
+def liveness():
+    """POST starts a background re-check of stored results; GET reports its status."""
+    if request.method == "POST":
+        started = liveness_checker.start()
+        return jsonify({"ok": True, "started": started, "status": dict(liveness_checker.status)})
+    return jsonify(dict(liveness_checker.status))
+
 
 @app.route("/feedback", methods=["POST"])
 def feedback():
@@ -717,27 +1424,42 @@ def feedback():
     append_keywords(word)
     return "Keyword added", 200
 
-log = logging.getLogger("werkzeug")
-
 def _progress_payload():
-    with progress_lock:
-        progress_snapshot = dict(progress_state)
-    payload = dict(progress_snapshot)
-    payload["job"] = get_job_state()
+    payload = get_progress()
+    job = get_job_state()
+    # Renewed every few seconds by the job's worker; not worth a push.
+    job.pop("owner_seen", None)
+    payload["job"] = job
     return payload
 
 
 @app.route("/progress", methods=["GET"])
 @require_auth
 def progress():
-    if log.level <= logging.INFO:
-        log.setLevel(logging.WARNING)
-        resp = jsonify(_progress_payload())
-        log.setLevel(logging.INFO)
-        return resp
     return jsonify(_progress_payload())
 
 
+@app.route("/progress/stream", methods=["GET"])
+@require_auth
+def progress_stream():
+    """Server-Sent Events: the ``/progress`` payload whenever it changes, plus heartbeats."""
+
+    def events():
+        seen, last = None, None
+        while True:
+            seen = state_changes.wait(seen, PROGRESS_HEARTBEAT_SECONDS)
+            payload = json.dumps(_progress_payload())
+            if payload == last:
+                yield ": heartbeat\n\n"
+                continue
+            last = payload
+            yield sse_message(payload, event="progress", event_id=seen)
+            # Coalesce bursts of per-item progress posts into a few pushes a second.
+            time.sleep(PROGRESS_STREAM_INTERVAL)
+
+    return Response(events(), mimetype="text/event-stream", headers=SSE_HEADERS)
+
+
 @app.route("/job_status", methods=["GET"])
 @require_auth
 def job_status():
@@ -749,6 +1471,14 @@ def serve_app():
     return send_from_directory(".", "index.html")
 
 
+if WARM_START:
+    threading.Thread(target=_warm_start, name="warm-start", daemon=True).start()
+# Wake this worker's streams when another worker changes the shared state.
+state_store.watch([state_changes, live_results.changes], STATE_POLL_INTERVAL)
+# Queued jobs survive restarts; start the next one unless a worker runs a job.
+_dispatch_jobs()
+
+
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", "5000"))
     app.run(host="0.0.0.0", port=port, threaded=True, debug=False, use_reloader=False)
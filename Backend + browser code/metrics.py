@@ -0,0 +1,270 @@
+"""Prometheus-style counters, gauges and histograms served at ``/metrics``.
+
+Counters and histograms keep one shard per thread (per greenlet under the
+gevent worker), so recording a sample is a plain dict update with no lock;
+shards are only merged when ``/metrics`` is rendered, or when many have been
+opened since the last merge. Pipeline stages run in subprocesses, so they send a
+:meth:`Registry.snapshot` with their final ``report_stats`` call and the
+backend folds it in with :meth:`Registry.merge`.
+"""
+
+import bisect
+import threading
+
+try:
+    from greenlet import getcurrent as _current_greenlet
+except ImportError:  # plain threads only
+    _current_greenlet = None
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+STAGE_BUCKETS = (1, 5, 15, 30, 60, 120, 300, 600, 1200, 1800, 3600)
+# Shards of finished threads and greenlets are folded once this many are open,
+# so a gevent worker that is rarely scraped does not keep one per request.
+SHARD_FOLD_AT = 256
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_text(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in (*zip(names, values), *extra)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _owner():
+    """The greenlet or thread recording a sample; each has its own shard."""
+    if _current_greenlet is not None:
+        greenlet = _current_greenlet()
+        if greenlet.parent is not None:  # spawned, e.g. a gevent request handler
+            return greenlet
+    return threading.current_thread()
+
+
+def _finished(owner):
+    return not owner.is_alive() if isinstance(owner, threading.Thread) else owner.dead
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _ShardedMetric:
+    """Per-thread/greenlet ``{label values: value}`` shards merged on read."""
+
+    kind = ""
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()  # taken once per owner and on collect, never per sample
+        self._shards = {}  # owner -> shard
+        self._fold_at = SHARD_FOLD_AT
+        self._retired = {}  # folded shards of finished owners and merged snapshots
+
+    def _shard(self):
+        owner = _owner()
+        shard = self._shards.get(owner)
+        if shard is None:
+            with self._lock:
+                shard = self._shards[owner] = {}
+                if len(self._shards) >= self._fold_at:
+                    self._fold_finished()
+                    # Still this many live owners: wait for as many again.
+                    self._fold_at = max(SHARD_FOLD_AT, 2 * len(self._shards))
+        return shard
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def _fold_finished(self):
+        """Move shards of finished owners into ``_retired``; the caller holds ``_lock``."""
+        for owner in [owner for owner in self._shards if _finished(owner)]:
+            # The owner is gone, so nothing writes to its shard any more.
+            self._fold(self._retired, self._shards.pop(owner))
+
+    def _collect(self):
+        with self._lock:
+            self._fold_finished()
+            totals = {}
+            self._fold(totals, self._retired)
+            for shard in list(self._shards.values()):
+                self._fold(totals, dict(shard))
+            return totals
+
+    def snapshot(self):
+        return [[list(key), value] for key, value in self._collect().items()]
+
+    def merge(self, samples):
+        with self._lock:
+            self._fold(self._retired, {tuple(key): value for key, value in samples})
+
+
+class Counter(_ShardedMetric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        shard = self._shard()
+        key = self._key(labels)
+        shard[key] = shard.get(key, 0) + amount
+
+    @staticmethod
+    def _fold(target, source):
+        for key, value in source.items():
+            target[key] = target.get(key, 0) + value
+
+    def render(self):
+        return [
+            f"{self.name}{_label_text(self.labelnames, key)} {_format_value(value)}"
+            for key, value in sorted(self._collect().items())
+        ]
+
+
+class Histogram(_ShardedMetric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        shard = self._shard()
+        key = self._key(labels)
+        row = shard.get(key)
+        if row is None:
+            # One count per bucket plus +Inf, then sum and count.
+            row = shard[key] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+        row[bisect.bisect_left(self.buckets, value)] += 1
+        row[-2] += value
+        row[-1] += 1
+
+    @staticmethod
+    def _fold(target, source):
+        for key, row in source.items():
+            current = target.get(key)
+            if current is None:
+                target[key] = list(row)
+            else:
+                for i, value in enumerate(row):
+                    current[i] += value
+
+    def render(self):
+        lines = []
+        bounds = [*self.buckets, float("inf")]
+        for key, row in sorted(self._collect().items()):
+            cumulative = 0
+            for bound, count in zip(bounds, row):
+                cumulative += count
+                le = (("le", _format_value(bound) if bound == float("inf") else f"{bound:g}"),)
+                lines.append(f"{self.name}_bucket{_label_text(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_label_text(self.labelnames, key)} {_format_value(row[-2])}")
+            lines.append(f"{self.name}_count{_label_text(self.labelnames, key)} {row[-1]}")
+        return lines
+
+
+class Gauge:
+    """Last value wins; a single dict assignment, so no lock is needed."""
+
+    kind = "gauge"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+
+    def set(self, value, **labels):
+        self._values[tuple(str(labels.get(name, "")) for name in self.labelnames)] = value
+
+    def snapshot(self):
+        return [[list(key), value] for key, value in list(self._values.items())]
+
+    def merge(self, samples):
+        for key, value in samples:
+            self._values[tuple(key)] = value
+
+    def render(self):
+        return [
+            f"{self.name}{_label_text(self.labelnames, key)} {_format_value(value)}"
+            for key, value in sorted(list(self._values.items()))
+        ]
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+
+    def register(self, metric):
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def snapshot(self):
+        """JSON-friendly dump of every metric, for shipping to another process."""
+        return {name: metric.snapshot() for name, metric in self._metrics.items()}
+
+    def merge(self, snapshot):
+        for name, samples in (snapshot or {}).items():
+            metric = self._metrics.get(name)
+            if metric is not None:
+                metric.merge(samples)
+
+    def render(self):
+        """Prometheus text exposition format 0.0.4."""
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+HTTP_REQUEST_SECONDS = REGISTRY.histogram(
+    "inferno_http_request_duration_seconds",
+    "Flask request latency by route, method and status.",
+    ("route", "method", "status"),
+)
+STAGE_SECONDS = REGISTRY.histogram(
+    "inferno_stage_duration_seconds",
+    "Wall time of pipeline stages by outcome (ok, failed, cached).",
+    ("stage", "outcome"),
+    buckets=STAGE_BUCKETS,
+)
+OUTBOUND_SECONDS = REGISTRY.histogram(
+    "inferno_outbound_request_duration_seconds",
+    "Scraper HTTP latency to response headers by proxy and status.",
+    ("stage", "proxy", "status"),
+)
+OPENAI_SECONDS = REGISTRY.histogram(
+    "inferno_openai_request_duration_seconds",
+    "OpenAI chat completion latency by model and outcome.",
+    ("model", "outcome"),
+    buckets=(0.5, 1, 2, 5, 10, 20, 30, 60, 120),
+)
+OPENAI_TOKENS = REGISTRY.counter(
+    "inferno_openai_tokens_total",
+    "OpenAI tokens used by model and kind (prompt, completion).",
+    ("model", "kind"),
+)
+GITHUB_SECONDS = REGISTRY.histogram(
+    "inferno_github_request_duration_seconds",
+    "GitHub storage API latency by method and status.",
+    ("method", "status"),
+)
+GITHUB_RATELIMIT_REMAINING = REGISTRY.gauge(
+    "inferno_github_ratelimit_remaining",
+    "X-RateLimit-Remaining from the last GitHub API response.",
+)
@@ -0,0 +1,283 @@
+"""Readers and filters for the pipeline's ``Result #`` text blocks.
+
+Stage 4 and stage 5 read ``scraped_results.txt`` / the phase 2 file with
+these helpers, and ``main.py`` parses ``phase3_results.txt`` and filters it for
+API responses. They live here rather than in the stage scripts, which run on
+import, so ``benchmarks/microbench.py`` can time them in isolation.
+"""
+
+import logging
+import re
+from datetime import date, datetime
+
+
+def read_ad_blocks(filename):
+    """One dict of fields per ``Result #`` block of ``scraped_results.txt`` (stage 4)."""
+    blocks = []
+    current = {}
+    with open(filename, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.rstrip("\n")
+            if line.startswith("Result #"):
+                if current:
+                    blocks.append(current)
+                current = {}
+                current["index"] = line.split("#", 1)[1].strip()
+            elif line.startswith("URL:"):
+                current["url"] = line[len("URL:"):].strip()
+            elif line.startswith("Name:"):
+                current["name"] = line[len("Name:"):].strip()
+            elif line.startswith("Description:"):
+                current["description"] = line[len("Description:"):].strip()
+            elif line.startswith("Main Category:"):
+                current["main_category"] = line[len("Main Category:"):].strip()
+            elif line.startswith("Sub Category:"):
+                current["sub_category"] = line[len("Sub Category:"):].strip()
+            elif line.startswith("ZIP:"):
+                current["zip_code"] = line[len("ZIP:"):].strip()
+            elif line.startswith("City:"):
+                current["city"] = line[len("City:"):].strip()
+        if current:
+            blocks.append(current)
+    return blocks
+
+
+def normalize(text):
+    text = text.lower()
+    text = re.sub(r"s\s*\.\s*r\s*\.\s*o\s*\.*", "s.r.o", text)
+    return text
+
+
+def tokenize(text):
+    normalized = normalize(text)
+    tokens = re.findall(r"\b[\w.]+\b", normalized)
+    return [t.rstrip(".,;:!?") for t in tokens]
+
+
+def read_raw_blocks(filename):
+    """Blocks as lists of lines, split on the ``====`` separators (stage 5)."""
+    blocks = []
+    current = []
+    with open(filename, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.startswith("=") and current:
+                blocks.append(current)
+                current = []
+            else:
+                current.append(line.rstrip())
+        if current:
+            blocks.append(current)
+    return blocks
+
+
+def after_label(s: str, *labels: str):
+    s = s.strip()
+    for label in labels:
+        if s.startswith(label):
+            return s[len(label):].strip()
+    return None
+
+
+def parse_result_blocks_text(text):
+    results = []
+    block = {}
+    for raw in text.splitlines():
+        line = raw.strip()
+        line_lower = line.lower()
+
+        if line.startswith("URL:"):
+            # safer than split()[1]
+            _, _, val = line.partition("URL:")
+            block["url"] = val.strip()
+
+        elif line.startswith("Sub Category:") or line.startswith("Subcategory:") \
+             or line.startswith("Subkategória:") or line.startswith("Subkategorie:"):
+            val = after_label(
+                line,
+                "Sub Category: ",
+                "Subcategory: ",
+                "Subkategória: ",
+                "Subkategorie: "
+            )
+            if val is not None:
+                block["subcat"] = val
+
+        elif line_lower.startswith("city:") or line_lower.startswith("mesto:"):
+            val = after_label(
+                line,
+                "City: ",
+                "City:",
+                "city: ",
+                "city:",
+                "CITY: ",
+                "CITY:",
+                "Mesto: ",
+                "Mesto:",
+                "mesto: ",
+                "mesto:",
+                "MESTO: ",
+                "MESTO:",
+            )
+            if val is not None:
+                cleaned = val.strip()
+                block["city"] = "" if cleaned.upper() == "N/A" else cleaned
+
+        elif line_lower.startswith("zip:") or line_lower.startswith("psč:") or line_lower.startswith("psc:"):
+            val = after_label(
+                line,
+                "ZIP: ",
+                "ZIP:",
+                "zip: ",
+                "zip:",
+                "PSČ: ",
+                "PSČ:",
+                "psč: ",
+                "psč:",
+                "psc: ",
+                "psc:",
+                "PSC: ",
+                "PSC:",
+            )
+            if val is not None:
+                cleaned = val.strip()
+                block["zip_code"] = "" if cleaned.upper() == "N/A" else cleaned
+
+        elif line.startswith("Timestamp:"):
+            _, _, ts = line.partition("Timestamp:")
+            block["date"] = parse_datetime(ts.strip())
+
+        elif line.startswith("Name:"):
+            block["name"] = line[len("Name:"):].strip()
+
+        elif line.startswith("Description:"):
+            block["description"] = line[len("Description:"):].strip()
+
+        elif line.startswith("==="):
+            if block.get("url"):              # only keep meaningful blocks
+                results.append(block)
+            block = {}
+
+    # flush trailing block if file doesn’t end with "==="
+    if block.get("url"):
+        results.append(block)
+
+    logging.debug("Parsed %d result blocks", len(results))
+    return results
+
+
+def parse_datetime(s: str):
+    for fmt in ("%d/%m/%Y %H:%M", "%Y-%m-%d %H:%M"):
+        try:
+            return datetime.strptime(s, fmt)
+        except ValueError:
+            continue
+    return None
+
+def parse_date(s: str):
+    for fmt in ("%d/%m/%Y", "%Y-%m-%d"):
+        try:
+            return datetime.strptime(s, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+def normalize_result_datetime(value):
+    if not value:
+        return None
+
+    if isinstance(value, datetime):
+        return value
+
+    if isinstance(value, date):
+        return datetime.combine(value, datetime.min.time())
+
+    if isinstance(value, str):
+        parsed_dt = parse_datetime(value)
+        if parsed_dt:
+            return parsed_dt
+
+        parsed_date = parse_date(value)
+        if parsed_date:
+            return datetime.combine(parsed_date, datetime.min.time())
+
+    return None
+
+
+def format_result_date(value):
+    if not value:
+        return ""
+
+    normalized = normalize_result_datetime(value)
+    if not normalized:
+        return value if isinstance(value, str) else ""
+
+    has_time = False
+    if isinstance(value, datetime):
+        has_time = True
+    elif isinstance(value, str) and parse_datetime(value):
+        has_time = True
+    elif normalized.hour or normalized.minute or normalized.second or normalized.microsecond:
+        has_time = True
+
+    return normalized.strftime("%d/%m/%Y %H:%M") if has_time else normalized.strftime("%d/%m/%Y")
+
+
+def parse_date_range(start_date, end_date):
+    """``(first, last)`` dates of a filter range; either may be ``None``."""
+
+    # Accept either separate `start_date`/`end_date` or a single combined
+    # range string (e.g. "11/11/2025 - 13/11/2025"). If a combined range
+    # was passed in either parameter, split it into start/end parts so the
+    # subsequent parsing works as expected.
+    if isinstance(start_date, str) and re.search(r'[\-–—]', start_date):
+        parts = re.split(r"\s*[–—-]\s*", start_date)
+        if len(parts) >= 2:
+            start_date = parts[0].strip()
+            end_date = parts[1].strip()
+
+    if isinstance(end_date, str) and re.search(r'[\-–—]', end_date):
+        parts = re.split(r"\s*[–—-]\s*", end_date)
+        if len(parts) >= 2:
+            # If end_date contained a combined range, prefer its parsed
+            # values (but do not overwrite a previously split start_date
+            # unless it's empty).
+            if not start_date:
+                start_date = parts[0].strip()
+            end_date = parts[1].strip()
+
+    d1 = parse_date(start_date) if start_date else None
+    d2 = parse_date(end_date)   if end_date   else None
+    return d1, d2
+
+
+def response_record(res):
+    """The fields of a parsed result block that API responses carry."""
+    return {
+        "url": res.get("url"),
+        "subcat": res.get("subcat", ""),
+        "date": format_result_date(res.get("date")),
+        "city": res.get("city", ""),
+        "zip_code": res.get("zip_code", ""),
+    }
+
+
+def filter_results_by_params(results, subcats, start_date, end_date):
+    filtered = []
+    d1, d2 = parse_date_range(start_date, end_date)
+
+    for res in results:
+        if subcats and res.get("subcat", "").strip() not in subcats:
+            continue
+
+        ad_dt = normalize_result_datetime(res.get("date"))
+        ad_date = ad_dt.date() if ad_dt else None
+
+        if d1 and ad_date and ad_date < d1:
+            continue
+        if d2 and ad_date and ad_date > d2:
+            continue
+
+        filtered.append(response_record(res))
+
+    return filtered
@@ -0,0 +1,441 @@
+"""Stored scrape results in a local SQLite database.
+
+``phase3_filtered_links.txt`` on GitHub stays the source of truth; this is a
+queryable copy of it. ``results`` holds every stored ad in file order with
+indexes on ``(subcat, day)``, ``city`` and ``zip_code`` and an FTS5 index on
+the name and description for keyword search. ``latest_results`` holds the
+output of the newest run for ``mode=latest``.
+
+:func:`sync` imports only the appended tail when the file grew since the last
+import and rebuilds the table when it was rewritten (liveness evictions).
+Every added or changed row gets the next value of a monotonic revision
+counter and removed URLs get a ``tombstones`` row, which is what ``/results``
+pages through with its cursor (:func:`changes_since`).
+
+    python results_db.py import                          # from storage
+    python results_db.py import Data/phase3_filtered_links.txt
+"""
+
+import argparse
+import hashlib
+import os
+import sqlite3
+import threading
+
+from result_blocks import normalize_result_datetime, parse_result_blocks_text, response_record
+
+DATA_DIR = "Data"
+RESULTS_DB = os.getenv("RESULTS_DB", os.path.join(DATA_DIR, "results.sqlite"))
+
+_COLUMNS = """
+    id INTEGER PRIMARY KEY,
+    url TEXT NOT NULL,
+    subcat TEXT NOT NULL DEFAULT '',
+    day TEXT,
+    date TEXT NOT NULL DEFAULT '',
+    city TEXT NOT NULL DEFAULT '',
+    zip_code TEXT NOT NULL DEFAULT '',
+    name TEXT NOT NULL DEFAULT '',
+    description TEXT NOT NULL DEFAULT '',
+    rev INTEGER
+"""
+
+_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS results ({_COLUMNS});
+CREATE TABLE IF NOT EXISTS latest_results ({_COLUMNS});
+CREATE INDEX IF NOT EXISTS results_subcat_day ON results(subcat, day);
+CREATE INDEX IF NOT EXISTS results_day ON results(day);
+CREATE INDEX IF NOT EXISTS results_city ON results(city);
+CREATE INDEX IF NOT EXISTS results_zip ON results(zip_code);
+CREATE TABLE IF NOT EXISTS tombstones (url TEXT PRIMARY KEY, rev INTEGER NOT NULL);
+CREATE INDEX IF NOT EXISTS tombstones_rev ON tombstones(rev);
+CREATE VIRTUAL TABLE IF NOT EXISTS results_fts USING fts5(
+    name, description, content='results', content_rowid='id'
+);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+_INSERT_COLUMNS = "url, subcat, day, date, city, zip_code, name, description"
+
+_lock = threading.Lock()
+_initialised = False
+
+
+def _connect():
+    global _initialised
+    if not _initialised:
+        os.makedirs(os.path.dirname(RESULTS_DB) or ".", exist_ok=True)
+    conn = sqlite3.connect(RESULTS_DB, timeout=10)
+    conn.row_factory = sqlite3.Row
+    if not _initialised:
+        # WAL lets request threads read while a sync is writing.
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(_SCHEMA)
+        _migrate(conn)
+        _initialised = True
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+def _begin_write(conn):
+    """Start a write transaction holding the database write lock.
+
+    ``_lock`` only serialises the threads of one worker; IMMEDIATE keeps
+    another worker from reading the same ``meta`` before either commits, which
+    would make both import the same appended tail.
+    """
+    conn.execute("BEGIN IMMEDIATE")
+
+
+def _migrate(conn):
+    # Databases created before revisions existed: number the rows in file order.
+    for table in ("results", "latest_results"):
+        columns = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+        if "rev" not in columns:
+            with conn:
+                conn.execute(f"ALTER TABLE {table} ADD COLUMN rev INTEGER")
+                conn.execute(f"UPDATE {table} SET rev = id")
+    conn.execute("CREATE INDEX IF NOT EXISTS results_rev ON results(rev)")
+    with conn:
+        if _meta(conn, "rev") is None:
+            top = conn.execute("SELECT COALESCE(MAX(rev), 0) FROM results").fetchone()[0]
+            _set_meta(conn, rev=top)
+
+
+def _rows(text):
+    for res in parse_result_blocks_text(text or ""):
+        record = response_record(res)
+        dt = normalize_result_datetime(res.get("date"))
+        yield (
+            record["url"],
+            record["subcat"].strip(),
+            dt.date().isoformat() if dt else None,
+            record["date"],
+            record["city"],
+            record["zip_code"],
+            res.get("name", ""),
+            res.get("description", ""),
+        )
+
+
+def _insert(conn, table, text):
+    first = conn.execute(f"SELECT COALESCE(MAX(id), 0) + 1 FROM {table}").fetchone()[0]
+    placeholders = ", ".join("?" * 8)
+    conn.executemany(f"INSERT INTO {table} ({_INSERT_COLUMNS}) VALUES ({placeholders})", _rows(text))
+    if table == "results":
+        conn.execute(
+            "INSERT INTO results_fts (rowid, name, description) SELECT id, name, description FROM results WHERE id >= ?",
+            (first,),
+        )
+    return conn.execute(f"SELECT COUNT(*) FROM {table} WHERE id >= ?", (first,)).fetchone()[0]
+
+
+def _meta(conn, key):
+    row = conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+    return row[0] if row else None
+
+
+def _set_meta(conn, **values):
+    conn.executemany("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", [(k, str(v)) for k, v in values.items()])
+
+
+def _assign_revs(conn, first, previous=None):
+    """Give rows inserted from id ``first`` on a revision; unchanged rows keep theirs.
+
+    ``previous`` maps a URL to its old ``(rev, *fields)`` rows in file order;
+    the same ad appended by several runs is matched occurrence by occurrence,
+    so every row keeps a revision of its own.
+    """
+    rev = int(_meta(conn, "rev") or 0)
+    pending = {url: list(rows) for url, rows in (previous or {}).items()}
+    used = set()
+    updates = []
+    for row in conn.execute(
+        "SELECT id, url, subcat, date, city, zip_code, name, description FROM results WHERE id >= ? ORDER BY id",
+        (first,),
+    ):
+        olds = pending.get(row["url"])
+        old = olds.pop(0) if olds else None
+        if old is not None and old[1:] == tuple(row)[2:] and old[0] not in used:
+            used.add(old[0])
+            updates.append((old[0], row["id"]))
+        else:
+            rev += 1
+            updates.append((rev, row["id"]))
+    conn.executemany("UPDATE results SET rev = ? WHERE id = ?", updates)
+    _set_meta(conn, rev=rev)
+
+
+def _tombstone(conn, urls):
+    rev = int(_meta(conn, "rev") or 0)
+    rows = []
+    for url in sorted(urls):
+        rev += 1
+        rows.append((url, rev))
+    conn.executemany("INSERT OR REPLACE INTO tombstones (url, rev) VALUES (?, ?)", rows)
+    _set_meta(conn, rev=rev)
+
+
+def sync(text, etag=None):
+    """Bring ``results`` in line with the stored file ``text``; returns rows added.
+
+    ``etag`` is the storage validator of ``text``; it is kept so the first
+    revalidation after a restart can be a conditional request.
+    """
+    data = (text or "").encode("utf-8")
+    with _lock:
+        conn = _connect()
+        try:
+            with conn:
+                _begin_write(conn)
+                imported = int(_meta(conn, "source_bytes") or 0)
+                prefix_hash = _meta(conn, "source_sha256")
+                appended = (
+                    prefix_hash is not None
+                    and len(data) >= imported
+                    and hashlib.sha256(data[:imported]).hexdigest() == prefix_hash
+                )
+                first = conn.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM results").fetchone()[0]
+                if appended:
+                    tail = data[imported:]
+                    added = _insert(conn, "results", tail.decode("utf-8")) if tail.strip() else 0
+                    _assign_revs(conn, first)
+                else:
+                    previous = {}
+                    for row in conn.execute(
+                        "SELECT url, rev, subcat, date, city, zip_code, name, description FROM results ORDER BY id"
+                    ):
+                        previous.setdefault(row[0], []).append(tuple(row[1:]))
+                    conn.execute("INSERT INTO results_fts (results_fts) VALUES ('delete-all')")
+                    conn.execute("DELETE FROM results")
+                    added = _insert(conn, "results", text)
+                    _assign_revs(conn, 1, previous)
+                    current = {row[0] for row in conn.execute("SELECT url FROM results")}
+                    _tombstone(conn, previous.keys() - current)
+                _set_meta(
+                    conn,
+                    source_bytes=len(data),
+                    source_sha256=hashlib.sha256(data).hexdigest(),
+                    source_etag=etag or "",
+                )
+            return added
+        finally:
+            conn.close()
+
+
+def add_tombstones(urls):
+    """Record stored results that are gone (e.g. found dead) for delta sync."""
+    urls = sorted(urls)
+    fresh = []
+    with _lock:
+        conn = _connect()
+        try:
+            with conn:
+                _begin_write(conn)
+                # Stay under SQLite's bound-parameter limit.
+                for start in range(0, len(urls), 500):
+                    chunk = urls[start:start + 500]
+                    fresh.extend(
+                        row[0]
+                        for row in conn.execute(
+                            f"SELECT DISTINCT url FROM results WHERE url IN ({', '.join('?' * len(chunk))}) "
+                            "AND NOT EXISTS (SELECT 1 FROM tombstones t WHERE t.url = results.url AND t.rev > results.rev)",
+                            chunk,
+                        )
+                    )
+                _tombstone(conn, fresh)
+            return len(fresh)
+        finally:
+            conn.close()
+
+
+def replace_latest(text):
+    """Store the newest run's results for ``mode=latest``."""
+    with _lock:
+        conn = _connect()
+        try:
+            with conn:
+                _begin_write(conn)
+                conn.execute("DELETE FROM latest_results")
+                added = _insert(conn, "latest_results", text)
+                _set_meta(conn, latest_loaded=int(_meta(conn, "latest_loaded") or 0) + 1)
+            return added
+        finally:
+            conn.close()
+
+
+def has_latest():
+    """Whether :func:`replace_latest` ever ran against this database."""
+    conn = _connect()
+    try:
+        return _meta(conn, "latest_loaded") is not None
+    finally:
+        conn.close()
+
+
+def source_etag():
+    """``(imported, etag)``: whether :func:`sync` ever ran, and its storage ETag."""
+    conn = _connect()
+    try:
+        return _meta(conn, "source_sha256") is not None, _meta(conn, "source_etag") or None
+    finally:
+        conn.close()
+
+
+def warm():
+    """Read the database files once so the OS keeps them cached; returns the result count."""
+    for path in (RESULTS_DB, RESULTS_DB + "-wal"):
+        try:
+            with open(path, "rb") as f:
+                while f.read(1 << 20):
+                    pass
+        except FileNotFoundError:
+            pass
+    conn = _connect()
+    try:
+        return conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def version(latest=False):
+    """Changes whenever what :func:`query` returns may change (used for ETags)."""
+    conn = _connect()
+    try:
+        return int(_meta(conn, "latest_loaded" if latest else "rev") or 0)
+    finally:
+        conn.close()
+
+
+def _filter_sql(subcats, first, last, city=None, zip_code=None):
+    where, args = [], []
+    if subcats:
+        where.append(f"subcat IN ({', '.join('?' * len(subcats))})")
+        args.extend(sorted(subcats))
+    if first:
+        where.append("(day IS NULL OR day >= ?)")
+        args.append(first.isoformat())
+    if last:
+        where.append("(day IS NULL OR day <= ?)")
+        args.append(last.isoformat())
+    if city:
+        where.append("city = ?")
+        args.append(city)
+    if zip_code:
+        where.append("zip_code = ?")
+        args.append(zip_code)
+    return where, args
+
+
+def query(subcats=None, first=None, last=None, city=None, zip_code=None, search=None, latest=False):
+    """Response records in file order, filtered like ``filter_results_by_params``.
+
+    ``first``/``last`` are dates; ads without a date always match a range.
+    ``search`` holds keywords matched against name and description (stored
+    results only).
+    """
+    table = "latest_results" if latest else "results"
+    where, args = _filter_sql(subcats, first, last, city, zip_code)
+    if search and not latest:
+        # Every word must occur; quoting keeps FTS5 operators in user input literal.
+        terms = " ".join('"' + word.replace('"', '""') + '"' for word in search.split())
+        where.append("id IN (SELECT rowid FROM results_fts WHERE results_fts MATCH ?)")
+        args.append(terms)
+    sql = f"SELECT url, subcat, date, city, zip_code FROM {table}"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " ORDER BY id"
+    conn = _connect()
+    try:
+        return [dict(row) for row in conn.execute(sql, args)]
+    finally:
+        conn.close()
+
+
+def records():
+    """``(version, rows)``: every stored result as ``(day, record)`` in file order.
+
+    Both are read in one transaction, so ``version`` is exactly the version of
+    ``rows``; ``day`` is the ISO date or ``None``.
+    """
+    conn = _connect()
+    try:
+        conn.execute("BEGIN")
+        head = int(_meta(conn, "rev") or 0)
+        rows = [
+            (row["day"], {key: row[key] for key in ("url", "subcat", "date", "city", "zip_code")})
+            for row in conn.execute("SELECT day, url, subcat, date, city, zip_code FROM results ORDER BY id")
+        ]
+        conn.execute("COMMIT")
+        return head, rows
+    finally:
+        conn.close()
+
+
+def changes_since(rev, limit, subcats=None, first=None, last=None, city=None, zip_code=None):
+    """Up to ``limit`` changes after revision ``rev`` in revision order.
+
+    Returns ``(changes, next_rev, has_more)``. Changes are ``{"op": "upsert",
+    "rev": ..., **record}`` for rows matching the filters and ``{"op":
+    "delete", "rev": ..., "url": ...}`` for tombstones (not filtered) and rows
+    that changed so they no longer match.
+    A first sync (``rev == 0``) gets no tombstones and no rows that were
+    deleted since they were added.
+    """
+    filters, filter_args = _filter_sql(subcats, first, last, city, zip_code)
+    live = "NOT EXISTS (SELECT 1 FROM tombstones t WHERE t.url = results.url AND t.rev > results.rev)"
+    conn = _connect()
+    try:
+        # Pin the head first so a concurrent sync cannot slip rows under the cursor.
+        head = int(_meta(conn, "rev") or 0)
+        where = ["rev > ?", "rev <= ?", *filters, live]
+        sql = "SELECT rev, 'upsert' AS op, url, subcat, date, city, zip_code FROM results WHERE " + " AND ".join(where)
+        args = [rev, head, *filter_args]
+        if rev:
+            sql += " UNION ALL SELECT rev, 'delete', url, NULL, NULL, NULL, NULL FROM tombstones WHERE rev > ? AND rev <= ?"
+            args.extend((rev, head))
+            if filters:
+                # A row that changed so it no longer matches leaves the client's copy.
+                sql += (
+                    " UNION ALL SELECT rev, 'delete', url, NULL, NULL, NULL, NULL FROM results"
+                    f" WHERE rev > ? AND rev <= ? AND {live} AND NOT ({' AND '.join(filters)})"
+                )
+                args.extend((rev, head, *filter_args))
+        sql += " ORDER BY rev LIMIT ?"
+        args.append(limit + 1)
+        rows = conn.execute(sql, args).fetchall()
+    finally:
+        conn.close()
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    changes = []
+    for row in rows:
+        change = {"op": row["op"], "rev": row["rev"], "url": row["url"]}
+        if row["op"] == "upsert":
+            change.update(subcat=row["subcat"], date=row["date"], city=row["city"], zip_code=row["zip_code"])
+        changes.append(change)
+    # A short page means everything up to the head was seen, filtered out or not.
+    next_rev = rows[-1]["rev"] if has_more else max(head, rev)
+    return changes, next_rev, has_more
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import stored results into the results database.")
+    parser.add_argument("command", choices=["import"])
+    parser.add_argument("file", nargs="?", help="Results text file (default: phase3_filtered_links.txt from storage)")
+    args = parser.parse_args()
+
+    if args.file:
+        with open(args.file, encoding="utf-8") as f:
+            text = f.read()
+    else:
+        from storage import load_phase3_results
+
+        text = load_phase3_results() or ""
+    added = sync(text)
+    print(f"📥 Imported {added} results into {RESULTS_DB}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+"""Keeps the results database in step with ``phase3_filtered_links.txt``.
+
+``/scrape`` with ``mode=old`` queries ``results_db`` instead of downloading and
+re-parsing the whole history per request. The stored file is revalidated at
+most every ``RESULTS_INDEX_TTL`` seconds with a conditional request (``ETag``
+on GitHub, mtime in ``LOCAL_MODE``); when it changed, ``results_db.sync``
+imports the appended tail or rebuilds the table if it was rewritten. Writers
+in this process hand their new file content to :meth:`ResultsIndex.ingest`, so
+their changes are visible immediately.
+
+The database survives restarts, so once it holds an import, revalidation runs
+in the background and queries are answered from it straight away; the
+storage ETag is kept in the database, which makes the first check after a
+restart a conditional request too. :meth:`ResultsIndex.warm` does that work
+at process start.
+
+Queries without keywords are answered from an in-memory snapshot of the
+database: records bucketed by subcategory and sorted by date inside each
+bucket, so a query is a bisect per requested subcategory plus a copy of the
+matches. The snapshot is rebuilt when the database version moved (an import
+in this worker or another one); keyword queries go to the FTS index.
+"""
+
+import bisect
+import os
+import threading
+import time
+from datetime import date
+
+import results_db
+from result_blocks import parse_date_range
+from storage import load_phase3_results_if_changed
+
+RESULTS_INDEX_TTL = float(os.getenv("RESULTS_INDEX_TTL", "60"))
+
+
+class _Bucket:
+    """Records of one subcategory: dated ones sorted by date, plus undated ones."""
+
+    __slots__ = ("ordinals", "dated", "undated")
+
+    def __init__(self):
+        self.ordinals = []
+        self.dated = []  # (position, response dict), parallel to ordinals
+        self.undated = []
+
+    def select(self, first, last):
+        lo = bisect.bisect_left(self.ordinals, first.toordinal()) if first else 0
+        hi = bisect.bisect_right(self.ordinals, last.toordinal()) if last else len(self.ordinals)
+        # Like filter_results_by_params, a range never excludes undated ads.
+        return self.dated[lo:hi] + self.undated
+
+
+class _Snapshot:
+    def __init__(self, version, rows):
+        self.version = version
+        self.buckets = {}
+        entries = [
+            (date.fromisoformat(day).toordinal() if day else None, position, record)
+            for position, (day, record) in enumerate(rows)
+        ]
+        self.size = len(entries)
+
+        # Sorting by (ordinal, position) keeps file order among same-day ads.
+        for ordinal, position, record in sorted(entries, key=lambda e: (e[0] is None, e[0] or 0, e[1])):
+            bucket = self.buckets.get(record["subcat"])
+            if bucket is None:
+                bucket = self.buckets[record["subcat"]] = _Bucket()
+            if ordinal is None:
+                bucket.undated.append((position, record))
+            else:
+                bucket.ordinals.append(ordinal)
+                bucket.dated.append((position, record))
+
+    def query(self, subcats, first, last, city=None, zip_code=None):
+        keys = [key for key in subcats if key in self.buckets] if subcats else list(self.buckets)
+        matches = []
+        for key in keys:
+            matches.extend(self.buckets[key].select(first, last))
+        if city:
+            matches = [match for match in matches if match[1]["city"] == city]
+        if zip_code:
+            matches = [match for match in matches if match[1]["zip_code"] == zip_code]
+        # Responses keep the order of the stored file.
+        matches.sort(key=lambda match: match[0])
+        return [dict(record) for _, record in matches]
+
+
+class ResultsIndex:
+    def __init__(self, ttl=RESULTS_INDEX_TTL, loader=load_phase3_results_if_changed, on_change=None):
+        self.ttl = ttl
+        self._loader = loader
+        # Called after every import, e.g. to drop cached query responses.
+        self._on_change = on_change
+        self._lock = threading.Lock()
+        self._snapshot_lock = threading.Lock()
+        self._snapshot = None
+        self._etag = None
+        self._checked_at = None
+        self._imported = False
+
+    def ingest(self, text):
+        """Import the stored file's new content after an in-process write."""
+        with self._lock:
+            results_db.sync(text)
+            self._imported = True
+            # The storage ETag changed too; the next revalidation fetches the
+            # file once and finds nothing new to import.
+            self._etag = None
+        if self._on_change:
+            self._on_change()
+
+    def _fresh(self):
+        return self._checked_at is not None and time.monotonic() - self._checked_at < self.ttl
+
+    def refresh(self, background=True):
+        """Revalidate the stored file once the TTL ran out.
+
+        With ``background``, a database that already holds an import keeps
+        being served while the check runs in another thread.
+        """
+        if self._fresh():
+            return
+        if background and self._imported:
+            if not self._lock.locked():
+                threading.Thread(target=self._revalidate, name="results-revalidate", daemon=True).start()
+            return
+        self._revalidate()
+
+    def _revalidate(self):
+        with self._lock:
+            if self._fresh():
+                return
+            if self._checked_at is None:
+                # First check in this process: start from what the database holds.
+                self._imported, self._etag = results_db.source_etag()
+            changed, text, etag = self._loader(self._etag)
+            # A failed fetch keeps serving what was imported last.
+            if changed and text is not None:
+                started = time.perf_counter()
+                added = results_db.sync(text, etag)
+                print(f"📇 Results database synced: {added} new results in {time.perf_counter() - started:.2f}s")
+                self._etag = etag
+                self._imported = True
+                if self._on_change:
+                    self._on_change()
+            self._checked_at = time.monotonic()
+
+    def warm(self):
+        """Load the database into memory and revalidate it; meant for a background thread at start."""
+        started = time.perf_counter()
+        count = results_db.warm()
+        imported, _ = results_db.source_etag()
+        # Queries arriving during the revalidation below use the loaded copy.
+        self._imported = self._imported or imported
+        print(f"🔥 Results database loaded: {count} results in {time.perf_counter() - started:.2f}s")
+        self.refresh(background=False)
+        self._current()
+
+    def _current(self):
+        """The snapshot of the database as it is now, rebuilt if an import moved its version."""
+        version = results_db.version()
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.version == version:
+            return snapshot
+        with self._snapshot_lock:
+            if self._snapshot is None or self._snapshot.version != version:
+                started = time.perf_counter()
+                self._snapshot = _Snapshot(*results_db.records())
+                print(
+                    f"📇 Results index rebuilt: {self._snapshot.size} results "
+                    f"in {time.perf_counter() - started:.2f}s"
+                )
+            return self._snapshot
+
+    def query(self, subcats, start_date, end_date, city=None, zip_code=None, search=None):
+        """Same records as ``filter_results_by_params`` over the stored history."""
+        self.refresh()
+        first, last = parse_date_range(start_date, end_date)
+        if search:
+            return results_db.query(subcats, first, last, city=city, zip_code=zip_code, search=search)
+        return self._current().query(subcats, first, last, city=city, zip_code=zip_code)
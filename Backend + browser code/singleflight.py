@@ -0,0 +1,87 @@
+"""Request coalescing and a small response cache for stored-result queries.
+
+When a run finishes, every open client asks for the same ``mode=old`` query at
+once. :class:`SingleFlight` lets the first request compute the answer while
+identical concurrent requests wait for it, and :class:`TTLCache` keeps the
+last few answers for repeats.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+
+RESULTS_CACHE_SIZE = int(os.getenv("RESULTS_CACHE_SIZE", "16"))
+RESULTS_CACHE_TTL = float(os.getenv("RESULTS_CACHE_TTL", "300"))
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class SingleFlight:
+    """Run ``fn`` once per key at a time; concurrent callers share its result."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value
+        try:
+            call.value = fn()
+            return call.value
+        except BaseException as exc:
+            call.error = exc
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+
+class TTLCache:
+    """Least-recently-used mapping whose entries also expire after ``ttl`` seconds."""
+
+    def __init__(self, maxsize=RESULTS_CACHE_SIZE, ttl=RESULTS_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._items = OrderedDict()
+
+    def get(self, key):
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            stored_at, value = item
+            if time.monotonic() - stored_at > self.ttl:
+                del self._items[key]
+                return None
+            self._items.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._items[key] = (time.monotonic(), value)
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
@@ -0,0 +1,83 @@
+"""Run a pipeline stage script under cProfile and tracemalloc.
+
+``main.py`` wraps stage commands with this module only when profiling is
+requested, so normal runs execute the scripts directly. For each stage it
+writes into the output directory:
+
+- ``<stage>.prof`` – raw cProfile data (``snakeviz``, ``pstats``)
+- ``<stage>.txt`` – top functions by cumulative and by own time
+- ``<stage>-alloc.txt`` – peak traced memory and the top allocation sites
+
+    python stage_profiler.py --out Data/profiles/12 --name stage4 "4 - Filter by description.py"
+
+Only the stage's main process is profiled; stage 3's parser processes are not.
+"""
+
+import argparse
+import cProfile
+import io
+import os
+import pstats
+import runpy
+import sys
+import tracemalloc
+
+PROFILE_TOP_N = int(os.getenv("PROFILE_TOP_N", "40"))
+
+
+def _write_reports(profiler, snapshot, peak, out_dir, name, top):
+    profiler.dump_stats(os.path.join(out_dir, f"{name}.prof"))
+
+    buffer = io.StringIO()
+    stats = pstats.Stats(profiler, stream=buffer)
+    stats.strip_dirs()
+    buffer.write(f"=== {name}: top {top} by cumulative time ===\n")
+    stats.sort_stats("cumulative").print_stats(top)
+    buffer.write(f"\n=== {name}: top {top} by own time ===\n")
+    stats.sort_stats("tottime").print_stats(top)
+    with open(os.path.join(out_dir, f"{name}.txt"), "w", encoding="utf-8") as f:
+        f.write(buffer.getvalue())
+
+    with open(os.path.join(out_dir, f"{name}-alloc.txt"), "w", encoding="utf-8") as f:
+        f.write(f"Peak traced memory: {peak / 1024 / 1024:.1f} MiB\n")
+        f.write(f"Top {top} allocation sites still alive at exit:\n")
+        for stat in snapshot.statistics("lineno")[:top]:
+            f.write(f"{stat.size / 1024:10.1f} KiB {stat.count:8d} blocks  {stat.traceback}\n")
+
+
+def profile_script(script, out_dir, name, top=PROFILE_TOP_N, args=()):
+    """Run ``script`` as ``__main__`` and write its reports; re-raises its exit."""
+
+    os.makedirs(out_dir, exist_ok=True)
+    sys.argv = [script, *args]
+    tracemalloc.start()
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        runpy.run_path(script, run_name="__main__")
+    finally:
+        profiler.disable()
+        # Module code objects from imports would otherwise dominate the list.
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+        ))
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        _write_reports(profiler, snapshot, peak, out_dir, name, top)
+        print(f"📊 Profile of {name} written to {out_dir}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Profile one pipeline stage script.")
+    parser.add_argument("--out", required=True, help="Directory for the reports")
+    parser.add_argument("--name", required=True, help="Stage name used in file names")
+    parser.add_argument("--top", type=int, default=PROFILE_TOP_N)
+    parser.add_argument("script")
+    parser.add_argument("args", nargs=argparse.REMAINDER)
+    opts = parser.parse_args()
+    profile_script(opts.script, opts.out, opts.name, opts.top, opts.args)
+
+
+if __name__ == "__main__":
+    main()
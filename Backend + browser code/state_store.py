@@ -0,0 +1,238 @@
+"""Job, progress and login state shared by all gunicorn workers.
+
+Values are JSON documents under string keys, plus append-only lists (the live
+result feed). Every write increments a global version number; each worker
+polls it (:meth:`watch`) to wake its own streaming clients when another
+worker changed something.
+
+``STATE_BACKEND=sqlite`` (default) keeps everything in ``Data/state.sqlite``
+(``STATE_DB``) in WAL mode, which is enough for several workers on one
+machine. ``STATE_BACKEND=redis`` uses the Redis-compatible server at
+``REDIS_URL`` (needs the ``redis`` package), e.g. to share state between
+replicas.
+"""
+
+import copy
+import json
+import os
+import sqlite3
+import threading
+import time
+
+DATA_DIR = "Data"
+STATE_BACKEND = os.getenv("STATE_BACKEND", "sqlite").strip().lower()
+STATE_DB = os.getenv("STATE_DB", os.path.join(DATA_DIR, "state.sqlite"))
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+REDIS_PREFIX = os.getenv("REDIS_PREFIX", "inferno:")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS kv (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS list_items (
+    key TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    value TEXT NOT NULL,
+    PRIMARY KEY (key, seq)
+);
+CREATE TABLE IF NOT EXISTS version (id INTEGER PRIMARY KEY CHECK (id = 1), n INTEGER NOT NULL);
+INSERT OR IGNORE INTO version (id, n) VALUES (1, 0);
+"""
+
+
+class _Store:
+    def setdefault(self, key, value):
+        """The stored value of ``key``, storing ``value`` first if there is none."""
+        stored = self.get(key)
+        if stored is not None:
+            return stored
+        return self.update(key, lambda current: value if current is None else None) or self.get(key)
+
+    def watch(self, signals, interval):
+        """Bump ``signals`` whenever any worker writes; runs in a daemon thread."""
+
+        def poll():
+            seen = None
+            while True:
+                try:
+                    current = self.version()
+                except Exception as exc:  # keep watching through transient errors
+                    print(f"⚠️ State store poll failed: {exc}")
+                    current = seen
+                if current != seen:
+                    if seen is not None:
+                        for signal in signals:
+                            signal.bump()
+                    seen = current
+                time.sleep(interval)
+
+        thread = threading.Thread(target=poll, name="state-watch", daemon=True)
+        thread.start()
+        return thread
+
+
+class SQLiteStateStore(_Store):
+    def __init__(self, path=STATE_DB):
+        self.path = path
+        self._initialised = False
+
+    def _connect(self):
+        if not self._initialised:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+        if not self._initialised:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+            self._initialised = True
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _write(self, action, changed=lambda result: True):
+        """Run ``action(conn)`` in a write transaction; bumps the version if ``changed(result)``."""
+        conn = self._connect()
+        try:
+            # IMMEDIATE takes the write lock up front, so read-modify-write
+            # cycles of different workers cannot interleave.
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = action(conn)
+                if changed(result):
+                    conn.execute("UPDATE version SET n = n + 1 WHERE id = 1")
+                conn.execute("COMMIT")
+                return result
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        finally:
+            conn.close()
+
+    def get(self, key, default=None):
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT value FROM kv WHERE key = ?", (key,)).fetchone()
+        finally:
+            conn.close()
+        return json.loads(row[0]) if row else copy.deepcopy(default)
+
+    def set(self, key, value):
+        self._write(lambda conn: conn.execute(
+            "INSERT OR REPLACE INTO kv (key, value) VALUES (?, ?)", (key, json.dumps(value))
+        ))
+
+    def update(self, key, fn, default=None):
+        """Atomically replace ``key`` with ``fn(value)``; ``None`` from ``fn`` leaves it as is."""
+
+        def apply(conn):
+            row = conn.execute("SELECT value FROM kv WHERE key = ?", (key,)).fetchone()
+            result = fn(json.loads(row[0]) if row else copy.deepcopy(default))
+            if result is not None:
+                conn.execute("INSERT OR REPLACE INTO kv (key, value) VALUES (?, ?)", (key, json.dumps(result)))
+            return result
+
+        # Like Redis: an update that wrote nothing does not wake the watchers.
+        return self._write(apply, changed=lambda result: result is not None)
+
+    def delete(self, *keys):
+        def apply(conn):
+            for key in keys:
+                conn.execute("DELETE FROM kv WHERE key = ?", (key,))
+                conn.execute("DELETE FROM list_items WHERE key = ?", (key,))
+
+        self._write(apply)
+
+    def push(self, key, items):
+        """Append ``items`` to the list ``key``; returns its new length."""
+
+        def apply(conn):
+            length = conn.execute("SELECT COUNT(*) FROM list_items WHERE key = ?", (key,)).fetchone()[0]
+            conn.executemany(
+                "INSERT INTO list_items (key, seq, value) VALUES (?, ?, ?)",
+                [(key, length + n, json.dumps(item)) for n, item in enumerate(items)],
+            )
+            return length + len(items)
+
+        return self._write(apply)
+
+    def range(self, key, start=0):
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                "SELECT value FROM list_items WHERE key = ? AND seq >= ? ORDER BY seq", (key, start)
+            ).fetchall()
+        finally:
+            conn.close()
+        return [json.loads(row[0]) for row in rows]
+
+    def version(self):
+        conn = self._connect()
+        try:
+            return conn.execute("SELECT n FROM version WHERE id = 1").fetchone()[0]
+        finally:
+            conn.close()
+
+
+class RedisStateStore(_Store):
+    def __init__(self, url=REDIS_URL, prefix=REDIS_PREFIX):
+        import redis  # optional: only needed for STATE_BACKEND=redis
+
+        self._redis = redis.Redis.from_url(url, decode_responses=True)
+        self._watch_error = redis.WatchError
+        self.prefix = prefix
+        self._version_key = prefix + "__version__"
+
+    def get(self, key, default=None):
+        raw = self._redis.get(self.prefix + key)
+        return json.loads(raw) if raw is not None else copy.deepcopy(default)
+
+    def set(self, key, value):
+        pipe = self._redis.pipeline()
+        pipe.set(self.prefix + key, json.dumps(value))
+        pipe.incr(self._version_key)
+        pipe.execute()
+
+    def update(self, key, fn, default=None):
+        """Atomically replace ``key`` with ``fn(value)``; ``None`` from ``fn`` leaves it as is."""
+        name = self.prefix + key
+        while True:
+            with self._redis.pipeline() as pipe:
+                try:
+                    pipe.watch(name)
+                    raw = pipe.get(name)
+                    result = fn(json.loads(raw) if raw is not None else copy.deepcopy(default))
+                    if result is None:
+                        pipe.unwatch()
+                        return None
+                    pipe.multi()
+                    pipe.set(name, json.dumps(result))
+                    pipe.incr(self._version_key)
+                    pipe.execute()
+                    return result
+                except self._watch_error:
+                    continue  # another worker wrote in between; retry with its value
+
+    def delete(self, *keys):
+        pipe = self._redis.pipeline()
+        pipe.delete(*(self.prefix + key for key in keys))
+        pipe.incr(self._version_key)
+        pipe.execute()
+
+    def push(self, key, items):
+        """Append ``items`` to the list ``key``; returns its new length."""
+        if not items:
+            return self._redis.llen(self.prefix + key)
+        pipe = self._redis.pipeline()
+        pipe.rpush(self.prefix + key, *(json.dumps(item) for item in items))
+        pipe.incr(self._version_key)
+        return pipe.execute()[0]
+
+    def range(self, key, start=0):
+        return [json.loads(raw) for raw in self._redis.lrange(self.prefix + key, start, -1)]
+
+    def version(self):
+        return int(self._redis.get(self._version_key) or 0)
+
+
+def open_store(backend=STATE_BACKEND):
+    if backend == "redis":
+        return RedisStateStore()
+    if backend == "sqlite":
+        return SQLiteStateStore()
+    raise ValueError(f"Unknown STATE_BACKEND {backend!r} (expected 'sqlite' or 'redis')")
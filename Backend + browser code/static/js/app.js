@@ -11,6 +11,8 @@
 
   /* ---------- GLOBALS ---------- */
   let cancelRequested = false;
+  // Id of the server job this page's "new" scrape ran in (or is queued as).
+  let currentJobId = null;
   let serverStatusElements = [];
   let wakeButtons = [];
   let serverStatusTimer = null;
@@ -1057,15 +1059,33 @@
     startServerStatusPolling();
   }
 
-  async function waitForJobCompletion(){
+  async function waitForJobCompletion(jobId){
     while(true){
       if(cancelRequested){
         throw new Error('Zber bol zrušený.');
       }
 
+      // While the progress stream is open it already carries the state of the
+      // running job; a queued job is polled until it is the running one.
+      const streamedJob = progressStream && streamedProgress ? streamedProgress.job : null;
+      if(streamedJob && (!jobId || streamedJob.job_id === jobId)){
+        if(streamedJob.status === 'failed'){
+          throw new Error(streamedJob.error || 'Zber zlyhal.');
+        }
+        if(streamedJob.status === 'cancelled' && jobId){
+          throw new Error('Zber bol zrušený.');
+        }
+        if(streamedJob.status === 'finished' && streamedJob.results_ready){
+          return streamedJob;
+        }
+        await delay(250);
+        continue;
+      }
+
       let resp;
       try{
-        resp = await fetch(`${API_BASE}/job_status`, { headers: authHeaders() });
+        const path = jobId ? `/jobs/${encodeURIComponent(jobId)}` : '/job_status';
+        resp = await fetch(`${API_BASE}${path}`, { headers: authHeaders() });
       }catch(err){
         await delay(2000);
         continue;
@@ -1094,7 +1114,12 @@
         throw new Error(job.error || 'Zber zlyhal.');
       }
 
-      if(job.status === 'finished' && job.results_ready){
+      if(job.status === 'cancelled' && jobId){
+        throw new Error('Zber bol zrušený.');
+      }
+
+      // /jobs/<id> reports "finished" once the results are stored.
+      if(job.status === 'finished' && (job.results_ready || jobId)){
         return job;
       }
 
@@ -1102,6 +1127,29 @@
     }
   }
 
+  // ETag and data of the last mode=old/latest response per request body; the
+  // server answers a repeated query with 304 Not Modified while it is current.
+  const storedResultsCache = new Map();
+
+  async function postScrape(payload){
+    const body = JSON.stringify(payload);
+    const cached = storedResultsCache.get(body);
+    const headers = { 'Content-Type': 'application/json' };
+    if(cached){
+      headers['If-None-Match'] = cached.etag;
+    }
+    const resp = await fetch(`${API_BASE}/scrape`, { method: 'POST', headers: authHeaders(headers), body });
+    if(resp.status === 304 && cached){
+      return { status: resp.status, ok: true, data: cached.data };
+    }
+    const { data } = await readResponsePayload(resp);
+    const etag = resp.headers.get('ETag');
+    if(resp.ok && etag){
+      storedResultsCache.set(body, { etag, data });
+    }
+    return { status: resp.status, ok: resp.ok, data };
+  }
+
   async function fetchLatestResultsFromServer(){
     const payload = {
       mode: 'latest',
@@ -1109,21 +1157,15 @@
       date_end: formatDDMMYYYY(filterState.endDate) || null,
     };
 
-    const resp = await fetch(`${API_BASE}/scrape`, {
-      method: 'POST',
-      headers: authHeaders({ 'Content-Type': 'application/json' }),
-      body: JSON.stringify(payload),
-    });
-
-    const { data } = await readResponsePayload(resp);
+    const { status, ok, data } = await postScrape(payload);
 
-    if(resp.status === 401){
+    if(status === 401){
       handleUnauthorized();
       throw new Error('Prihlásenie vypršalo, prihláste sa prosím znova.');
     }
 
-    if(!resp.ok){
-      let message = `Chyba pri spracovaní (kód ${resp.status})`;
+    if(!ok){
+      let message = `Chyba pri spracovaní (kód ${status})`;
       if(data){
         if(typeof data === 'string'){
           message = data;
@@ -1176,20 +1218,15 @@
     }
 
     try {
-      const resp = await fetch(`${API_BASE}/scrape`, {
-        method: "POST",
-        headers: authHeaders({ "Content-Type": "application/json" }),
-        body: JSON.stringify(payload)
-      });
-      const { data } = await readResponsePayload(resp);
+      const { status, ok, data } = await postScrape(payload);
 
-      if (resp.status === 401) {
+      if (status === 401) {
         handleUnauthorized();
         throw new Error('Prihlásenie vypršalo, prihláste sa prosím znova.');
       }
 
-      if (!resp.ok) {
-        let message = `Chyba pri spracovaní (kód ${resp.status})`;
+      if (!ok) {
+        let message = `Chyba pri spracovaní (kód ${status})`;
         if (data) {
           if (typeof data === 'string') {
             message = data;
@@ -1211,8 +1248,10 @@
           throw new Error('Neočakávaná odpoveď zo servera.');
         }
 
+        currentJobId = (data.job && data.job.id) || null;
         startProgressPolling();
-        await waitForJobCompletion();
+        startLiveResults(currentJobId);
+        await waitForJobCompletion(currentJobId);
 
         if(cancelRequested){
           throw new Error('Zber bol zrušený.');
@@ -1220,10 +1259,7 @@
 
         const latestResults = await fetchLatestResultsFromServer();
 
-        if(progressInterval){
-          clearInterval(progressInterval);
-          progressInterval = null;
-        }
+        stopProgressUpdates();
 
         prog.style.width = "100%";
         label.textContent = "Hotovo";
@@ -1243,10 +1279,7 @@
       resCt.classList.remove('hidden');
       displayResults(links);
     } catch (err) {
-      if(progressInterval){
-        clearInterval(progressInterval);
-        progressInterval = null;
-      }
+      stopProgressUpdates();
       const message = err && err.message ? err.message : 'Chyba pri spracovaní.';
       prog.style.width = "100%";
       label.textContent = message;
@@ -1366,6 +1399,93 @@
   }
 
   let progressInterval;
+  let progressStream = null;     // AbortController of the open /progress/stream request
+  let streamedProgress = null;   // last payload pushed by the stream
+  let liveResultsStream = null;  // AbortController of the open /results/live request
+
+  function stopProgressUpdates(){
+    if(progressInterval){
+      clearInterval(progressInterval);
+      progressInterval = null;
+    }
+    if(progressStream){
+      progressStream.abort();
+      progressStream = null;
+    }
+    if(liveResultsStream){
+      liveResultsStream.abort();
+      liveResultsStream = null;
+    }
+  }
+
+  // Reads server-sent events through fetch, which, unlike EventSource, can
+  // send the Authorization header. Calls onMessage(event, data) per message.
+  async function readEventStream(path, controller, onMessage){
+    const resp = await fetch(`${API_BASE}${path}`, { headers: authHeaders(), signal: controller.signal });
+    if(resp.status === 401){
+      handleUnauthorized();
+      throw new Error('unauthorized');
+    }
+    if(!resp.ok || !resp.body){
+      throw new Error('stream unavailable');
+    }
+    const reader = resp.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    while(true){
+      const { value, done } = await reader.read();
+      if(done){
+        break;
+      }
+      buffer += decoder.decode(value, { stream: true });
+      let end;
+      while((end = buffer.indexOf('\n\n')) >= 0){
+        const lines = buffer.slice(0, end).split('\n');
+        buffer = buffer.slice(end + 2);
+        const eventLine = lines.find(line => line.startsWith('event:'));
+        const data = lines.filter(line => line.startsWith('data:')).map(line => line.slice(5)).join('\n');
+        if(data){
+          onMessage(eventLine ? eventLine.slice(6).trim() : 'message', JSON.parse(data));
+        }
+      }
+    }
+  }
+
+  async function streamProgress(onData){
+    const controller = new AbortController();
+    progressStream = controller;
+    await readEventStream('/progress/stream', controller, (event, data) => {
+      streamedProgress = data;
+      onData(streamedProgress);
+    });
+    if(progressStream === controller){
+      progressStream = null;
+    }
+    throw new Error('stream closed');
+  }
+
+  // Shows the ads stage 5 keeps while the job is still running; the final
+  // /scrape mode=latest response replaces them when the job finishes.
+  function startLiveResults(jobId){
+    if(!jobId || !window.ReadableStream || !window.AbortController || !window.TextDecoder){
+      return;
+    }
+    const controller = new AbortController();
+    liveResultsStream = controller;
+    const items = [];
+    readEventStream(`/results/live?job=${encodeURIComponent(jobId)}`, controller, (event, data) => {
+      if(event !== 'results' || !Array.isArray(data) || cancelRequested){
+        return;
+      }
+      items.push(...data);
+      displayResults(items);
+    }).catch(() => {}).finally(() => {
+      if(liveResultsStream === controller){
+        liveResultsStream = null;
+      }
+    });
+  }
+
   function startProgressPolling() {
     const progressLabel = document.getElementById("progress-label");
     const prog = document.getElementById("progress");
@@ -1373,80 +1493,102 @@
     if(progressLabel){
       progressLabel.textContent = "";
     }
-    if(progressInterval){
-      clearInterval(progressInterval);
-    }
-    progressInterval = setInterval(() => {
-      fetch(`${API_BASE}/progress`,{headers:authHeaders()})
-        .then(res => {
-          if(res.status === 401){
-            handleUnauthorized();
-            throw new Error('unauthorized');
-          }
-          return res.json();
-        })
-        .then(data => {
-          if(cancelRequested){
-            clearInterval(progressInterval);
-            progressInterval = null;
-            return;
-          }
-          const done = Number(data.done) || 0;
-          const total = Number(data.total) || 0;
-          const pct = total > 0 ? (done / total) * 100 : 15;
-          prog.style.width = pct + "%";
-          if(stageLabel){
-            stageLabel.textContent = `${data.phase}`;
-          }
-          const labels = {
-            "1/5 Zber sitemap": "Sitemapy stiahnuté",
-            "2/5 Prvé filtrovanie": "Filtrované",
-            "3/5 Sťahovanie inzerátov": "Stiahnuté",
-            "4/5 Filtrovanie popisov": "Filtrované",
-            "5/5 OpenAI filtrovanie": "Vyhodnotené"
-          };
-          const prefix = labels[data.phase] ? labels[data.phase] + ": " : "";
-          if(progressLabel){
-            progressLabel.textContent = `${prefix}${done}/${total}`;
-          }
-          const job = data && typeof data === 'object' ? (data.job || {}) : {};
-          if(job.status === 'failed'){
-            if(progressLabel){
-              progressLabel.textContent = job.error || 'Zber zlyhal.';
-            }
-            if(stageLabel && typeof job.phase === 'string'){
-              stageLabel.textContent = job.phase;
-            }
-            clearInterval(progressInterval);
-            progressInterval = null;
-            toggleButtons(false);
-            return;
-          }
-          if (data.phase === "Hotovo") {
-            if(progressLabel){
-              progressLabel.textContent = "✅ Hotovo!";
+    stopProgressUpdates();
+    streamedProgress = null;
+
+    const fail = () => {
+      stopProgressUpdates();
+      if(progressLabel){
+        progressLabel.textContent = "";
+      }
+      toggleButtons(false);
+    };
+
+    const showProgress = data => {
+      if(cancelRequested){
+        stopProgressUpdates();
+        return;
+      }
+      const done = Number(data.done) || 0;
+      const total = Number(data.total) || 0;
+      const pct = total > 0 ? (done / total) * 100 : 15;
+      prog.style.width = pct + "%";
+      if(stageLabel){
+        stageLabel.textContent = `${data.phase}`;
+      }
+      const labels = {
+        "1/5 Zber sitemap": "Sitemapy stiahnuté",
+        "2/5 Prvé filtrovanie": "Filtrované",
+        "3/5 Sťahovanie inzerátov": "Stiahnuté",
+        "4/5 Filtrovanie popisov": "Filtrované",
+        "5/5 OpenAI filtrovanie": "Vyhodnotené"
+      };
+      const prefix = labels[data.phase] ? labels[data.phase] + ": " : "";
+      if(progressLabel){
+        progressLabel.textContent = `${prefix}${done}/${total}`;
+      }
+      const job = data && typeof data === 'object' ? (data.job || {}) : {};
+      if(job.status === 'failed'){
+        if(progressLabel){
+          progressLabel.textContent = job.error || 'Zber zlyhal.';
+        }
+        if(stageLabel && typeof job.phase === 'string'){
+          stageLabel.textContent = job.phase;
+        }
+        stopProgressUpdates();
+        toggleButtons(false);
+        return;
+      }
+      if (data.phase === "Hotovo") {
+        if(progressLabel){
+          progressLabel.textContent = "✅ Hotovo!";
+        }
+        stopProgressUpdates();
+        toggleButtons(false);
+      }
+    };
+
+    const poll = () => {
+      progressInterval = setInterval(() => {
+        fetch(`${API_BASE}/progress`,{headers:authHeaders()})
+          .then(res => {
+            if(res.status === 401){
+              handleUnauthorized();
+              throw new Error('unauthorized');
             }
-            clearInterval(progressInterval);
-            progressInterval = null;
-            toggleButtons(false);
-          }
-        })
-        .catch(() => {
-          clearInterval(progressInterval);
-          progressInterval = null;
-          if(progressLabel){
-            progressLabel.textContent = "";
-          }
-          toggleButtons(false);
-        });
-    }, 1000);
+            return res.json();
+          })
+          .then(showProgress)
+          .catch(fail);
+      }, 1000);
+    };
+
+    if(!window.ReadableStream || !window.AbortController || !window.TextDecoder){
+      poll();
+      return;
+    }
+    streamProgress(showProgress).catch(err => {
+      if(err && err.name === 'AbortError'){
+        return;
+      }
+      progressStream = null;
+      streamedProgress = null;
+      if(err && err.message === 'unauthorized'){
+        fail();
+        return;
+      }
+      // Older proxies may buffer or drop the stream; fall back to polling.
+      if(!cancelRequested){
+        poll();
+      }
+    });
   }
 
     function cancelScrape() {
       cancelRequested = true;
-      clearInterval(progressInterval);
-      progressInterval = null;
-      fetch(`${API_BASE}/cancel`, { method: "POST", headers:authHeaders() });
+      stopProgressUpdates();
+      const cancelPath = currentJobId ? `/jobs/${encodeURIComponent(currentJobId)}/cancel` : '/cancel';
+      fetch(`${API_BASE}${cancelPath}`, { method: "POST", headers:authHeaders() });
       document.getElementById('progress').style.width = '0%';
       document.getElementById('progress-bar').classList.add('hidden');
       document.getElementById('results-section').classList.add('hidden');
@@ -1,8 +1,11 @@
 import os
 import json
 import base64
+import time
 import requests
 from dotenv import load_dotenv
+
+from metrics import GITHUB_RATELIMIT_REMAINING, GITHUB_SECONDS
 load_dotenv()
 
 LOCAL_MODE = os.getenv("LOCAL_MODE")
@@ -41,6 +44,21 @@ if TOKEN:
     HEADERS["Authorization"] = f"Bearer {TOKEN}"
 
 
+def _github_request(method, url, **kwargs):
+    """``requests.request`` that records latency and the API rate-limit headroom."""
+    started = time.perf_counter()
+    try:
+        resp = requests.request(method, url, **kwargs)
+    except Exception:
+        GITHUB_SECONDS.observe(time.perf_counter() - started, method=method, status="error")
+        raise
+    GITHUB_SECONDS.observe(time.perf_counter() - started, method=method, status=resp.status_code)
+    remaining = resp.headers.get("X-RateLimit-Remaining")
+    if remaining is not None and remaining.isdigit():
+        GITHUB_RATELIMIT_REMAINING.set(int(remaining))
+    return resp
+
+
 def _local_path(path: str) -> str:
     return os.path.join(os.path.dirname(__file__), path)
 
@@ -53,6 +71,17 @@ if LOCAL_MODE:
         except FileNotFoundError:
             return None
 
+    def get_file_if_changed(path, etag=None):
+        full = _local_path(path)
+        try:
+            stat = os.stat(full)
+        except FileNotFoundError:
+            return etag != "missing", None, "missing"
+        current = f"{stat.st_mtime_ns}-{stat.st_size}"
+        if current == etag:
+            return False, None, etag
+        return True, get_file_from_github(path), current
+
     def update_file_on_github(path, content, message):
         full = _local_path(path)
         os.makedirs(os.path.dirname(full), exist_ok=True)
@@ -77,7 +106,7 @@ else:
         if not REPO:
             return None
 
-        resp = requests.get(f"https://api.github.com/repos/{REPO}", headers=HEADERS)
+        resp = _github_request("GET", f"https://api.github.com/repos/{REPO}", headers=HEADERS)
         if resp.status_code == 200:
             _DEFAULT_BRANCH = resp.json().get("default_branch") or "main"
             return _DEFAULT_BRANCH
@@ -90,16 +119,16 @@ else:
         if not REPO or not TOKEN:
             return
         ref_url = f"https://api.github.com/repos/{REPO}/git/refs/heads/{branch}"
-        ref_resp = requests.get(ref_url, headers=HEADERS)
+        ref_resp = _github_request("GET", ref_url, headers=HEADERS)
         if ref_resp.status_code != 404:
             return
         # Create the branch from the repo's default branch
-        repo_resp = requests.get(f"https://api.github.com/repos/{REPO}", headers=HEADERS)
+        repo_resp = _github_request("GET", f"https://api.github.com/repos/{REPO}", headers=HEADERS)
         if repo_resp.status_code != 200:
             print("❌ Failed to fetch repo info:", repo_resp.text)
             return
         default_branch = repo_resp.json().get("default_branch", "main")
-        base_resp = requests.get(
+        base_resp = _github_request("GET",
             f"https://api.github.com/repos/{REPO}/git/refs/heads/{default_branch}",
             headers=HEADERS,
         )
@@ -107,7 +136,7 @@ else:
             print("❌ Failed to fetch base branch:", base_resp.text)
             return
         sha = base_resp.json()["object"]["sha"]
-        create = requests.post(
+        create = _github_request("POST",
             f"https://api.github.com/repos/{REPO}/git/refs",
             headers=HEADERS,
             json={"ref": f"refs/heads/{branch}", "sha": sha},
@@ -123,7 +152,7 @@ else:
 
         def _fetch(branch_name):
             api_url = f"https://api.github.com/repos/{REPO}/contents/{path}?ref={branch_name}"
-            return requests.get(api_url, headers=HEADERS)
+            return _github_request("GET", api_url, headers=HEADERS)
 
         resp = _fetch(ref_branch)
         if resp.status_code == 404:
@@ -131,21 +160,38 @@ else:
             if default_branch and default_branch != ref_branch:
                 resp = _fetch(default_branch)
         if resp.status_code == 200:
-            data = resp.json()
-            enc = data.get("encoding")
-            content = data.get("content")
-            if enc == "base64" and content:
-                return base64.b64decode(content).decode("utf-8")
-            # Large files may have encoding "none" and require download_url
-            download_url = data.get("download_url")
-            if enc == "none" and download_url:
-                raw = requests.get(download_url, headers=HEADERS)
-                if raw.status_code == 200:
-                    return raw.text
-        else:
-            print(f"⚠️ GitHub request failed: {resp.status_code} {resp.text}")
+            return _contents_text(resp.json())
+        print(f"⚠️ GitHub request failed: {resp.status_code} {resp.text}")
+        return None
+
+    def _contents_text(data):
+        enc = data.get("encoding")
+        content = data.get("content")
+        if enc == "base64" and content:
+            return base64.b64decode(content).decode("utf-8")
+        # Large files may have encoding "none" and require download_url
+        download_url = data.get("download_url")
+        if enc == "none" and download_url:
+            raw = _github_request("GET", download_url, headers=HEADERS)
+            if raw.status_code == 200:
+                return raw.text
         return None
 
+    def get_file_if_changed(path, etag=None):
+        """Conditional fetch of ``path``; GitHub does not bill 304s against the rate limit."""
+        if not REPO:
+            return True, get_file_from_github(path), None
+        api_url = f"https://api.github.com/repos/{REPO}/contents/{path}?ref={BRANCH}"
+        headers = dict(HEADERS, **({"If-None-Match": etag} if etag else {}))
+        resp = _github_request("GET", api_url, headers=headers)
+        if resp.status_code == 304:
+            return False, None, etag
+        if resp.status_code == 200:
+            return True, _contents_text(resp.json()), resp.headers.get("ETag")
+        # Missing on the data branch: take the default-branch fallback and
+        # revalidate with a full fetch next time.
+        return True, get_file_from_github(path), None
+
     def update_file_on_github(path, content, message):
         """Create or update ``path`` on GitHub with ``content``."""
         if not REPO:
@@ -155,7 +201,7 @@ else:
         api_url = f"https://api.github.com/repos/{REPO}/contents/{path}"
 
         # Get current file SHA if it exists
-        meta = requests.get(f"{api_url}?ref={BRANCH}", headers=HEADERS)
+        meta = _github_request("GET", f"{api_url}?ref={BRANCH}", headers=HEADERS)
         sha = None
         if meta.status_code == 200:
             sha = meta.json().get("sha")
@@ -170,7 +216,7 @@ else:
         if sha:
             payload["sha"] = sha
 
-        put = requests.put(api_url, headers=HEADERS, json=payload)
+        put = _github_request("PUT", api_url, headers=HEADERS, json=payload)
         if put.status_code not in (200, 201):
             print("❌ GitHub file update failed:", put.text)
 
@@ -183,7 +229,7 @@ else:
         _ensure_branch(BRANCH)
         api_url = f"https://api.github.com/repos/{REPO}/contents/{path}"
 
-        meta = requests.get(f"{api_url}?ref={BRANCH}", headers=HEADERS)
+        meta = _github_request("GET", f"{api_url}?ref={BRANCH}", headers=HEADERS)
         sha = None
         current_text = ""
 
@@ -197,7 +243,7 @@ else:
             if encoding == "base64" and encoded_content:
                 current_text = base64.b64decode(encoded_content).decode("utf-8")
             elif download_url:
-                raw = requests.get(download_url, headers=HEADERS)
+                raw = _github_request("GET", download_url, headers=HEADERS)
                 if raw.status_code == 200:
                     current_text = raw.text
         elif meta.status_code != 404:
@@ -222,7 +268,7 @@ else:
         if sha:
             payload["sha"] = sha
 
-        resp = requests.put(api_url, headers=HEADERS, json=payload)
+        resp = _github_request("PUT", api_url, headers=HEADERS, json=payload)
         if resp.status_code not in (200, 201):
             print("❌ GitHub file append failed:", resp.text)
 
@@ -250,6 +296,31 @@ def save_old_links(links):
     update_file_on_github("Data/old_results.txt", content, "Update old_results.txt")
 
 
+def load_deferred_links():
+    """``URL dd/mm/YYYY HH:MM`` lines of new ads an earlier run left out.
+
+    Stage 1 adds them to the next run's new links; see :func:`append_deferred_links`.
+    """
+    text = get_file_from_github("Data/deferred_links.txt")
+    if not text:
+        return []
+    return [line.strip() for line in text.splitlines() if line.strip()]
+
+
+def append_deferred_links(lines):
+    """Record new ads this run could not process (deadline, byte budget), so the next run does.
+
+    They are already in ``old_results.txt`` and would never count as new again.
+    """
+    if not lines:
+        return
+    append_file_on_github("Data/deferred_links.txt", "\n".join(lines) + "\n", "Append deferred_links.txt")
+
+
+def clear_deferred_links():
+    update_file_on_github("Data/deferred_links.txt", "", "Clear deferred_links.txt")
+
+
 def load_keywords():
     text = get_file_from_github("Data/keywords.txt")
     return text.splitlines() if text else []
@@ -320,8 +391,19 @@ def load_phase3_results():
     return get_file_from_github("Data/phase3_filtered_links.txt")
 
 
+def load_phase3_results_if_changed(etag=None):
+    """``(changed, text, etag)`` for ``phase3_filtered_links.txt``.
+
+    ``text`` is ``None`` when the file is unchanged since ``etag``.
+    """
+    return get_file_if_changed("Data/phase3_filtered_links.txt", etag)
+
+
 def append_phase3_results(text):
-    """Append scraping results to ``phase3_filtered_links.txt`` on GitHub."""
+    """Append scraping results to ``phase3_filtered_links.txt`` on GitHub.
+
+    Returns the file's new content.
+    """
     existing = get_file_from_github("Data/phase3_filtered_links.txt") or ""
     if existing and not existing.endswith("\n"):
         existing += "\n"
@@ -329,3 +411,26 @@ def append_phase3_results(text):
     if not content.endswith("\n"):
         content += "\n"
     update_file_on_github("Data/phase3_filtered_links.txt", content, "Update phase3_filtered_links.txt")
+    return content
+
+
+def save_phase3_results(text):
+    """Replace ``phase3_filtered_links.txt`` on GitHub with ``text``."""
+    if text and not text.endswith("\n"):
+        text += "\n"
+    update_file_on_github("Data/phase3_filtered_links.txt", text, "Prune phase3_filtered_links.txt")
+
+
+def load_dead_links():
+    """Return URLs of stored results that were found to be sold or deleted."""
+    text = get_file_from_github("Data/dead_links.txt")
+    if not text:
+        return set()
+    return {line.split()[0] for line in text.splitlines() if line.strip()}
+
+
+def append_dead_links(urls):
+    """Record newly found dead result URLs in ``Data/dead_links.txt``."""
+    if not urls:
+        return
+    append_file_on_github("Data/dead_links.txt", "\n".join(sorted(urls)) + "\n", "Append dead_links.txt")
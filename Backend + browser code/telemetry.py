@@ -0,0 +1,240 @@
+"""Run history in a local SQLite database.
+
+Every scrape gets a row in ``runs`` and one row per pipeline stage in
+``stage_metrics`` with wall and CPU time, item counts, request/byte totals,
+LLM token usage and whether the stage was restored from the artifact cache.
+``/runs`` and ``/runs/<id>`` read from here.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+
+DATA_DIR = "Data"
+TELEMETRY_DB = os.getenv("TELEMETRY_DB", os.path.join(DATA_DIR, "telemetry.sqlite"))
+# Identifies the deployment a run belongs to, so regressions can be pinned to a release.
+DEPLOYMENT = os.getenv("RAILWAY_GIT_COMMIT_SHA") or os.getenv("DEPLOYMENT_ID") or ""
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    started_at REAL NOT NULL,
+    finished_at REAL,
+    status TEXT NOT NULL,
+    mode TEXT,
+    params TEXT,
+    deployment TEXT,
+    results INTEGER,
+    error TEXT
+);
+CREATE TABLE IF NOT EXISTS stage_metrics (
+    run_id INTEGER NOT NULL REFERENCES runs(id),
+    stage TEXT NOT NULL,
+    started_at REAL NOT NULL,
+    wall_seconds REAL,
+    cpu_seconds REAL,
+    max_rss_kb INTEGER,
+    returncode INTEGER,
+    cache_hit INTEGER NOT NULL DEFAULT 0,
+    items_in INTEGER,
+    items_out INTEGER,
+    requests INTEGER,
+    retries INTEGER,
+    wire_bytes INTEGER,
+    decoded_bytes INTEGER,
+    llm_calls INTEGER,
+    prompt_tokens INTEGER,
+    completion_tokens INTEGER,
+    stats TEXT,
+    PRIMARY KEY (run_id, stage)
+);
+CREATE INDEX IF NOT EXISTS runs_started ON runs(started_at);
+"""
+
+# Files counted as a stage's input and output items.
+STAGE_ITEMS = {
+    "stage1": (None, os.path.join(DATA_DIR, "new_links.txt")),
+    "stage2": (os.path.join(DATA_DIR, "new_links.txt"), os.path.join(DATA_DIR, "final_filtered_links.txt")),
+    "stage3": (os.path.join(DATA_DIR, "final_filtered_links.txt"), os.path.join(DATA_DIR, "scraped_results.txt")),
+    "stage4": (os.path.join(DATA_DIR, "scraped_results.txt"), os.path.join(DATA_DIR, "phase2_filtered_links.txt")),
+    "stage5": (os.path.join(DATA_DIR, "phase2_filtered_links.txt"), os.path.join(DATA_DIR, "phase3_filtered_links.txt")),
+}
+
+_lock = threading.Lock()
+_initialised = False
+
+
+def _connect():
+    global _initialised
+    if not _initialised:
+        os.makedirs(os.path.dirname(TELEMETRY_DB) or ".", exist_ok=True)
+    conn = sqlite3.connect(TELEMETRY_DB, timeout=10)
+    conn.row_factory = sqlite3.Row
+    if not _initialised:
+        conn.executescript(_SCHEMA)
+        _initialised = True
+    return conn
+
+
+def count_items(path):
+    """Result blocks in a results file, or non-empty lines in a link list."""
+    if not path or not os.path.exists(path):
+        return None
+    blocks = lines = 0
+    with open(path, encoding="utf-8", errors="replace") as f:
+        for line in f:
+            if line.startswith("Result #"):
+                blocks += 1
+            elif line.strip():
+                lines += 1
+    return blocks or lines
+
+
+def summarize_stats(stats):
+    """Pull request, retry, byte and token totals out of a stage's reported stats."""
+    summary = {
+        "requests": None,
+        "retries": None,
+        "wire_bytes": None,
+        "decoded_bytes": None,
+        "llm_calls": None,
+        "prompt_tokens": None,
+        "completion_tokens": None,
+    }
+    rows = (stats.get("bandwidth") or {}).get("rows")
+    if rows:
+        for field in ("requests", "wire_bytes", "decoded_bytes"):
+            summary[field] = sum(row.get(field, 0) for row in rows)
+    if "retries" in stats:
+        summary["retries"] = stats["retries"]
+    elif "retries" in (stats.get("pipeline") or {}):
+        summary["retries"] = stats["pipeline"]["retries"]
+    llm = stats.get("llm")
+    if llm:
+        summary["llm_calls"] = llm.get("calls")
+        summary["prompt_tokens"] = llm.get("prompt_tokens")
+        summary["completion_tokens"] = llm.get("completion_tokens")
+    return summary
+
+
+def start_run(mode, params):
+    with _lock:
+        conn = _connect()
+        try:
+            with conn:
+                cur = conn.execute(
+                    "INSERT INTO runs (started_at, status, mode, params, deployment) VALUES (?, ?, ?, ?, ?)",
+                    (time.time(), "running", mode, json.dumps(params, default=list), DEPLOYMENT),
+                )
+            return cur.lastrowid
+        finally:
+            conn.close()
+
+
+def finish_run(run_id, status, results=None, error=None):
+    with _lock:
+        conn = _connect()
+        try:
+            with conn:
+                conn.execute(
+                    "UPDATE runs SET finished_at = ?, status = ?, results = ?, error = ? WHERE id = ?",
+                    (time.time(), status, results, error, run_id),
+                )
+        finally:
+            conn.close()
+
+
+def record_stage(run_id, stage, usage, stats=None, cache_hit=False):
+    """Store one stage's resource usage (from ``run_step``) and reported stats."""
+    stats = stats or {}
+    items_in, items_out = (count_items(path) for path in STAGE_ITEMS.get(stage, (None, None)))
+    summary = summarize_stats(stats)
+    with _lock:
+        conn = _connect()
+        try:
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO stage_metrics (run_id, stage, started_at, wall_seconds, cpu_seconds, "
+                    "max_rss_kb, returncode, cache_hit, items_in, items_out, requests, retries, wire_bytes, "
+                    "decoded_bytes, llm_calls, prompt_tokens, completion_tokens, stats) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        run_id,
+                        stage,
+                        usage.get("started_at", time.time()),
+                        usage.get("wall_seconds"),
+                        usage.get("cpu_seconds"),
+                        usage.get("max_rss_kb"),
+                        usage.get("returncode"),
+                        int(cache_hit),
+                        items_in,
+                        items_out,
+                        summary["requests"],
+                        summary["retries"],
+                        summary["wire_bytes"],
+                        summary["decoded_bytes"],
+                        summary["llm_calls"],
+                        summary["prompt_tokens"],
+                        summary["completion_tokens"],
+                        json.dumps(stats),
+                    ),
+                )
+        finally:
+            conn.close()
+
+
+def _run_dict(row):
+    run = dict(row)
+    run["params"] = json.loads(run["params"] or "{}")
+    if run["finished_at"]:
+        run["wall_seconds"] = round(run["finished_at"] - run["started_at"], 2)
+    return run
+
+
+def list_runs(limit=50):
+    """Newest runs first, each with per-stage wall time and totals."""
+    with _lock:
+        conn = _connect()
+        try:
+            runs = [_run_dict(row) for row in conn.execute(
+                "SELECT * FROM runs ORDER BY id DESC LIMIT ?", (limit,)
+            )]
+            for run in runs:
+                rows = conn.execute(
+                    "SELECT stage, wall_seconds, cpu_seconds, cache_hit, wire_bytes, prompt_tokens, completion_tokens "
+                    "FROM stage_metrics WHERE run_id = ? ORDER BY stage",
+                    (run["id"],),
+                ).fetchall()
+                run["stages"] = {row["stage"]: row["wall_seconds"] for row in rows}
+                run["cpu_seconds"] = round(sum(row["cpu_seconds"] or 0 for row in rows), 2)
+                run["wire_bytes"] = sum(row["wire_bytes"] or 0 for row in rows)
+                run["tokens"] = sum((row["prompt_tokens"] or 0) + (row["completion_tokens"] or 0) for row in rows)
+                run["cache_hits"] = sum(row["cache_hit"] for row in rows)
+            return runs
+        finally:
+            conn.close()
+
+
+def get_run(run_id):
+    """One run with all of its stage rows, or ``None``."""
+    with _lock:
+        conn = _connect()
+        try:
+            row = conn.execute("SELECT * FROM runs WHERE id = ?", (run_id,)).fetchone()
+            if row is None:
+                return None
+            run = _run_dict(row)
+            stages = []
+            for stage_row in conn.execute(
+                "SELECT * FROM stage_metrics WHERE run_id = ? ORDER BY stage", (run_id,)
+            ):
+                stage = dict(stage_row)
+                stage["cache_hit"] = bool(stage["cache_hit"])
+                stage["stats"] = json.loads(stage["stats"] or "{}")
+                stages.append(stage)
+            run["stages"] = stages
+            return run
+        finally:
+            conn.close()